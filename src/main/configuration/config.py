@@ -2,12 +2,44 @@
 CONFIG_ROOT_FOLDER = "D:/Games/Magic/ProxKy/v3"
 # The unique windows ID of the InDesign application
 CONFIG_INDESIGN_ID = "InDesign.Application.2022"
+# How to render cards, either "indesign" (through COM) or "fake" (records the operations InDesign would perform and
+# exports placeholder PDFs, for benchmarking without InDesign)
+CONFIG_RENDERING_BACKEND = "indesign"
 # Whether to print reminder text (this is reminder text)
 CONFIG_PRINT_REMINDER_TEXT = True
 # Whether to print flavor text (flavor text is stuff like lore, ...)
 CONFIG_PRINT_FLAVOR_TEXT = True
-# Which fetcher to use
+# Which fetcher to use, either "scryfall", "scryfall_concurrent" (concurrent requests) or "bulk"
 CONFIG_CARD_DATA_FETCHER = "scryfall"
+# Maximum amount of concurrent requests of the concurrent Scryfall fetcher
+CONFIG_FETCHER_CONCURRENCY = 8
+# Maximum amount of concurrent artwork downloads
+CONFIG_ARTWORK_CONCURRENCY = 8
+# Scryfall bulk data file (e.g. default_cards or all_cards) used by the bulk fetcher
+CONFIG_BULK_DATA_FILE = CONFIG_ROOT_FOLDER + "/Bulk/default-cards.json"
+# Language of the printings preferred by the bulk fetcher, bulk data files such as all_cards contain every language
+CONFIG_CARD_LANGUAGE = "en"
+# Whether to keep fetched card data in an on-disk cache
+CONFIG_CARD_CACHE = True
+# Time in seconds after which cached card data is fetched again
+CONFIG_CARD_CACHE_TTL = 7 * 24 * 60 * 60
+# How to measure the amount of lines of a text, either "indesign" or "local" (using the font files in Resources/Fonts,
+# does not require InDesign)
+CONFIG_TEXT_MEASURER = "indesign"
+# Whether to keep measured line counts in an on-disk cache
+CONFIG_TEXT_CACHE = True
+# Whether to shrink oracle text to fit its frame while composing, using the font files in Resources/Fonts. Text that
+# still overflows is shrunk further during export
+CONFIG_COMPOSE_AUTOFIT = True
+# Time in seconds after which cached Scryfall catalogs (e.g. ability words) are fetched again
+CONFIG_CATALOG_TTL = 30 * 24 * 60 * 60
+# How to report progress, either "terminal" (a status line), "json" (newline-delimited JSON, e.g. for log files) or
+# "auto" (terminal if the output is one, JSON otherwise)
+CONFIG_PROGRESS_OUTPUT = "auto"
+# Maximum amount of times per second the status line is redrawn
+CONFIG_PROGRESS_REDRAW_RATE = 10
+# Time in seconds between writes of newline-delimited JSON progress
+CONFIG_PROGRESS_JSON_INTERVAL = 1
 
 # Internals
 
@@ -20,3 +52,5 @@ CONFIG_PRINT_BACK_ID = "u16c"
 CONFIG_PATH_ID_FILE = "./data/ids.txt"
 # API URL from which Scryfall fetcher will fetch data
 API_URL = "https://api.scryfall.com"
+# Maximum amount of requests per second to the Scryfall API
+CONFIG_SCRYFALL_RATE_LIMIT = 10
@@ -1,8 +1,4 @@
-import json
-
-import requests
-
-from src.main.configuration.config import CONFIG_ROOT_FOLDER, API_URL
+from src.main.configuration.config import CONFIG_ROOT_FOLDER
 from src.main.utils.misc import mm_to_pt
 
 
@@ -302,15 +298,25 @@ class Paths:
     DOCUMENTS = MAIN + "/Documents"
     PDF = MAIN + "/PDF"
     PRINT = MAIN + "/Print"
+    CACHE = MAIN + "/Cache"
+    PROFILES = MAIN + "/Profiles"
+    FILE_BUILD_MANIFEST = MAIN + "/manifest.json"
+    FILE_CARD_CACHE = CACHE + "/cards.sqlite"
+    FILE_BULK_INDEX = CACHE + "/bulk.sqlite"
+    FILE_ABILITY_WORDS = CACHE + "/ability-words.json"
+    FILE_GRAPHIC_CACHE = CACHE + "/graphics.sqlite"
+    FILE_TEXT_CACHE = CACHE + "/text.sqlite"
+    FILE_FITTING_CACHE = CACHE + "/fitting.sqlite"
     RESOURCES = MAIN + "/Resources"
     ICONS = RESOURCES + "/Icons"
     CARD_TYPES = ICONS + "/Card Types"
+    FONTS = RESOURCES + "/Fonts"
     TEMPLATES = RESOURCES + "/Templates"
     FILE_TEMPLATE = TEMPLATES + "/ProxKy.idml"
     FILE_PRINT = TEMPLATES + "/Print.idml"
+    FILE_STUDY = TEMPLATES + "/Study.idml"
     _WORKING_MEMORY = MAIN + "/Working Memory"
-    WORKING_MEMORY_CARD = _WORKING_MEMORY + "/Card"
-    WORKING_MEMORY_PRINT = _WORKING_MEMORY + "/Print"
+    WORKING_MEMORY_JOBS = _WORKING_MEMORY + "/Jobs"
 
 
 class Colors:
@@ -330,12 +336,41 @@ class Faces:
     BACK = "back"
 
 
-class Magic:
+class _Lazy(type):
+    """
+    Metaclass resolving the attributes listed in `_LAZY` of a class on first access. Used for values that are expensive
+    to compute or require I/O, so importing the configuration stays cheap.
+    """
+
+    def __getattr__(cls, name):
+        loaders = cls.__dict__.get("_LAZY", dict())
+        if name not in loaders:
+            raise AttributeError("type object '" + cls.__name__ + "' has no attribute '" + name + "'")
+
+        value = loaders[name]()
+        setattr(cls, name, value)
+        return value
+
+
+def _load_keywords() -> [str]:
+    from src.main.data.catalog import get_ability_words
+    return get_ability_words()
+
+
+def _load_template_oracle() -> [([str], str)]:
+    template = Regex.TEMPLATE_REGULAR.copy()
+    template.append(
+        (Magic.KEYWORDS, "keyword"))
+    return template
+
+
+class Magic(metaclass=_Lazy):
     MANA_TYPES = ["W", "U", "B", "R", "G", "C"]
-    KEYWORDS = json.loads(requests.get(API_URL + "/catalog/ability-words").text)["data"]
+    # KEYWORDS: Ability words, loaded on first access
+    _LAZY = {"KEYWORDS": _load_keywords}
 
 
-class Regex:
+class Regex(metaclass=_Lazy):
     MANA = r"(?P<match>{(?P<mana>[A-Z0-9\/◄►]+)})"
     ADD_MANA = r"(?P<match>(?P<req>(?:{[A-Z0-9\/]+})+)+: Add (?P<prod>(?:{(?:[A-Z0-9\/]+)})+))"
 
@@ -343,9 +378,7 @@ class Regex:
     TEMPLATE_REGULAR = TEMPLATE_MANA.copy()
     TEMPLATE_REGULAR.append(
         ([r" ?\(.+\)"], "reminder"))
-    TEMPLATE_ORACLE = TEMPLATE_REGULAR.copy()
-    TEMPLATE_ORACLE.append(
-        (Magic.KEYWORDS, "keyword"))
+    # TEMPLATE_ORACLE: Regular template extended by the ability words, built on first access
     TEMPLATE_PLANESWALKER = [([r"[\+|−]?(?:\d+|X): "], "loyalty")]
     TEMPLATE_FLAVOR = [([r"\*(?:.)+\*"], "normal")]
     TEMPLATE_BREAK = [("\n", "break")]
@@ -353,6 +386,8 @@ class Regex:
     LEVELER = r"[\"LEVEL [\d]+(-[\d]+|\+)\\n([\d]+|\*)/([\d]+|\*)\"]"
     NEWLINE = r"\n"
 
+    _LAZY = {"TEMPLATE_ORACLE": _load_template_oracle}
+
     CARD_ENTRY = r"^(?P<amount>\d+) (?P<name>.+?)(?P<flags> \[.+\])?$"
     CARD_OPTIONS = r"(?P<type>(?:.)+): (?P<id>(?:.)+)"
     CARD_NAME = r"^(?P<set>.+) - (?P<name>.+?)$"
@@ -362,7 +397,7 @@ class Regex:
 SUPPORTED_LAYOUTS = ["normal", "modal_dfc", "transform", "split", "flip", "adventure", "class", "saga", "meld",
                      "token", "double_faced_token", "emblem"]
 DOUBLE_SIDED_LAYOUTS = ["modal_dfc", "transform", "meld", "double_faced_token"]
-SUPPORTED_MODES = ["standard", "generate_id", "debug"]
+SUPPORTED_MODES = ["standard", "generate_id", "calibrate", "debug"]
 
 # Image types to consider
 IMAGE_TYPES = ["png", "jpg", "jpeg"]
@@ -447,3 +482,10 @@ RESIZE_INFORMATION = \
             [Id_Names.ARTIST_INFORMATION],
             [Id_Names.COLLECTOR_INFORMATION],
         ]}
+# Granularity of shrinking overflowing frames (point size and value of the second design axis respectively), and the
+# smallest value to shrink to
+FITTING_INFORMATION = \
+    {"resize": {"step": 0.25, "minimum": 4},
+     "condense": {"step": 5, "minimum": 0}}
+# Key of the script label of a text frame recording by how many steps its text was shrunk while composing
+FITTING_LABEL = "ProxKyFitting"
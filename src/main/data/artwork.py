@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.main.configuration.config import CONFIG_ARTWORK_CONCURRENCY
+from src.main.configuration.variables import Paths, IMAGE_TYPES
+from src.main.data.card import Card
+from src.main.utils.info import show_info, Info_Mode
+from src.main.utils.profiler import profiled
+
+
+def get_artwork_filename(card: Card) -> str:
+    """
+    Returns the name of the artwork file of a card, without extension.
+    :param card: The card or face
+    :return: The filename
+    """
+    return str(card.collector_number) + " - " + card.name
+
+
+class ArtworkIndex:
+    """
+    Index of the artwork available on disk, built by scanning the artwork folders once. Maps set, collector number
+    and name of a card to the best matching file. Folders are only scanned again if their modification time changed.
+    """
+
+    _instance = None
+
+    def __init__(self, roots: [(str, [str])] = None) -> None:
+        """
+        :param roots: Folders containing artwork, with the file types to consider, ordered by precedence. Each folder
+        contains one subfolder per set.
+        """
+        super().__init__()
+        if roots is None:
+            # Artwork provided by the user takes precedence over downloaded artwork
+            roots = [(Paths.ARTWORK, IMAGE_TYPES), (Paths.ARTWORK_DOWNLOADED, ["jpg"])]
+        self.roots = roots
+
+        self._lock = threading.Lock()
+        self._mtimes = dict()
+        # Mapping from root and set folder to the files in it, by key
+        self._folders = dict()
+        self._index = dict()
+
+        self.refresh()
+
+    @classmethod
+    def get_standard_index(cls) -> ArtworkIndex:
+        """
+        Returns the index over the default artwork folders.
+        :return: The index
+        """
+        if cls._instance is None:
+            cls._instance = ArtworkIndex()
+        return cls._instance
+
+    def get(self, card: Card) -> (str, str) | None:
+        """
+        Looks up the artwork of a card.
+        :param card: The card or face
+        :return: The folder containing the artwork and the name of the file as stored on disk, `None` if there is no
+        local artwork
+        """
+        return self._index.get(self._get_key(card))
+
+    def get_missing(self, cards: [Card]) -> [Card]:
+        """
+        Returns the cards without local artwork, after picking up changes of the artwork folders.
+        :param cards: The cards or faces to check
+        :return: The cards without local artwork
+        """
+        self.refresh()
+        return [card for card in cards if self.get(card) is None]
+
+    def add(self, card: Card, path: str, filename: str) -> None:
+        """
+        Registers artwork that was just downloaded, without scanning the folder again.
+        :param card: The card or face
+        :param path: The folder containing the artwork
+        :param filename: The name of the file, including its extension
+        """
+        with self._lock:
+            key = self._get_key(card)
+            self._folders.setdefault(path, dict())[key] = (path, filename)
+            self._mtimes[path] = _get_mtime(path)
+            # Artwork is only downloaded if there is none yet, so it cannot shadow a file of higher precedence
+            self._index.setdefault(key, (path, filename))
+
+    def refresh(self) -> None:
+        """
+        Scans all folders whose modification time changed since they were last scanned.
+        """
+        changed = False
+
+        for root, image_types in self.roots:
+            mtime = _get_mtime(root)
+            if mtime != self._mtimes.get(root):
+                self._mtimes[root] = mtime
+                changed = True
+                # Forget set folders that no longer exist
+                for folder in [folder for folder in self._folders if folder.startswith(root + "/")]:
+                    if not os.path.isdir(folder):
+                        del self._folders[folder]
+                        self._mtimes.pop(folder, None)
+
+            if mtime is None:
+                continue
+
+            with os.scandir(root) as entries:
+                folders = [root + "/" + entry.name for entry in entries if entry.is_dir()]
+
+            for folder in folders:
+                mtime_folder = _get_mtime(folder)
+                if mtime_folder != self._mtimes.get(folder):
+                    self._mtimes[folder] = mtime_folder
+                    self._folders[folder] = self._scan(folder, image_types)
+                    changed = True
+
+        if changed:
+            self._rebuild()
+
+    @staticmethod
+    def _scan(folder: str, image_types: [str]) -> dict:
+        """
+        Lists the artwork files of a set folder.
+        :param folder: The folder to scan
+        :param image_types: File types to consider, ordered by precedence
+        :return: Mapping from keys to the folder and the name of the best matching file
+        """
+        files = dict()
+        set_code = os.path.basename(folder).lower()
+
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                name, _, extension = entry.name.rpartition(".")
+                extension = extension.lower()
+                if extension not in image_types or not entry.is_file():
+                    continue
+
+                collector_number, separator, card_name = name.partition(" - ")
+                if separator == "":
+                    continue
+
+                # Names are matched regardless of case, but the file is referenced by its actual name
+                key = (set_code, collector_number.lower(), card_name.lower())
+                if key not in files or image_types.index(extension) < \
+                        image_types.index(files[key][1].rpartition(".")[2].lower()):
+                    files[key] = (folder, entry.name)
+
+        return files
+
+    def _rebuild(self) -> None:
+        """
+        Combines the scanned folders, respecting the precedence of the roots.
+        """
+        self._index = dict()
+        for root, _ in reversed(self.roots):
+            for folder, files in self._folders.items():
+                if folder.startswith(root + "/"):
+                    self._index.update(files)
+
+    @staticmethod
+    def _get_key(card: Card) -> (str, str, str):
+        return card.set.lower(), str(card.collector_number).lower(), card.name.lower()
+
+
+def _get_mtime(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+@profiled
+def download_artwork(card: Card, session: requests.Session = None) -> bool:
+    """
+    Downloads the artwork of a card from Scryfall into the folder of downloaded artwork.
+    :param card: The card or face
+    :param session: Session to use for the request
+    :return: Whether the artwork was downloaded
+    """
+    if "art_crop" not in card.image_uris:
+        show_info("No artwork on Scryfall", prefix=card.name, mode=Info_Mode.ERROR, end_line=True)
+        return False
+
+    response = (session if session is not None else requests).get(card.image_uris["art_crop"])
+
+    if response.status_code != 200:
+        show_info("Could not download artwork", prefix=card.name, mode=Info_Mode.ERROR, end_line=True)
+        return False
+
+    path = Paths.ARTWORK_DOWNLOADED + "/" + card.set.upper()
+    path_file = path + "/" + get_artwork_filename(card) + ".jpg"
+    os.makedirs(path, exist_ok=True)
+
+    # Write to a temporary file first, so interrupted downloads never leave a truncated artwork behind
+    with open(path_file + ".part", "wb") as handler:
+        handler.write(response.content)
+    os.replace(path_file + ".part", path_file)
+
+    ArtworkIndex.get_standard_index().add(card, path, get_artwork_filename(card) + ".jpg")
+    return True
+
+
+def prefetch_artwork(cards: [Card], concurrency: int = CONFIG_ARTWORK_CONCURRENCY) -> [Card]:
+    """
+    Downloads the artwork of all given cards that do not have local artwork yet, using a pool of threads sharing one
+    HTTP session.
+    :param cards: The cards or faces to download the artwork for
+    :param concurrency: Maximum amount of concurrent downloads
+    :return: The cards whose artwork could not be downloaded
+    """
+    # Different cards may share the same artwork file
+    missing = dict()
+    for card in ArtworkIndex.get_standard_index().get_missing(cards):
+        missing.setdefault((card.set.upper(), get_artwork_filename(card)), card)
+
+    if len(missing) == 0:
+        return []
+
+    show_info(str(len(missing)) + " artworks not available locally", end_line=True)
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    failed = []
+    with session, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(download_artwork, card, session): card for card in missing.values()}
+
+        for i, future in enumerate(as_completed(futures)):
+            card = futures[future]
+            try:
+                success = future.result()
+            except requests.RequestException as e:
+                show_info("Could not download artwork: " + str(e), prefix=card.name, mode=Info_Mode.ERROR,
+                          end_line=True)
+                success = False
+
+            if not success:
+                failed.append(card)
+            show_info("Downloading artwork... (" + str(i + 1) + "/" + str(len(missing)) + ")")
+
+    if len(failed) > 0:
+        show_info("Could not download " + str(len(failed)) + " of " + str(len(missing)) + " artworks",
+                  mode=Info_Mode.ERROR, end_line=True)
+    else:
+        show_info("Successfully downloaded " + str(len(missing)) + " artworks", mode=Info_Mode.SUCCESS, end_line=True)
+
+    return failed
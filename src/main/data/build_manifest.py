@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+from src.main.configuration import config
+from src.main.configuration.variables import Paths
+from src.main.data.artwork import ArtworkIndex
+from src.main.data.card import Card
+from src.main.handler.document_handler import Template
+from src.main.utils.mtg import get_clean_name
+
+# Version of the layout of the manifest, and of everything else the outputs depend on that is not covered by a
+# fingerprint, manifests of other versions are ignored
+MANIFEST_VERSION = 1
+# Configuration the composed documents and exported PDFs depend on
+FINGERPRINT_CONFIG = ["CONFIG_PRINT_REMINDER_TEXT", "CONFIG_PRINT_FLAVOR_TEXT", "CONFIG_COMPOSE_AUTOFIT",
+                      "CONFIG_TEXT_MEASURER", "CONFIG_RENDERING_BACKEND", "CONFIG_FRONT_ID", "CONFIG_BACK_ID"]
+
+
+def get_document_path(card: Card) -> str:
+    """
+    Returns the path of the composed document of a card.
+    :param card: The card
+    :return: The path
+    """
+    return Paths.DOCUMENTS + "/" + card.set.upper() + "/" + card.collector_number + " - " + \
+        get_clean_name(card.name) + ".idml"
+
+
+def get_pdf_path(card: Card) -> str:
+    """
+    Returns the path of the exported PDF of a card.
+    :param card: The card
+    :return: The path
+    """
+    return Paths.PDF + "/" + card.set.upper() + "/" + card.collector_number + " - " + get_clean_name(card.name) + ".pdf"
+
+
+class BuildManifest:
+    """
+    Record of the inputs each output (composed document or exported PDF) was built from, stored as JSON. An output only
+    has to be built again if the fingerprint of its inputs changed or the file is missing.
+    """
+
+    _instance = None
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        self.outputs = dict()
+
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+            if isinstance(manifest, dict) and manifest.get("version") == MANIFEST_VERSION:
+                self.outputs = manifest["outputs"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    @classmethod
+    def get_standard_manifest(cls) -> BuildManifest:
+        """
+        Returns the manifest of the root folder.
+        :return: The manifest
+        """
+        if cls._instance is None:
+            cls._instance = BuildManifest(Paths.FILE_BUILD_MANIFEST)
+        return cls._instance
+
+    def is_current(self, path_output: str, fingerprint: str) -> bool:
+        """
+        Checks whether an output exists and was built from the given inputs.
+        :param path_output: Path of the output
+        :param fingerprint: Fingerprint of the inputs
+        :return: Whether the output does not have to be built again
+        """
+        return self.outputs.get(path_output) == fingerprint and os.path.isfile(path_output)
+
+    def update(self, path_output: str, fingerprint: str) -> None:
+        """
+        Records that an output was built from the given inputs. Changes are only persisted by `save`.
+        :param path_output: Path of the output
+        :param fingerprint: Fingerprint of the inputs
+        """
+        self.outputs[path_output] = fingerprint
+
+    def save(self) -> None:
+        """
+        Writes the manifest to disk.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Write to a temporary file first, so an interrupted write never leaves a corrupted manifest behind
+        with open(self.path + ".part", "w", encoding="utf-8") as file:
+            json.dump({"version": MANIFEST_VERSION, "outputs": self.outputs}, file, indent=1, sort_keys=True)
+        os.replace(self.path + ".part", self.path)
+
+
+def get_fingerprint(card: Card, options: dict = None, artwork_faces: [Card] = None) -> str:
+    """
+    Computes the fingerprint of everything the document and PDF of a card depend on: The data of the card, the options
+    of its decklist entry, the template, the relevant configuration and the artwork files.
+    :param card: The card
+    :param options: Options of the decklist entry
+    :param artwork_faces: Faces of the card whose artwork is used
+    :return: The fingerprint
+    """
+    artwork = []
+    for face in artwork_faces if artwork_faces is not None else []:
+        entry = ArtworkIndex.get_standard_index().get(face)
+        if entry is None:
+            artwork.append(None)
+            continue
+        path_file = entry[0] + "/" + entry[1]
+        try:
+            stat = os.stat(path_file)
+            artwork.append([path_file, stat.st_size, stat.st_mtime_ns])
+        except OSError:
+            artwork.append(None)
+
+    inputs = {"card": card.data,
+              "options": options if options is not None else dict(),
+              "template": Template.load(Paths.FILE_TEMPLATE).hash,
+              "config": {name: getattr(config, name) for name in FINGERPRINT_CONFIG},
+              "artwork": artwork}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
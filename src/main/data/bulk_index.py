@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import codecs
+import json
+import os
+import sqlite3
+from typing import Generator
+
+from src.main.configuration.config import CONFIG_CARD_LANGUAGE
+from src.main.utils.info import show_info, Info_Mode
+
+# Characters that may occur between the elements of the top-level array of a bulk data file
+_SEPARATORS = " \t\r\n,[\ufeff"
+# Version of the layout of the index, indices of other versions are built again
+INDEX_VERSION = 2
+
+
+def iterate_bulk_file(path: str, chunk_size: int = 1 << 20) -> Generator:
+    """
+    Streams the cards contained in a Scryfall bulk data file, without loading the whole array into memory.
+    :param path: Path to the bulk data file
+    :param chunk_size: Amount of bytes to read at once
+    :return: A generator for tuples containing the data of a card, its byte offset in the file and its length in bytes
+    """
+    decoder = json.JSONDecoder()
+    reader = codecs.getincrementaldecoder("utf-8")()
+
+    with open(path, "rb") as file:
+        buffer = ""
+        index = 0
+        offset = 0
+        end_of_file = False
+
+        while True:
+            # Skip separators, reading more data if the buffer is exhausted
+            while True:
+                while index < len(buffer) and buffer[index] in _SEPARATORS:
+                    offset += len(buffer[index].encode("utf-8"))
+                    index += 1
+                if index < len(buffer) or end_of_file:
+                    break
+                chunk = file.read(chunk_size)
+                end_of_file = len(chunk) == 0
+                buffer = buffer[index:] + reader.decode(chunk, final=end_of_file)
+                index = 0
+
+            if index >= len(buffer) or buffer[index] == "]":
+                return
+
+            try:
+                data, end = decoder.raw_decode(buffer, index)
+            except json.JSONDecodeError:
+                if end_of_file:
+                    raise
+                # Element is incomplete, extend the buffer
+                chunk = file.read(chunk_size)
+                end_of_file = len(chunk) == 0
+                buffer = buffer[index:] + reader.decode(chunk, final=end_of_file)
+                index = 0
+                continue
+
+            length = len(buffer[index:end].encode("utf-8"))
+            yield data, offset, length
+
+            offset += length
+            index = end
+
+
+class BulkIndex:
+    """
+    On-disk index over a Scryfall bulk data file. Stores the position of each card in the file by ID, by set and
+    collector number and by exact name, so single cards can be read from the file directly. Lookups by set and
+    collector number or by name prefer printings in the given language.
+    """
+
+    # Amount of rows to insert at once while building the index
+    _BATCH_SIZE = 10000
+
+    def __init__(self, path_bulk_file: str, path_index: str, language: str = CONFIG_CARD_LANGUAGE) -> None:
+        super().__init__()
+        self.path_bulk_file = path_bulk_file
+        self.language = language
+
+        os.makedirs(os.path.dirname(path_index), exist_ok=True)
+        # Cards are fetched on a background thread while the decklist is still being read
+        self._connection = sqlite3.connect(path_index, check_same_thread=False)
+        self._bulk_file = None
+
+        if not self._is_current():
+            self._build()
+
+        self._bulk_file = open(path_bulk_file, "rb")
+
+    def __del__(self):
+        if self._bulk_file is not None:
+            self._bulk_file.close()
+
+    def close(self) -> None:
+        """
+        Closes the bulk data file and the index, the index cannot be used afterwards.
+        """
+        if self._bulk_file is not None:
+            self._bulk_file.close()
+            self._bulk_file = None
+        self._connection.close()
+
+    def get_card(self, dictionary: dict) -> dict | None:
+        """
+        Looks up a card in the bulk data file.
+        :param dictionary: Contains information about the card to fetch
+        :return: The data of the card, `None` if it is not contained in the file
+        """
+        if "id" in dictionary:
+            card_id = dictionary["id"].lower()
+        elif "cn" in dictionary:
+            if "set" not in dictionary:
+                return None
+            card_id = self._query("SELECT id FROM prints WHERE code = ? AND collector_number = ?",
+                                  (dictionary["set"].lower(), dictionary["cn"].lower()))
+        else:
+            card_id = self._query("SELECT id FROM names WHERE name = ? AND code = ?",
+                                  (dictionary["name"].lower(), dictionary.get("set", "").lower()))
+
+        if card_id is None:
+            return None
+
+        row = self._connection.execute("SELECT offset, length FROM cards WHERE id = ?", (card_id,)).fetchone()
+        if row is None:
+            return None
+
+        self._bulk_file.seek(row[0])
+        return json.loads(self._bulk_file.read(row[1]).decode("utf-8"))
+
+    def _query(self, query: str, parameters: tuple) -> str | None:
+        row = self._connection.execute(query, parameters).fetchone()
+        return row[0] if row is not None else None
+
+    def _get_signature(self) -> str:
+        stat = os.stat(self.path_bulk_file)
+        return str(INDEX_VERSION) + ":" + self.language + ":" + os.path.abspath(self.path_bulk_file) + ":" + \
+            str(stat.st_size) + ":" + str(stat.st_mtime_ns)
+
+    def _is_current(self) -> bool:
+        """
+        Checks whether the index was built from the current version of the bulk data file.
+        :return: Whether the index can be used
+        """
+        try:
+            row = self._connection.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        except sqlite3.OperationalError:
+            return False
+        return row is not None and row[0] == self._get_signature()
+
+    def _build(self) -> None:
+        """
+        Builds the index by streaming the bulk data file once.
+        """
+        show_info("Building bulk data index...")
+
+        connection = self._connection
+        for table in ["meta", "cards", "prints", "names"]:
+            connection.execute("DROP TABLE IF EXISTS " + table)
+        connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        connection.execute("CREATE TABLE cards (id TEXT PRIMARY KEY, offset INTEGER NOT NULL, length INTEGER NOT NULL)")
+        connection.execute("CREATE TABLE prints (code TEXT NOT NULL, collector_number TEXT NOT NULL, id TEXT NOT NULL, "
+                           "rank TEXT NOT NULL, PRIMARY KEY (code, collector_number))")
+        connection.execute("CREATE TABLE names (name TEXT NOT NULL, code TEXT NOT NULL, id TEXT NOT NULL, "
+                           "rank TEXT NOT NULL, PRIMARY KEY (name, code))")
+
+        rows_cards, rows_prints, rows_names = [], [], []
+        amount = 0
+
+        for data, offset, length in iterate_bulk_file(self.path_bulk_file):
+            card_id = data["id"].lower()
+            code = data.get("set", "").lower()
+
+            # Printings in other languages share set, collector number and name with the one in the preferred language
+            rank_language = "1" if data.get("lang", "en") == self.language else "0"
+
+            rows_cards.append((card_id, offset, length))
+            rows_prints.append((code, data.get("collector_number", "").lower(), card_id, rank_language))
+
+            # Exact name lookups prefer the language, then paper printings, and among these the most recent one
+            rank = rank_language + ("1" if "paper" in data.get("games", []) else "0") + data.get("released_at", "")
+            names = {data.get("name", "").lower()}
+            names.update(face.get("name", "").lower() for face in data.get("card_faces", []))
+            for name in names:
+                rows_names.append((name, "", card_id, rank))
+                rows_names.append((name, code, card_id, rank))
+
+            amount += 1
+            if len(rows_cards) >= BulkIndex._BATCH_SIZE:
+                self._insert(rows_cards, rows_prints, rows_names)
+                show_info("Building bulk data index... (" + str(amount) + " cards)")
+
+        self._insert(rows_cards, rows_prints, rows_names)
+        connection.execute("INSERT INTO meta (key, value) VALUES ('signature', ?)", (self._get_signature(),))
+        connection.commit()
+
+        show_info("Built bulk data index (" + str(amount) + " cards)", mode=Info_Mode.SUCCESS, end_line=True)
+
+    def _insert(self, rows_cards: list, rows_prints: list, rows_names: list) -> None:
+        connection = self._connection
+        connection.executemany("INSERT OR REPLACE INTO cards (id, offset, length) VALUES (?, ?, ?)", rows_cards)
+        connection.executemany("INSERT INTO prints (code, collector_number, id, rank) VALUES (?, ?, ?, ?) "
+                               "ON CONFLICT (code, collector_number) DO UPDATE SET id = excluded.id, "
+                               "rank = excluded.rank WHERE excluded.rank > prints.rank", rows_prints)
+        connection.executemany("INSERT INTO names (name, code, id, rank) VALUES (?, ?, ?, ?) "
+                               "ON CONFLICT (name, code) DO UPDATE SET id = excluded.id, rank = excluded.rank "
+                               "WHERE excluded.rank > names.rank", rows_names)
+        rows_cards.clear()
+        rows_prints.clear()
+        rows_names.clear()
@@ -47,6 +47,9 @@ class Card:
         self.component = None
         self.side = None
 
+        # Data the card was generated from
+        self.data = None
+
     @staticmethod
     def generate(args: dict) -> Card:
         """
@@ -56,6 +59,7 @@ class Card:
         card = Card()
 
         card.id = args.get("id")
+        card.data = args
 
         card.cmc = args.get("cmc")
         card.color_identity = args.get("color_identity", [])
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+
+from src.main.configuration.config import CONFIG_CARD_CACHE_TTL
+from src.main.configuration.variables import Paths
+
+
+class CardCache:
+    """
+    Persistent cache for card data, backed by SQLite. Entries are keyed by the normalized information used to look up
+    a card, and store the raw data of the card together with the time it was fetched.
+    """
+
+    _instance = None
+
+    def __init__(self, path: str, ttl: float) -> None:
+        super().__init__()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Cards are fetched on a background thread while the decklist is still being read
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cards (key TEXT PRIMARY KEY, data TEXT NOT NULL, fetched REAL NOT NULL)")
+        self._connection.commit()
+
+    @classmethod
+    def get_standard_cache(cls) -> CardCache:
+        """
+        Returns the default cache.
+        :return: The default cache
+        """
+        if cls._instance is None:
+            cls._instance = CardCache(Paths.FILE_CARD_CACHE, CONFIG_CARD_CACHE_TTL)
+        return cls._instance
+
+    def get(self, key: str) -> (dict, bool) | None:
+        """
+        Looks up the data stored for the given key.
+        :param key: Key of the card
+        :return: The data of the card and whether it is still fresh, `None` if the card is not cached
+        """
+        row = self._connection.execute("SELECT data, fetched FROM cards WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), time.time() - row[1] < self.ttl
+
+    def put(self, key: str, data: dict) -> None:
+        """
+        Stores the data of a card under the given key, as well as under the ID of the card.
+        :param key: Key of the card
+        :param data: Raw data of the card
+        """
+        serialized = json.dumps(data)
+        fetched = time.time()
+        keys = {key}
+        if "id" in data:
+            keys.add(CardCache.get_key({"id": data["id"]}))
+
+        self._connection.executemany("INSERT OR REPLACE INTO cards (key, data, fetched) VALUES (?, ?, ?)",
+                                     [(k, serialized, fetched) for k in keys])
+        self._connection.commit()
+
+    def close(self) -> None:
+        """
+        Closes the database, the cache cannot be used afterwards.
+        """
+        self._connection.close()
+
+    @staticmethod
+    def get_key(dictionary: dict) -> str | None:
+        """
+        Returns the normalized key for the given lookup information.
+        :param dictionary: Contains information about the card to fetch
+        :return: The key, `None` if the information does not identify a card
+        """
+        if "id" in dictionary:
+            return "id:" + dictionary["id"].lower()
+        elif "cn" in dictionary:
+            if "set" not in dictionary:
+                return None
+            return "cn:" + dictionary["set"].lower() + "/" + dictionary["cn"].lower()
+        elif "set" in dictionary:
+            return "name:" + dictionary["name"].lower() + "/" + dictionary["set"].lower()
+        else:
+            return "name:" + dictionary["name"].lower()
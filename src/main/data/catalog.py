@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+
+import requests
+
+from src.main.configuration.config import API_URL, CONFIG_CATALOG_TTL
+from src.main.configuration.variables import Paths
+from src.main.utils.info import show_info, Info_Mode
+from src.main.utils.rate_limiter import TokenBucket
+
+# Version of the layout of cached catalog files, cached files of other versions are ignored
+CATALOG_VERSION = 1
+# Snapshot of the ability word catalog shipped with ProxKy, used if the catalog can neither be fetched nor read from
+# the cache
+FILE_ABILITY_WORDS_SNAPSHOT = os.path.join(os.path.dirname(__file__), os.pardir, "resources", "ability_words.json")
+
+
+def get_ability_words() -> [str]:
+    """
+    Returns the catalog of ability words. The catalog is read from the local cache and only fetched from Scryfall if
+    the cached copy is missing or older than `CONFIG_CATALOG_TTL`. If fetching fails, a stale cached copy or the
+    bundled snapshot is used instead.
+    :return: List of all ability words
+    """
+    return _get_catalog("ability-words", Paths.FILE_ABILITY_WORDS, FILE_ABILITY_WORDS_SNAPSHOT)
+
+
+def _get_catalog(name: str, path: str, path_snapshot: str) -> [str]:
+    """
+    Returns a Scryfall catalog, following the refresh policy described in `get_ability_words`.
+    :param name: Name of the catalog on Scryfall
+    :param path: Path of the cached copy
+    :param path_snapshot: Path of the bundled snapshot
+    :return: Content of the catalog
+    """
+    cached = _read_catalog(path)
+    if cached is not None and time.time() - cached["fetched"] < CONFIG_CATALOG_TTL:
+        return cached["data"]
+
+    try:
+        TokenBucket.get_scryfall_bucket().acquire()
+        response = requests.get(API_URL + "/catalog/" + name, timeout=10)
+        response.raise_for_status()
+        data = response.json()["data"]
+    except (requests.RequestException, ValueError, KeyError) as e:
+        fallback = cached if cached is not None else _read_catalog(path_snapshot)
+        if fallback is None:
+            raise
+        show_info("Could not fetch catalog " + name + " (" + type(e).__name__ + "), using " +
+                  ("cached" if cached is not None else "bundled") + " copy", mode=Info_Mode.WARN, end_line=True)
+        return fallback["data"]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"version": CATALOG_VERSION, "fetched": time.time(), "data": data}, file)
+
+    return data
+
+
+def _read_catalog(path: str) -> dict | None:
+    """
+    Reads a catalog file.
+    :param path: Path of the file
+    :return: Content of the file, `None` if it does not exist, is unreadable or of another version
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            catalog = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(catalog, dict) or catalog.get("version") != CATALOG_VERSION:
+        return None
+    return catalog
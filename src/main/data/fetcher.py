@@ -1,15 +1,22 @@
 from __future__ import annotations
 
 import json
-import time
+import threading
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
 
 import requests
 
-from src.main.configuration.config import CONFIG_CARD_DATA_FETCHER, API_URL
+from src.main.configuration.config import CONFIG_CARD_DATA_FETCHER, API_URL, CONFIG_CARD_CACHE, \
+    CONFIG_BULK_DATA_FILE, CONFIG_FETCHER_CONCURRENCY
+from src.main.configuration.variables import Paths
+from src.main.data.bulk_index import BulkIndex
 from src.main.data.card import Card
+from src.main.data.card_cache import CardCache
 from src.main.utils.info import show_info, Info_Mode
+from src.main.utils.misc import divide_into_chunks
+from src.main.utils.rate_limiter import TokenBucket
 
 
 class Fetcher(ABC):
@@ -17,65 +24,388 @@ class Fetcher(ABC):
     Abstract class that fetches information from a specific source, determined by the specific subclass.
     """
 
+    _instance = None
+
     def __init__(self) -> None:
         super().__init__()
-        self._time_last_fetched = 0
-        self._limit = 0
+        self._rate_limiter = None
+        self.cache = CardCache.get_standard_cache() if CONFIG_CARD_CACHE else None
+        self.refresh = False
+        # Amount of cards best passed to `fetch_cards` at once
+        self.batch_size = 75
 
     def fetch_card(self, dictionary: dict) -> Card:
         """
-        Fetches a card from a source using the given information.
+        Fetches a card from a source using the given information. Fresh cached data is used if available.
         :param dictionary: Contains information about the card to fetch
         :return: The found card
         """
-        if (time.time() - self._time_last_fetched) * 1000 < self._limit:
-            time.sleep((time.time() - self._time_last_fetched))
-            self._time_last_fetched = time.time()
-        return self._fetch_card_internal(dictionary)
+        key, cached = self._lookup(dictionary)
+        if cached is not None and cached[1]:
+            return Card.generate(cached[0])
+
+        self._wait_for_limit()
+        return self._resolve(dictionary, key, cached, self._fetch_card_internal(dictionary))
+
+    def fetch_cards(self, dictionaries: [dict]) -> [Card]:
+        """
+        Fetches several cards from a source using the given information. Fresh cached data is used if available.
+        :param dictionaries: Each entry contains information about one card to fetch
+        :return: The found cards, in the order of the given dictionaries, `None` for cards that could not be found
+        """
+        cards = [None] * len(dictionaries)
+        missing = []
+
+        for i, dictionary in enumerate(dictionaries):
+            key, cached = self._lookup(dictionary)
+            if cached is not None and cached[1]:
+                cards[i] = Card.generate(cached[0])
+            else:
+                missing.append((i, key, cached))
+
+        if len(missing) > 0:
+            results = self._fetch_cards_internal([dictionaries[entry[0]] for entry in missing])
+            for (i, key, cached), data in zip(missing, results):
+                cards[i] = self._resolve(dictionaries[i], key, cached, data)
+
+        return cards
+
+    def _lookup(self, dictionary: dict) -> (str, (dict, bool)):
+        """
+        Looks up the cached data of a card.
+        :param dictionary: Contains information about the card to fetch
+        :return: Key of the card and its cached data together with whether it is fresh, if available
+        """
+        key = CardCache.get_key(dictionary)
+        if self.cache is None or key is None:
+            return key, None
+
+        cached = self.cache.get(key)
+        if cached is not None and self.refresh:
+            cached = cached[0], False
+
+        if cached is not None and cached[1]:
+            self.cache.hits += 1
+        else:
+            self.cache.misses += 1
+
+        return key, cached
+
+    def _resolve(self, dictionary: dict, key: str, cached: (dict, bool), data: dict) -> Card | None:
+        """
+        Creates the card from freshly fetched data, falling back to outdated cached data if the card could not be
+        fetched.
+        :param dictionary: Contains information about the card to fetch
+        :param key: Key of the card
+        :param cached: Cached data of the card, if available
+        :param data: Fetched data of the card, if available
+        :return: The card
+        """
+        if data is not None:
+            if self.cache is not None and key is not None:
+                self.cache.put(key, data)
+            return Card.generate(data)
+
+        if cached is not None:
+            show_info("Using outdated cached data", prefix=dictionary.get("name", "Unknown"), mode=Info_Mode.WARN,
+                      end_line=True)
+            return Card.generate(cached[0])
+
+        return None
+
+    def _wait_for_limit(self) -> None:
+        """
+        Blocks until the rate limiter of the source allows another request.
+        """
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
 
     @abstractmethod
-    def _fetch_card_internal(self, dictionary: dict) -> Card:
+    def _fetch_card_internal(self, dictionary: dict) -> dict | None:
+        """
+        Fetches the raw data of a card from the source.
+        :param dictionary: Contains information about the card to fetch
+        :return: The data of the card, `None` if it could not be found
+        """
         pass
 
+    def _fetch_cards_internal(self, dictionaries: [dict]) -> [dict]:
+        """
+        Fetches the raw data of several cards from the source.
+        :param dictionaries: Each entry contains information about one card to fetch
+        :return: The data of the cards, `None` for cards that could not be found
+        """
+        results = []
+        for dictionary in dictionaries:
+            self._wait_for_limit()
+            results.append(self._fetch_card_internal(dictionary))
+        return results
+
     @classmethod
     def get_standard_fetcher(cls) -> Fetcher:
         """
         Returns the default fetcher.
         :return: The default fetcher
         """
-        if CONFIG_CARD_DATA_FETCHER == "scryfall":
-            return ScryfallFetcher()
-        else:
-            raise NotImplementedError
+        if Fetcher._instance is None:
+            if CONFIG_CARD_DATA_FETCHER == "scryfall":
+                Fetcher._instance = ScryfallFetcher()
+            elif CONFIG_CARD_DATA_FETCHER == "scryfall_concurrent":
+                Fetcher._instance = ConcurrentScryfallFetcher()
+            elif CONFIG_CARD_DATA_FETCHER == "bulk":
+                Fetcher._instance = BulkFetcher()
+            else:
+                raise NotImplementedError
+        return Fetcher._instance
 
 
 class ScryfallFetcher(Fetcher):
+    """
+    Fetcher retrieving cards from the Scryfall API, one request after the other.
+    """
+
+    # Maximum amount of identifiers Scryfall accepts in a single collection request
+    COLLECTION_SIZE = 75
 
     def __init__(self) -> None:
         super().__init__()
-        self._limit = 100
+        # All Scryfall fetchers share one limiter, as the limit applies to the client as a whole
+        self._rate_limiter = TokenBucket.get_scryfall_bucket()
+        self._local = threading.local()
+        self.batch_size = ScryfallFetcher.COLLECTION_SIZE
+
+    def _fetch_cards_internal(self, dictionaries: [dict]) -> [dict]:
+        identifiers = self._group_identifiers(dictionaries)
+        chunks = list(divide_into_chunks(list(identifiers.keys()), ScryfallFetcher.COLLECTION_SIZE))
+
+        responses = []
+        for chunk in chunks:
+            self._wait_for_limit()
+            responses.append(self._post_collection(chunk))
+
+        return self._assign_collections(dictionaries, identifiers, chunks, responses)
+
+    def _group_identifiers(self, dictionaries: [dict]) -> dict:
+        """
+        Groups the given entries by their identifier, so each card is requested only once.
+        :param dictionaries: Each entry contains information about one card to fetch
+        :return: Mapping from the identifiers, as sorted tuple of items, to the indices of the entries
+        """
+        identifiers = dict()
+        for i, dictionary in enumerate(dictionaries):
+            identifier = self._get_identifier(dictionary)
+            if identifier is None:
+                show_info("Set not provided", prefix=dictionary.get("name", "Unknown"), mode=Info_Mode.ERROR,
+                          end_line=True)
+                continue
+            identifiers.setdefault(tuple(sorted(identifier.items())), []).append(i)
+        return identifiers
+
+    def _post_collection(self, chunk: [tuple]) -> dict | None:
+        """
+        Requests the given identifiers from the collection endpoint. Does not wait for the rate limiter.
+        :param chunk: Identifiers to request, as sorted tuple of items
+        :return: The response, containing the data of the found cards in the order of the request and the identifiers
+        that were not found, `None` if the request failed
+        """
+        try:
+            response = self._get_session().post(API_URL + "/cards/collection",
+                                                json={"identifiers": [dict(identifier) for identifier in chunk]})
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        return json.loads(response.text)
+
+    @staticmethod
+    def _assign_collections(dictionaries: [dict], identifiers: dict, chunks: [[tuple]],
+                            responses: [dict | None]) -> [dict]:
+        """
+        Maps the responses of the collection endpoint back to the requested entries.
+        :param dictionaries: Each entry contains information about one card to fetch
+        :param identifiers: Mapping from the identifiers to the indices of the entries
+        :param chunks: Identifiers of each request
+        :param responses: Response to each request, `None` for failed requests
+        :return: The data of the cards, `None` for cards that could not be found
+        """
+        results = [None] * len(dictionaries)
+
+        for chunk, response in zip(chunks, responses):
+            found = dict()
+            if response is not None:
+                # Found cards are returned in the order of the request, identifiers not found are listed separately
+                not_found = {_get_identifier_key(identifier) for identifier in response.get("not_found", [])}
+                requested = [identifier for identifier in chunk
+                             if _get_identifier_key(dict(identifier)) not in not_found]
+                data = response.get("data", [])
 
-    def _fetch_card_internal(self, dictionary: dict) -> Card | None:
+                if len(requested) == len(data):
+                    found = dict(zip(requested, data))
+                else:
+                    # The response is inconsistent with the request, match the cards by their identifiers instead
+                    for identifier in requested:
+                        found[identifier] = next((card_data for card_data in data
+                                                  if _matches_identifier(dict(identifier), card_data)), None)
+
+            for identifier in chunk:
+                for i in identifiers[identifier]:
+                    results[i] = found.get(identifier)
+                    if results[i] is None:
+                        show_info("Could not fetch card", prefix=dictionaries[i].get("name", "Unknown"),
+                                  mode=Info_Mode.ERROR, end_line=True)
+
+        return results
+
+    def _get_session(self) -> requests.Session:
+        """
+        Returns the HTTP session of the current thread, sessions keep connections to Scryfall open between requests.
+        :return: The session
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    @staticmethod
+    def _get_identifier(dictionary: dict) -> dict | None:
+        """
+        Converts the given information to a card identifier of the Scryfall collection endpoint.
+        :param dictionary: Contains information about the card to fetch
+        :return: The identifier, `None` if the information is not sufficient
+        """
+        if "id" in dictionary:
+            return {"id": dictionary["id"]}
+        elif "cn" in dictionary:
+            if "set" not in dictionary:
+                return None
+            return {"set": dictionary["set"].lower(), "collector_number": dictionary["cn"]}
+        elif "set" in dictionary:
+            return {"name": dictionary["name"], "set": dictionary["set"].lower()}
+        else:
+            return {"name": dictionary["name"]}
+
+    def _fetch_card_internal(self, dictionary: dict) -> dict | None:
         if "id" in dictionary:
-            response = requests.get(API_URL + "/cards/" + urllib.parse.quote(dictionary["id"]))
+            url = API_URL + "/cards/" + urllib.parse.quote(dictionary["id"])
         elif "cn" in dictionary:
             if "set" not in dictionary:
                 show_info("Set not provided", prefix=dictionary.get("name", "Unknown"), mode=Info_Mode.ERROR)
                 return None
 
-            response = requests.get(
-                API_URL + "/cards/" + urllib.parse.quote(dictionary["set"].lower()) + "/" + urllib.parse.quote(
-                    dictionary["cn"]))
+            url = API_URL + "/cards/" + urllib.parse.quote(dictionary["set"].lower()) + "/" + urllib.parse.quote(
+                dictionary["cn"])
         elif "set" in dictionary:
-            response = requests.get(
-                API_URL + "/cards/named?exact=" + urllib.parse.quote(dictionary["name"]) + "&set=" + urllib.parse.quote(
-                    dictionary["set"]))
+            url = API_URL + "/cards/named?exact=" + urllib.parse.quote(dictionary["name"]) + "&set=" + \
+                urllib.parse.quote(dictionary["set"])
         else:
-            response = requests.get(
-                API_URL + "/cards/named?exact=" + urllib.parse.quote(dictionary["name"]))
+            url = API_URL + "/cards/named?exact=" + urllib.parse.quote(dictionary["name"])
 
-        if response.status_code != 200:
-            show_info("Could not fetch card", prefix=dictionary.get("name", "Unknown"), mode=Info_Mode.ERROR)
+        try:
+            response = self._get_session().get(url)
+        except requests.RequestException:
+            # Outdated cached data is used instead, if available
+            response = None
+
+        if response is None or response.status_code != 200:
+            show_info("Could not fetch card", prefix=dictionary.get("name", "Unknown"), mode=Info_Mode.ERROR,
+                      end_line=True)
             return None
 
-        return Card.generate(json.loads(response.text))
+        return json.loads(response.text)
+
+
+class ConcurrentScryfallFetcher(ScryfallFetcher):
+    """
+    Fetcher retrieving cards from the Scryfall API with concurrent requests, sent from a pool of threads with one
+    keep-alive session each. The amount of requests is bounded only by the shared rate limiter and the given
+    concurrency.
+    """
+
+    def __init__(self, concurrency: int = CONFIG_FETCHER_CONCURRENCY) -> None:
+        super().__init__()
+        self.concurrency = concurrency
+        # Enough cards for one collection request per concurrent request
+        self.batch_size = ScryfallFetcher.COLLECTION_SIZE * concurrency
+
+    def _fetch_cards_internal(self, dictionaries: [dict]) -> [dict]:
+        identifiers = self._group_identifiers(dictionaries)
+        chunks = list(divide_into_chunks(list(identifiers.keys()), ScryfallFetcher.COLLECTION_SIZE))
+
+        # Entries without collection identifier have already been reported
+        if len(chunks) == 0:
+            return [None] * len(dictionaries)
+
+        responses = self._run_concurrently(self._post_collection, chunks)
+        return self._assign_collections(dictionaries, identifiers, chunks, responses)
+
+    def _run_concurrently(self, function, arguments: list) -> list:
+        """
+        Calls the given function once for every argument, in worker threads. Each call waits for the rate limiter
+        first.
+        :param function: Function performing a single request
+        :param arguments: Arguments to call the function with
+        :return: The results of the calls, in the order of the arguments
+        """
+        # Tokens are only taken once a worker is free, so requests are sent right after passing the limiter
+        def call(argument):
+            self._wait_for_limit()
+            return function(argument)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(call, arguments))
+
+
+class BulkFetcher(Fetcher):
+    """
+    Fetcher that serves cards from a local Scryfall bulk data file, without any network access.
+    """
+
+    def __init__(self, path: str = CONFIG_BULK_DATA_FILE) -> None:
+        super().__init__()
+        # Lookups are local, caching them would only duplicate the bulk data
+        self.cache = None
+        self._index = BulkIndex(path, Paths.FILE_BULK_INDEX)
+
+    def _fetch_card_internal(self, dictionary: dict) -> dict | None:
+        if "cn" in dictionary and "set" not in dictionary:
+            show_info("Set not provided", prefix=dictionary.get("name", "Unknown"), mode=Info_Mode.ERROR,
+                      end_line=True)
+            return None
+
+        data = self._index.get_card(dictionary)
+
+        if data is None:
+            show_info("Could not find card in bulk data", prefix=dictionary.get("name", "Unknown"),
+                      mode=Info_Mode.ERROR, end_line=True)
+
+        return data
+
+
+def _get_identifier_key(identifier: dict) -> tuple:
+    """
+    Returns a key of an identifier of the collection endpoint, equal for identifiers differing only in case.
+    :param identifier: The identifier
+    :return: The key
+    """
+    return tuple(sorted((key, value.lower() if isinstance(value, str) else value) for key, value in identifier.items()))
+
+
+def _matches_identifier(identifier: dict, card_data: dict) -> bool:
+    """
+    Checks whether the data of a card returned by Scryfall corresponds to the given identifier.
+    :param identifier: Identifier the card was requested with
+    :param card_data: Data of the card
+    :return: Whether the card corresponds to the identifier
+    """
+    if "id" in identifier:
+        return identifier["id"] == card_data.get("id")
+    if "set" in identifier and identifier["set"] != card_data.get("set", "").lower():
+        return False
+    if "collector_number" in identifier:
+        return identifier["collector_number"] == card_data.get("collector_number")
+
+    name = identifier["name"].lower()
+    names = [card_data.get("name", "").lower()]
+    names.extend(face.get("name", "").lower() for face in card_data.get("card_faces", []))
+    return name in names
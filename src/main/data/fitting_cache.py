@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+
+from src.main.configuration.variables import Paths
+
+
+class FittingCache:
+    """
+    Persistent record of how far the text frames of a card had to be shrunk to fit, backed by SQLite. Only the last fits
+    of each card are kept, together with the fingerprint of the inputs the card was composed from (see
+    `get_fingerprint`), as a change of the card data, template or configuration invalidates them.
+    """
+
+    _instance = None
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS fittings (card_id TEXT PRIMARY KEY, "
+                                 "fingerprint TEXT NOT NULL, data TEXT NOT NULL)")
+        self._connection.commit()
+
+    @classmethod
+    def get_standard_cache(cls) -> FittingCache:
+        """
+        Returns the default cache.
+        :return: The default cache
+        """
+        if cls._instance is None:
+            cls._instance = FittingCache(Paths.FILE_FITTING_CACHE)
+        return cls._instance
+
+    def get(self, card_id: str, fingerprint: str) -> dict:
+        """
+        Returns the fits stored for a card.
+        :param card_id: ID of the card
+        :param fingerprint: Fingerprint of the inputs the card was composed from
+        :return: Mapping from frame groups to the amount of steps they were shrunk by, empty if nothing is stored for
+        these inputs
+        """
+        row = self._connection.execute("SELECT data FROM fittings WHERE card_id = ? AND fingerprint = ?",
+                                       (card_id, fingerprint)).fetchone()
+        return json.loads(row[0]) if row is not None else dict()
+
+    def put(self, card_id: str, fingerprint: str, fits: dict) -> None:
+        """
+        Stores the fits of a card, replacing those stored for other inputs.
+        :param card_id: ID of the card
+        :param fingerprint: Fingerprint of the inputs the card was composed from
+        :param fits: Mapping from frame groups to the amount of steps they were shrunk by
+        """
+        self._connection.execute("INSERT OR REPLACE INTO fittings (card_id, fingerprint, data) VALUES (?, ?, ?)",
+                                 (card_id, fingerprint, json.dumps(fits)))
+        self._connection.commit()
+
+    def close(self) -> None:
+        """
+        Closes the database, the cache cannot be used afterwards.
+        """
+        self._connection.close()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from xml.etree import ElementTree
+
+from PIL import Image  # Pillow
+
+from src.main.configuration.variables import Paths
+
+
+class GraphicCache:
+    """
+    Persistent cache for the dimensions of graphics, backed by SQLite. Entries are keyed by the path of the file and
+    validated by its size and modification time. Each file is validated once per run, later lookups are served from
+    memory.
+    """
+
+    _instance = None
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self._pid = os.getpid()
+        self._memory = dict()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Worker processes share the database, wait for each other instead of failing
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS graphics (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                                 "mtime INTEGER NOT NULL, width REAL NOT NULL, height REAL NOT NULL)")
+        self._connection.commit()
+
+    @classmethod
+    def get_standard_cache(cls) -> GraphicCache:
+        """
+        Returns the default cache, creating a new one in worker processes, as connections cannot be shared.
+        :return: The default cache
+        """
+        if cls._instance is None or cls._instance._pid != os.getpid():
+            cls._instance = GraphicCache(Paths.FILE_GRAPHIC_CACHE)
+        return cls._instance
+
+    def get_dimensions(self, path_file: str) -> (float, float):
+        """
+        Returns the dimensions of a graphic, i.e. the size of the viewBox for SVG files and the size in pixels for
+        raster images.
+        :param path_file: Path to the file
+        :return: Width and height of the graphic
+        """
+        dimensions = self._memory.get(path_file)
+        if dimensions is not None:
+            return dimensions
+
+        stat = os.stat(path_file)
+        row = self._connection.execute("SELECT width, height FROM graphics WHERE path = ? AND size = ? AND mtime = ?",
+                                       (path_file, stat.st_size, stat.st_mtime_ns)).fetchone()
+        if row is not None:
+            dimensions = row[0], row[1]
+        else:
+            dimensions = _read_dimensions(path_file)
+            self._connection.execute("INSERT OR REPLACE INTO graphics (path, size, mtime, width, height) "
+                                     "VALUES (?, ?, ?, ?, ?)",
+                                     (path_file, stat.st_size, stat.st_mtime_ns, dimensions[0], dimensions[1]))
+            self._connection.commit()
+
+        self._memory[path_file] = dimensions
+        return dimensions
+
+    def close(self) -> None:
+        """
+        Closes the database, the cache cannot be used afterwards.
+        """
+        self._connection.close()
+
+
+def _read_dimensions(path_file: str) -> (float, float):
+    """
+    Reads the dimensions of a graphic from its file. Only the root element of SVG files and only the header of raster
+    images are read.
+    :param path_file: Path to the file
+    :return: Width and height of the graphic
+    """
+    if path_file.lower().endswith(".svg"):
+        for _, element in ElementTree.iterparse(path_file, events=("start",)):
+            values = element.attrib["viewBox"].split(" ")
+            return float(values[2]), float(values[3])
+
+    # Opening an image only reads its header, pixel data is decoded on first access
+    with Image.open(path_file) as img:
+        return img.size
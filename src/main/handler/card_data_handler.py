@@ -1,65 +1,54 @@
 import math
-import os
 import re
 
-import requests
-
 from src.main.configuration.config import CONFIG_PRINT_REMINDER_TEXT, CONFIG_PRINT_FLAVOR_TEXT
-from src.main.configuration.variables import Ids, Fonts, MANA_MAPPING, Regex, COLOR_MAPPING, Paths, IMAGE_TYPES, \
-    Distances
+from src.main.configuration.variables import Ids, Fonts, MANA_MAPPING, Regex, COLOR_MAPPING, Paths, Distances, \
+    FITTING_LABEL
+from src.main.data.artwork import ArtworkIndex, download_artwork
 from src.main.data.card import Card
-from src.main.handler.indesign_handler import InDesignHandler
+from src.main.handler.document_handler import Document
+from src.main.handler.text_measurer import TextMeasurer, LocalTextMeasurer, get_fitting_steps, shrink_text
 from src.main.handler.xml_handler import set_text_field, set_gradient, set_graphic, set_visibility, get_coordinates, \
-    set_coordinates
-from src.main.utils.info import show_info, Info_Mode
-from src.main.utils.misc import split_string_along_regex, split_string_reminder, mm_to_pt, check_exists
+    set_coordinates, get_text_area, get_text_insets, set_label
+from src.main.utils.misc import split_string_along_regex, split_string_reminder, mm_to_pt
 from src.main.utils.mtg import sort_mana_array, get_card_types
+from src.main.utils.profiler import profiled
+from src.main.utils.progress import report_progress
 
 
-def set_artwork(card: Card, id_set: dict) -> None:
+@profiled
+def set_artwork(document: Document, card: Card, id_set: dict) -> None:
     """
     Sets the artwork of a card.
+    :param document: Document to modify
     :param card: Card to set the artwork for
     :param id_set: Which ID set to use
     """
-    show_info("Processing artwork...", prefix=card.name)
-
-    filename = str(card.collector_number) + " - " + card.name
-    path = Paths.ARTWORK + "/" + card.set.upper()
-    image_type = "na"
-
-    for possible_image_type in IMAGE_TYPES:
-        if check_exists(path + "/" + filename + "." + possible_image_type):
-            image_type = possible_image_type
-            break
-
-    if image_type == "na":
-        if "art_crop" not in card.image_uris:
-            show_info("No artwork on Scryfall", prefix=card.name, mode=Info_Mode.ERROR, end_line=True)
-            return
-
-        response = requests.get(card.image_uris["art_crop"])
+    report_progress(card.name, "artwork")
 
-        if response.status_code != 200:
-            show_info("Could not download artwork", prefix=card.name, mode=Info_Mode.ERROR, end_line=True)
+    # Artwork is usually downloaded by the prefetch stage, download it now if this did not happen
+    index = ArtworkIndex.get_standard_index()
+    artwork = index.get(card)
+    if artwork is None:
+        if not download_artwork(card):
             return
+        artwork = index.get(card)
 
-        os.makedirs(Paths.ARTWORK_DOWNLOADED + "/" + card.set.upper(), exist_ok=True)
-        with open(Paths.ARTWORK_DOWNLOADED + "/" + card.set.upper() + "/" + filename + ".jpg", "wb") as handler:
-            path = Paths.ARTWORK_DOWNLOADED + "/" + card.set.upper()
-            image_type = "jpg"
-            handler.write(response.content)
+    path, filename = artwork
+    name, _, image_type = filename.rpartition(".")
+    set_graphic(document, id_set[Ids.ARTWORK_O], id_set[Ids.SPREAD], path, name, type_file=image_type,
+                mode_scale="stretch")
 
-    set_graphic(id_set[Ids.ARTWORK_O], id_set[Ids.SPREAD], path, filename, type_file=image_type, mode_scale="stretch")
 
-
-def set_type_icon(card: Card, id_set: dict) -> None:
+@profiled
+def set_type_icon(document: Document, card: Card, id_set: dict) -> None:
     """
     Sets the icon of a card.
+    :param document: Document to modify
     :param card: Card to set the icon for
     :param id_set: Which ID set to use
     """
-    show_info("Processing card icon...", prefix=card.name)
+    report_progress(card.name, "card icon")
 
     types = get_card_types(card)
     if "Legendary" in types:
@@ -76,54 +65,60 @@ def set_type_icon(card: Card, id_set: dict) -> None:
     else:
         card_type = types[0]
 
-    set_graphic(id_set[Ids.TYPE_ICON_O], id_set[Ids.SPREAD], Paths.CARD_TYPES, card_type.lower())
+    set_graphic(document, id_set[Ids.TYPE_ICON_O], id_set[Ids.SPREAD], Paths.CARD_TYPES, card_type.lower())
 
 
-def set_card_name(card: Card, id_set: dict, font_settings: dict = None) -> None:
+@profiled
+def set_card_name(document: Document, card: Card, id_set: dict, font_settings: dict = None) -> None:
     """
     Sets the name and title of a card.
+    :param document: Document to modify
     :param card: Card to set the name for
     :param id_set: Which ID set to use
     :param font_settings: Overrides the standard font settings
     """
-    show_info("Processing card name...", prefix=card.name)
+    report_progress(card.name, "card name")
 
     content_dict = {"content": card.name}
     content_dict.update(Fonts.TITLE)
     if font_settings is not None:
         content_dict.update(font_settings)
-    set_text_field(id_set[Ids.TITLE_T], [([content_dict], None)])
+    set_text_field(document, id_set[Ids.TITLE_T], [([content_dict], None)])
 
     # Check for e.g. split cards
     if Ids.NAME_T in id_set:
         content_dict = {"content": card.name}
         content_dict.update(Fonts.NAME)
-        set_text_field(id_set[Ids.NAME_T], [([content_dict], {"justification": "CenterAlign"})])
+        set_text_field(document, id_set[Ids.NAME_T], [([content_dict], {"justification": "CenterAlign"})])
 
 
-def set_type_line(card: Card, id_set: dict, font_settings: dict = None) -> None:
+@profiled
+def set_type_line(document: Document, card: Card, id_set: dict, font_settings: dict = None) -> None:
     """
     Sets the type line of a card.
+    :param document: Document to modify
     :param card: Card to set the type line for
     :param id_set: Which ID set to use
     :param font_settings: Overrides the standard font settings
     """
-    show_info("Processing type line...", prefix=card.name)
+    report_progress(card.name, "type line")
     content_dict = {"content": card.type_line.replace("—", "•")}
     content_dict.update(Fonts.TYPE_LINE)
     if font_settings is not None:
         content_dict.update(font_settings)
-    set_text_field(id_set[Ids.TYPE_LINE_T], [([content_dict], None)])
+    set_text_field(document, id_set[Ids.TYPE_LINE_T], [([content_dict], None)])
 
 
-def set_mana_cost(card: Card, id_set: dict, font_settings: dict = None) -> None:
+@profiled
+def set_mana_cost(document: Document, card: Card, id_set: dict, font_settings: dict = None) -> None:
     """
     Sets the mana cost of a card.
+    :param document: Document to modify
     :param card: Card to set the mana cost for
     :param id_set: Which ID set to use
     :param font_settings: Overrides the standard font settings
     """
-    show_info("Processing mana cost...", prefix=card.name)
+    report_progress(card.name, "mana cost")
 
     content_dict = dict()
     content_dict.update(Fonts.MANA_COST)
@@ -138,16 +133,18 @@ def set_mana_cost(card: Card, id_set: dict, font_settings: dict = None) -> None:
         content_dict["content"] = content[:cutoff_point] + "\n" + content[cutoff_point:]
         content_dict["size"] = "8"
 
-    set_text_field(id_set[Ids.MANA_COST_T], [([content_dict], {"justification": "RightAlign"})])
+    set_text_field(document, id_set[Ids.MANA_COST_T], [([content_dict], {"justification": "RightAlign"})])
 
 
-def set_color_indicator(card: Card, id_set: dict) -> None:
+@profiled
+def set_color_indicator(document: Document, card: Card, id_set: dict) -> None:
     """
     Sets the color indicators of a card.
+    :param document: Document to modify
     :param card: Card to set the color indicators for
     :param id_set: Which ID set to use
     """
-    show_info("Processing color indicator...", prefix=card.name)
+    report_progress(card.name, "color indicator")
     # Defines the amount of blur between borders of two colors
     distance = 0
     colors_to_apply = []
@@ -170,40 +167,47 @@ def set_color_indicator(card: Card, id_set: dict) -> None:
     internal_color_name_array = [COLOR_MAPPING[color] for color in colors_to_apply]
 
     for gradient_id in id_set[Ids.GRADIENTS_O]:
-        set_gradient(gradient_id, internal_color_name_array, distance)
+        set_gradient(document, gradient_id, internal_color_name_array, distance)
 
 
-def set_oracle_text(card: Card, id_set: dict, may_be_centered: bool = True) -> None:
+@profiled
+def set_oracle_text(document: Document, card: Card, id_set: dict, may_be_centered: bool = True) -> None:
     """
     Sets the oracle text of a card.
+    :param document: Document to modify
     :param card: Card to set the oracle text for
     :param id_set: Which ID set to use
     :param may_be_centered: Whether the text may be centered if it is below a certain amount of lines
     """
-    show_info("Processing oracle text...", prefix=card.name)
+    report_progress(card.name, "oracle text")
 
-    _oracle_text_handler(id_set[Ids.ORACLE_T], card.oracle_text, flavor=card.flavor_text,
-                         force_justification="LeftAlign" if not may_be_centered else None)
+    _oracle_text_handler(document, id_set[Ids.ORACLE_T], card.oracle_text, flavor=card.flavor_text,
+                         force_justification="LeftAlign" if not may_be_centered else None,
+                         spread_id=id_set[Ids.SPREAD])
 
 
-def set_planeswalker_text(card: Card, id_set: dict) -> None:
+@profiled
+def set_planeswalker_text(document: Document, card: Card, id_set: dict) -> None:
     """
     Sets the planeswalker text of a card.
+    :param document: Document to modify
     :param card: Card to set the planeswalker text for
     :param id_set: Which ID set to use
     """
-    show_info("Processing planeswalker text...", prefix=card.name)
+    report_progress(card.name, "planeswalker text")
 
-    _planeswalker_text_handler(id_set, card.oracle_text)
+    _planeswalker_text_handler(document, id_set, card.oracle_text)
 
 
-def set_value(card: Card, id_set: dict) -> None:
+@profiled
+def set_value(document: Document, card: Card, id_set: dict) -> None:
     """
     Sets the value of a card, i.e., eiher the power / toughness, or for planeswalkers the loyalty.
+    :param document: Document to modify
     :param card: Card to set the value for
     :param id_set: Which ID set to use
     """
-    show_info("Processing value...", prefix=card.name)
+    report_progress(card.name, "value")
 
     content_dict = dict()
     content_dict.update(Fonts.VALUE)
@@ -216,28 +220,32 @@ def set_value(card: Card, id_set: dict) -> None:
     if card.loyalty is not None:
         content_dict["content"] = card.loyalty
 
-    set_text_field(id_set[Ids.VALUE_T], [([content_dict], {"justification": "CenterAlign"})])
+    set_text_field(document, id_set[Ids.VALUE_T], [([content_dict], {"justification": "CenterAlign"})])
 
 
-def set_artist(card: Card, id_set: dict) -> None:
+@profiled
+def set_artist(document: Document, card: Card, id_set: dict) -> None:
     """
     Sets the artist of a card
+    :param document: Document to modify
     :param card: Card to set the artist for
     :param id_set: Which ID set to use
     """
-    show_info("Processing artist...", prefix=card.name)
+    report_progress(card.name, "artist")
     content_dict = {"content": card.artist}
     content_dict.update(Fonts.META)
-    set_text_field(id_set[Ids.ARTIST_INFORMATION_T], [([content_dict], None)])
+    set_text_field(document, id_set[Ids.ARTIST_INFORMATION_T], [([content_dict], None)])
 
 
-def set_collector_information(card: Card, id_set: dict) -> None:
+@profiled
+def set_collector_information(document: Document, card: Card, id_set: dict) -> None:
     """
     Sets the collector information of a card
+    :param document: Document to modify
     :param card: Card to set the collector information for
     :param id_set: Which ID set to use
     """
-    show_info("Processing collector information...", prefix=card.name)
+    report_progress(card.name, "collector information")
 
     content = card.collector_number.zfill(3) + " • " + card.set.upper() + " • " + card.rarity.upper()[0]
     if card.side is not None:
@@ -245,16 +253,19 @@ def set_collector_information(card: Card, id_set: dict) -> None:
 
     content_dict = {"content": content}
     content_dict.update(Fonts.META)
-    set_text_field(id_set[Ids.COLLECTOR_INFORMATION_T], [([content_dict], {"justification": "RightAlign"})])
+    set_text_field(document, id_set[Ids.COLLECTOR_INFORMATION_T],
+                   [([content_dict], {"justification": "RightAlign"})])
 
 
-def set_modal(card: Card, id_sets: [dict]) -> None:
+@profiled
+def set_modal(document: Document, card: Card, id_sets: [dict]) -> None:
     """
     Sets the modal of a card
+    :param document: Document to modify
     :param card: Card to set the modal for
     :param id_sets: Which ID sets to use
     """
-    show_info("Processing modal...", prefix=card.name)
+    report_progress(card.name, "modal")
     for i, id_set in enumerate(id_sets):
         face = card.card_faces[(i + 1) % 2]
 
@@ -297,19 +308,22 @@ def set_modal(card: Card, id_sets: [dict]) -> None:
 
         data = [(content, {"tablist": [("CenterAlign", str(mm_to_pt(26.75))),
                                        ("RightAlign", str(mm_to_pt(53.5)))]})]
-        set_text_field(id_set[Ids.MODAL_T], data)
+        set_text_field(document, id_set[Ids.MODAL_T], data)
 
 
-def _oracle_text_handler(frame_id: str, main: str, flavor: str = None, regex_template: str = Regex.TEMPLATE_ORACLE,
-                         force_justification: str = None, force_font: dict = None) -> int:
+def build_oracle_data(main: str, flavor: str = None, regex_template: str = None, force_font: dict = None) \
+        -> [([dict], dict)]:
     """
-    Handles formatting of an oracle text box. Handles reminder and flavor text, and mana formatting.
-    :param frame_id: Text frame of the oracle
+    Splits and formats the text of an oracle text box. Handles reminder and flavor text, and mana formatting.
     :param main: Main (rule) text
     :param flavor: Optional flavor text
-    :param regex_template: Which parser to use
-    :return Number of lines set
+    :param regex_template: Which parser to use, defaults to `Regex.TEMPLATE_ORACLE`
+    :param force_font: Font settings to apply to the entire text
+    :return: Paragraphs of main and flavor text, in the format of `set_text_field`
     """
+    if regex_template is None:
+        regex_template = Regex.TEMPLATE_ORACLE
+
     main_split = split_string_along_regex(main, regex_template)
     flavor_split = []
 
@@ -366,10 +380,30 @@ def _oracle_text_handler(frame_id: str, main: str, flavor: str = None, regex_tem
                 content_dict.update(force_font)
             content.append(content_dict)
 
-    id_handler = InDesignHandler()
-    data = [(content_main, {"spacing": str(mm_to_pt(0.75))}),
+    return [(content_main, {"spacing": str(mm_to_pt(0.75))}),
             (content_flavor, {"space_before": str(mm_to_pt(1.5))})]
-    lines = id_handler.get_text_lines(data)
+
+
+def _oracle_text_handler(document: Document, frame_id: str, main: str, flavor: str = None,
+                         regex_template: str = None, force_justification: str = None,
+                         force_font: dict = None, spread_id: str = None, steps: int = 0) -> int:
+    """
+    Handles formatting of an oracle text box. Handles reminder and flavor text, and mana formatting.
+    :param document: Document to modify
+    :param frame_id: Text frame of the oracle
+    :param main: Main (rule) text
+    :param flavor: Optional flavor text
+    :param regex_template: Which parser to use, defaults to `Regex.TEMPLATE_ORACLE`
+    :param spread_id: Spread of the text frame, if given the text is shrunk to fit the frame
+    :param steps: Amount of steps to shrink the text by, if it is not fitted to its frame
+    :return Number of lines set
+    """
+    data = build_oracle_data(main, flavor=flavor, regex_template=regex_template, force_font=force_font)
+    if spread_id is not None:
+        steps = _get_fitting_steps(document, spread_id, [(frame_id, data)])
+    data = shrink_text(data, steps)
+    content_main, content_flavor = data[0][0], data[1][0]
+    lines = TextMeasurer.get_standard_measurer().get_text_lines(data)
 
     justification = "LeftAlign" if force_justification is None else force_justification
     if force_justification is None and lines <= 2:
@@ -379,12 +413,12 @@ def _oracle_text_handler(frame_id: str, main: str, flavor: str = None, regex_tem
     if flavor is not None and len(flavor) > 0:
         data.append((content_flavor, {"justification": justification, "space_before": str(mm_to_pt(1.5))}))
 
-    set_text_field(frame_id, data)
+    set_text_field(document, frame_id, data)
 
     return lines
 
 
-def _planeswalker_text_handler(id_set: dict, main: str, double_faced: bool = False,
+def _planeswalker_text_handler(document: Document, id_set: dict, main: str, double_faced: bool = False,
                                regex_template: str = Regex.TEMPLATE_PLANESWALKER) -> None:
     planeswalker_split = split_string_along_regex(main, regex_template)
     if "\n" in planeswalker_split[-1][0]:
@@ -407,36 +441,46 @@ def _planeswalker_text_handler(id_set: dict, main: str, double_faced: bool = Fal
     # Check if we have an additional leading or trailing box
     flag_leading_text = planeswalker_split[0][1] != "loyalty"
     flag_trailing_text = planeswalker_split[-2][1] != "loyalty"
-    set_visibility(id_set[Ids.ORACLE_O], id_set[Ids.SPREAD], flag_leading_text)
+    set_visibility(document, id_set[Ids.ORACLE_O], id_set[Ids.SPREAD], flag_leading_text)
 
     # Array of lines, saves how many lines each entry has
     amount_boxes = (amount_abilities + (1 if flag_leading_text else 0) + (1 if flag_trailing_text else 0))
     lines = [0] * amount_boxes
 
+    top_coordinate = Distances.ORACLE_TOP
+    if double_faced:
+        top_coordinate += Distances.MODAL_HEIGHT
+    height_budget = Distances.ORACLE_BOT + abs(top_coordinate)
+    height_budget -= Distances.SPACE_PLANESWALKER * (amount_boxes - 1)
+
+    # Text frame and text of each box
+    boxes = []
     for i in range(0, amount_boxes):
         # Leading
         if i == 0 and flag_leading_text:
-            lines[0] = _oracle_text_handler(id_set[Ids.ORACLE_T], planeswalker_split[0][0],
-                                            force_justification="LeftAlign")
+            boxes.append((id_set[Ids.ORACLE_T], planeswalker_split[0][0]))
         # Planeswalker Oracle
         elif int(flag_leading_text) <= i < amount_boxes - int(flag_trailing_text):
             index_planeswalker = i - int(flag_leading_text)
-            text_loyalty = planeswalker_split[2 * (i - flag_leading_text) + flag_leading_text][0]
-            text_oracle = planeswalker_split[2 * (i - flag_leading_text) + 1 + flag_leading_text][0]
-            _oracle_text_handler(id_set[Ids.PLANESWALKER_VALUE_T][index_planeswalker], text_loyalty,
-                                 force_justification="RightAlign")
-            lines[i] = _oracle_text_handler(id_set[Ids.PLANESWALKER_ORACLE_NUMBERED_T][index_planeswalker], text_oracle,
-                                            force_justification="LeftAlign")
+            boxes.append((id_set[Ids.PLANESWALKER_ORACLE_NUMBERED_T][index_planeswalker],
+                          planeswalker_split[2 * (i - flag_leading_text) + 1 + flag_leading_text][0]))
         # Trailing
         else:
-            lines[i] = _oracle_text_handler(id_set[Ids.PLANESWALKER_ORACLE_FINAL_T], planeswalker_split[-1][0],
-                                            force_justification="LeftAlign")
+            boxes.append((id_set[Ids.PLANESWALKER_ORACLE_FINAL_T], planeswalker_split[-1][0]))
 
-    top_coordinate = Distances.ORACLE_TOP
-    if double_faced:
-        top_coordinate += Distances.MODAL_HEIGHT
-    height_budget = Distances.ORACLE_BOT + abs(top_coordinate)
-    height_budget -= Distances.SPACE_PLANESWALKER * (amount_boxes - 1)
+    # All boxes share the height of the oracle area, and are shrunk alike
+    steps = _get_fitting_steps(document, id_set[Ids.SPREAD],
+                               [(frame_id, build_oracle_data(text)) for frame_id, text in boxes], height=height_budget)
+
+    for i in range(0, amount_boxes):
+        # Planeswalker Oracle
+        if int(flag_leading_text) <= i < amount_boxes - int(flag_trailing_text):
+            index_planeswalker = i - int(flag_leading_text)
+            text_loyalty = planeswalker_split[2 * (i - flag_leading_text) + flag_leading_text][0]
+            _oracle_text_handler(document, id_set[Ids.PLANESWALKER_VALUE_T][index_planeswalker], text_loyalty,
+                                 force_justification="RightAlign")
+        lines[i] = _oracle_text_handler(document, boxes[i][0], boxes[i][1], force_justification="LeftAlign",
+                                        steps=steps)
 
     for i in range(0, amount_boxes):
         shift_modal = double_faced * Distances.MODAL_HEIGHT
@@ -457,11 +501,46 @@ def _planeswalker_text_handler(id_set: dict, main: str, double_faced: bool = Fal
             object_ids = [id_set[Ids.PLANESWALKER_ORACLE_FINAL_O]]
 
         for object_id in object_ids:
-            coordinates = get_coordinates(object_id, id_set[Ids.SPREAD])
-            set_coordinates(object_id, id_set[Ids.SPREAD], [(coordinates[0][0], coordinates[0][1] + shift_sum),
-                                                            (coordinates[1][0], coordinates[1][1] + shift_sum),
-                                                            (coordinates[0][0], coordinates[0][1] + shift_sum + (
-                                                                    (lines[i] / sum(lines)) * height_budget)),
-                                                            (coordinates[1][0], coordinates[1][1] + shift_sum + (
-                                                                    (lines[i] / sum(lines)) * height_budget))])
-            set_visibility(object_id, id_set[Ids.SPREAD], True)
+            coordinates = get_coordinates(document, object_id, id_set[Ids.SPREAD])
+            set_coordinates(document, object_id, id_set[Ids.SPREAD],
+                            [(coordinates[0][0], coordinates[0][1] + shift_sum),
+                             (coordinates[1][0], coordinates[1][1] + shift_sum),
+                             (coordinates[0][0], coordinates[0][1] + shift_sum + (
+                                     (lines[i] / sum(lines)) * height_budget)),
+                             (coordinates[1][0], coordinates[1][1] + shift_sum + (
+                                     (lines[i] / sum(lines)) * height_budget))])
+            set_visibility(document, object_id, id_set[Ids.SPREAD], True)
+
+
+def _get_fitting_steps(document: Document, spread_id: str, texts: [(str, [([dict], dict)])],
+                       height: float = None) -> int:
+    """
+    Determines by how many steps oracle texts have to be shrunk to fit their text frames, using the local measurer.
+    :param document: Document containing the text frames
+    :param spread_id: Spread of the text frames
+    :param texts: Text frame and paragraphs of each text
+    :param height: Height shared by the text frames of all texts including their insets, defaults to the height of
+    the text area of the first text
+    :return: The amount of steps, 0 if text cannot be fitted while composing
+    """
+    measurer = LocalTextMeasurer.get_fitting_measurer()
+    if measurer is None:
+        return 0
+
+    areas = [get_text_area(document, frame_id, spread_id) for frame_id, _ in texts]
+    if height is None:
+        height = areas[0][1]
+    else:
+        # Each text frame keeps its vertical insets free of text
+        for frame_id, _ in texts:
+            insets = get_text_insets(document, frame_id, spread_id)
+            height -= insets[0] + insets[2]
+
+    steps = get_fitting_steps(measurer, [(data, area[0]) for (_, data), area in zip(texts, areas)], height)
+
+    # The measurer only approximates InDesign, the export may grow the text back by as many steps if it fits
+    if steps > 0:
+        for frame_id, _ in texts:
+            set_label(document, frame_id, spread_id, FITTING_LABEL, str(steps))
+
+    return steps
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import zipfile
+from xml.etree import ElementTree
+
+# Header InDesign expects at the beginning of the designmap
+DESIGNMAP_HEADER = b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>' \
+                   b'<?aid style="50" type="document" readerVersion="6.0" featureSet="257" product="16.4(55)" ?>'
+# Name of the part that has to be stored first and uncompressed in every IDML package
+MIMETYPE = "mimetype"
+
+
+class Template:
+    """
+    IDML template held in memory. The archive is read once per run, documents created from the template share its
+    untouched parts and only keep their own copies of the parts they parse.
+    """
+
+    _cache = dict()
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        self.parts = dict()
+
+        with open(path, "rb") as file:
+            data = file.read()
+        self.hash = hashlib.sha256(data).hexdigest()
+
+        with zipfile.ZipFile(io.BytesIO(data), "r") as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    self.parts[info.filename] = archive.read(info)
+
+    @classmethod
+    def load(cls, path: str) -> Template:
+        """
+        Returns the template at the given path, reading it only on first request.
+        :param path: Path to the IDML template
+        :return: The template
+        """
+        if path not in cls._cache:
+            cls._cache[path] = Template(path)
+        return cls._cache[path]
+
+    def create_document(self) -> Document:
+        """
+        Creates a new document based on this template.
+        :return: The document
+        """
+        return Document(self)
+
+
+class Document:
+    """
+    In-memory model of an IDML document. Each part (spread, story, resource, ...) is parsed from the template on first
+    access and kept in memory, modified parts are serialized exactly once when the document is written.
+    """
+
+    def __init__(self, template: Template) -> None:
+        super().__init__()
+        self.template = template
+        self._trees = dict()
+        self._dirty = set()
+        self._removed = set()
+
+    def get_part(self, name: str, modify: bool = False) -> ElementTree.ElementTree:
+        """
+        Returns the parsed XML tree of a part of the document.
+        :param name: Name of the part, relative to the root of the document, e.g. `Spreads/Spread_uce.xml`
+        :param modify: Whether the caller is going to modify the tree, in which case the part will be serialized on
+        write
+        :return: The parsed tree
+        """
+        if name in self._removed:
+            raise KeyError("Part " + name + " has been removed from the document")
+
+        tree = self._trees.get(name)
+        if tree is None:
+            tree = ElementTree.ElementTree(ElementTree.fromstring(self.template.parts[name]))
+            self._trees[name] = tree
+
+        if modify:
+            self._dirty.add(name)
+
+        return tree
+
+    def get_spread(self, spread_id: str, modify: bool = False) -> ElementTree.ElementTree:
+        """
+        Returns the parsed XML tree of a spread.
+        :param spread_id: ID of the spread
+        :param modify: Whether the caller is going to modify the tree
+        :return: The parsed tree
+        """
+        return self.get_part("Spreads/Spread_" + spread_id + ".xml", modify=modify)
+
+    def get_story(self, story_id: str, modify: bool = False) -> ElementTree.ElementTree:
+        """
+        Returns the parsed XML tree of a story.
+        :param story_id: ID of the story
+        :param modify: Whether the caller is going to modify the tree
+        :return: The parsed tree
+        """
+        return self.get_part("Stories/Story_" + story_id + ".xml", modify=modify)
+
+    def get_graphic(self, modify: bool = False) -> ElementTree.ElementTree:
+        """
+        Returns the parsed XML tree of the graphic resources, containing e.g. colors and gradients.
+        :param modify: Whether the caller is going to modify the tree
+        :return: The parsed tree
+        """
+        return self.get_part("Resources/Graphic.xml", modify=modify)
+
+    def get_designmap(self, modify: bool = False) -> ElementTree.ElementTree:
+        """
+        Returns the parsed XML tree of the designmap, which references all other parts of the document.
+        :param modify: Whether the caller is going to modify the tree
+        :return: The parsed tree
+        """
+        return self.get_part("designmap.xml", modify=modify)
+
+    def remove_part(self, name: str) -> None:
+        """
+        Removes a part from the document, it will not be contained in the written file.
+        :param name: Name of the part, relative to the root of the document
+        """
+        self._trees.pop(name, None)
+        self._dirty.discard(name)
+        self._removed.add(name)
+
+    def write(self, path: str) -> None:
+        """
+        Writes the document as IDML package to the given path. Untouched parts are copied from the template as they
+        are, modified parts are serialized.
+        :param path: Path of the file to create
+        """
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            # The mimetype has to be the first entry and may not be compressed
+            if MIMETYPE in self.template.parts:
+                archive.writestr(MIMETYPE, self.template.parts[MIMETYPE], compress_type=zipfile.ZIP_STORED)
+
+            for name, data in self.template.parts.items():
+                if name == MIMETYPE or name in self._removed:
+                    continue
+                if name in self._dirty:
+                    data = self._serialize(name)
+                archive.writestr(name, data)
+
+    def _serialize(self, name: str) -> bytes:
+        root = self._trees[name].getroot()
+        if name == "designmap.xml":
+            return DESIGNMAP_HEADER + ElementTree.tostring(root, encoding="utf-8", xml_declaration=False)
+        return ElementTree.tostring(root)
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import math
+import time
+from collections import Counter, defaultdict
+
+# Export format of PDF files, as passed to `Document.Export`
+EXPORT_FORMAT_PDF = 1952403524
+# Characters that fit on a line of the study frame, used to derive deterministic line counts
+CHARACTERS_PER_LINE = 45
+# Minimal single page PDF written instead of the exported card
+PLACEHOLDER_PDF = b"%PDF-1.4\n" \
+                  b"1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n" \
+                  b"2 0 obj << /Type /Pages /Kids [3 0 R] /Count 1 >> endobj\n" \
+                  b"3 0 obj << /Type /Page /Parent 2 0 R /MediaBox [0 0 178.583 249.449] >> endobj\n" \
+                  b"trailer << /Root 1 0 R >>\n" \
+                  b"%%EOF\n"
+
+
+class OperationRecorder:
+    """
+    Counts and times the operations performed on the fake InDesign object model, each of which would be a round trip to
+    InDesign through COM.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        """
+        :param latency: Time in seconds each operation is delayed by, to simulate the cost of COM round trips
+        """
+        super().__init__()
+        self.latency = latency
+        self.counts = Counter()
+        self.durations = defaultdict(float)
+
+    def record(self, operation: str, duration: float) -> None:
+        """
+        Records a single operation.
+        :param operation: Name of the operation, e.g. `TextFrame.Contents`
+        :param duration: Time the operation took, in seconds
+        """
+        if self.latency > 0:
+            time.sleep(self.latency)
+            duration += self.latency
+        self.counts[operation] += 1
+        self.durations[operation] += duration
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def total_duration(self) -> float:
+        return sum(self.durations.values())
+
+    def reset(self) -> None:
+        self.counts.clear()
+        self.durations.clear()
+
+
+class _FakeObject:
+    """
+    Object of the fake InDesign object model. Reading or writing a property and calling a method are recorded as one
+    operation each, in the form `Kind.Name`.
+    """
+
+    def __init__(self, recorder: OperationRecorder, **properties) -> None:
+        object.__setattr__(self, "_recorder", recorder)
+        for name, value in properties.items():
+            object.__setattr__(self, name, value)
+
+    def __getattribute__(self, name: str):
+        if name.startswith("_"):
+            return object.__getattribute__(self, name)
+
+        start = time.perf_counter()
+        value = object.__getattribute__(self, name)
+        recorder = object.__getattribute__(self, "_recorder")
+        operation = type(self).__name__.lstrip("_").replace("Fake", "", 1) + "." + name
+
+        if callable(value):
+            def call(*args, **kwargs):
+                start_call = time.perf_counter()
+                result = value(*args, **kwargs)
+                recorder.record(operation + "()", time.perf_counter() - start_call)
+                return result
+            return call
+
+        recorder.record(operation, time.perf_counter() - start)
+        return value
+
+    def __setattr__(self, name: str, value) -> None:
+        start = time.perf_counter()
+        object.__setattr__(self, name, value)
+        self._recorder.record(type(self).__name__.lstrip("_").replace("Fake", "", 1) + "." + name + "=",
+                              time.perf_counter() - start)
+
+
+class FakeInDesign(_FakeObject):
+    """
+    Stand-in for the InDesign application, supporting the operations `_InDesignHandler` performs. Texts are laid out
+    with a fixed amount of characters per line, preflight never reports errors, and exported PDFs are placeholders.
+    """
+
+    def __init__(self, recorder: OperationRecorder) -> None:
+        super().__init__(recorder,
+                         PreflightProfiles=_FakeCollection(recorder, lambda: _FakePreflightProfile(recorder)),
+                         PreflightProcesses=_FakeCollection(recorder, None),
+                         PDFExportPresets=_FakeCollection(recorder, lambda: _FakePDFExportPreset(recorder)))
+
+    def Open(self, path: str) -> _FakeDocument:
+        return _FakeDocument(self._recorder, path)
+
+
+class _FakeCollection(_FakeObject):
+
+    def __init__(self, recorder: OperationRecorder, create) -> None:
+        super().__init__(recorder)
+        object.__setattr__(self, "_create", create)
+
+    def Item(self, index: int):
+        return self._create()
+
+    def Add(self, document: _FakeDocument, profile: _FakePreflightProfile) -> _FakePreflightProcess:
+        return _FakePreflightProcess(self._recorder)
+
+
+class _FakePreflightProfile(_FakeObject):
+    pass
+
+
+class _FakePDFExportPreset(_FakeObject):
+    pass
+
+
+class _FakePreflightProcess(_FakeObject):
+
+    def __init__(self, recorder: OperationRecorder) -> None:
+        super().__init__(recorder, processResults="None")
+
+    def WaitForProcess(self) -> None:
+        pass
+
+
+class _FakeDocument(_FakeObject):
+
+    def __init__(self, recorder: OperationRecorder, path: str) -> None:
+        super().__init__(recorder, TextFrames=[_FakeTextFrame(recorder, "Textbox")], Pages=[])
+        object.__setattr__(self, "_path", path)
+
+    def Export(self, export_format: int, path: str, show_options: bool = False, preset=None, **kwargs) -> None:
+        # Other formats, i.e. IDML, would overwrite the document with itself
+        if export_format == EXPORT_FORMAT_PDF:
+            with open(path, "wb") as file:
+                file.write(PLACEHOLDER_PDF)
+
+    def Close(self, *args, **kwargs) -> None:
+        pass
+
+
+class _FakeTextFrame(_FakeObject):
+
+    def __init__(self, recorder: OperationRecorder, name: str) -> None:
+        super().__init__(recorder, Name=name, Contents="")
+        object.__setattr__(self, "InsertionPoints", _FakeInsertionPoints(recorder, self))
+        object.__setattr__(self, "Paragraphs", _FakeParagraphs(recorder, self))
+        object.__setattr__(self, "Lines", _FakeLines(recorder, self))
+
+
+class _FakeInsertionPoints(_FakeObject):
+
+    def __init__(self, recorder: OperationRecorder, frame: _FakeTextFrame) -> None:
+        super().__init__(recorder)
+        object.__setattr__(self, "_frame", frame)
+
+    def LastItem(self) -> _FakeInsertionPoint:
+        return _FakeInsertionPoint(self._recorder, self._frame)
+
+
+class _FakeInsertionPoint(_FakeObject):
+
+    def __init__(self, recorder: OperationRecorder, frame: _FakeTextFrame) -> None:
+        super().__init__(recorder)
+        object.__setattr__(self, "_frame", frame)
+
+    def __setattr__(self, name: str, value) -> None:
+        super().__setattr__(name, value)
+        # Inserted text is appended to the frame
+        if name == "Contents":
+            object.__setattr__(self._frame, "Contents", object.__getattribute__(self._frame, "Contents") + value)
+
+
+class _FakeParagraphs(_FakeObject):
+
+    def __init__(self, recorder: OperationRecorder, frame: _FakeTextFrame) -> None:
+        super().__init__(recorder)
+        object.__setattr__(self, "_frame", frame)
+
+    @property
+    def Count(self) -> int:
+        contents = object.__getattribute__(self._frame, "Contents")
+        return len(contents.split("\r")) if len(contents) > 0 else 0
+
+    def __getitem__(self, index: int) -> _FakeParagraph:
+        start = time.perf_counter()
+        paragraph = _FakeParagraph(self._recorder)
+        self._recorder.record("Paragraphs[]", time.perf_counter() - start)
+        return paragraph
+
+
+class _FakeParagraph(_FakeObject):
+    pass
+
+
+class _FakeLines(_FakeObject):
+
+    def __init__(self, recorder: OperationRecorder, frame: _FakeTextFrame) -> None:
+        super().__init__(recorder)
+        object.__setattr__(self, "_frame", frame)
+
+    @property
+    def Count(self) -> int:
+        contents = object.__getattribute__(self._frame, "Contents")
+        if len(contents) == 0:
+            return 0
+        return sum(max(1, math.ceil(len(line) / CHARACTERS_PER_LINE))
+                   for line in contents.replace("\n", "\r").split("\r"))
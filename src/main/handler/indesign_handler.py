@@ -1,41 +1,212 @@
-import functools
-import operator
-import os.path
+from __future__ import annotations
 
-from win32com import client
+import os.path
+from abc import ABC, abstractmethod
 
-from src.main.configuration.config import CONFIG_INDESIGN_ID
-from src.main.configuration.variables import Paths, Fonts, RESIZE_INFORMATION
+from src.main.configuration.config import CONFIG_INDESIGN_ID, CONFIG_RENDERING_BACKEND
+from src.main.configuration.variables import Paths, Fonts, RESIZE_INFORMATION, FITTING_INFORMATION, FITTING_LABEL
+from src.main.data.build_manifest import get_document_path, get_pdf_path
 from src.main.data.card import Card
+from src.main.data.fitting_cache import FittingCache
 from src.main.utils.info import show_info, Info_Mode
-from src.main.utils.mtg import get_clean_name
+from src.main.utils.profiler import profiled, span
 
 
-def InDesignHandler():
+def InDesignHandler() -> RenderingBackend:
+    """
+    Returns the rendering backend of this process, as chosen by `CONFIG_RENDERING_BACKEND`.
+    :return: The backend
+    """
     if _InDesignHandler._instance is None:
-        _InDesignHandler._instance = _InDesignHandler()
+        if CONFIG_RENDERING_BACKEND == "indesign":
+            # Imported on use, so the fake backend works without InDesign
+            from win32com import client
+            _InDesignHandler._instance = _InDesignHandler(client.Dispatch(CONFIG_INDESIGN_ID))
+        elif CONFIG_RENDERING_BACKEND == "fake":
+            from src.main.handler.fake_indesign import FakeInDesign, OperationRecorder
+            recorder = OperationRecorder()
+            _InDesignHandler._instance = _InDesignHandler(FakeInDesign(recorder), recorder=recorder)
+        else:
+            raise NotImplementedError
     return _InDesignHandler._instance
 
 
-class _InDesignHandler:
+def set_study_document(path: str) -> None:
+    """
+    Sets which study document the handler of this process uses to measure text. Worker processes use their own copy,
+    since they would otherwise modify the same document in InDesign concurrently.
+    :param path: Path to the study document
+    """
+    _InDesignHandler._study_document_path = path
+
+
+class _Fitting:
+    """
+    Shrinks the text of a group of associated frames until it fits, either by reducing the point size or by condensing
+    the font along its second design axis. The text is shrunk in discrete steps as defined by `FITTING_INFORMATION`,
+    always starting from the values the text had on creation. Text shrunk while composing may grow back by as many
+    steps, i.e. by a negative amount of steps.
+    """
+
+    def __init__(self, mode: str, frames: []) -> None:
+        super().__init__()
+        self.mode = mode
+        self.frames = frames
+        self.step = FITTING_INFORMATION[mode]["step"]
+        self.texts = [text for frame in frames for text in frame.ParentStory.Texts]
+        self.checks = 0
+
+        if mode == "resize":
+            self.values = [text.PointSize for text in self.texts]
+        else:
+            self.values = [text.DesignAxes[1] for text in self.texts]
+        self.maximum = max(0, int((min(self.values) - FITTING_INFORMATION[mode]["minimum"]) // self.step))
+        self.minimum = -_get_composed_steps(frames) if mode == "resize" else 0
+
+    def apply(self, steps: int) -> None:
+        """
+        Shrinks the text by the given amount of steps.
+        :param steps: Amount of steps
+        """
+        for text, value in zip(self.texts, self.values):
+            if self.mode == "resize":
+                text.PointSize = value - steps * self.step
+            else:
+                text.SetNthDesignAxis(1, value - steps * self.step)
+
+    def overflows(self) -> bool:
+        self.checks += 1
+        return any(x.Overflows for x in self.frames)
+
+    def search(self, start: int = 0, overflows: bool = True) -> int:
+        """
+        Searches the smallest amount of steps, at least `minimum`, for which no frame overflows. The search gallops
+        from `start`, upwards if shrinking by `start` steps does not suffice and downwards otherwise, and bisects the
+        last interval, so a good start requires only a few checks. The text is left shrunk by the result.
+        :param start: Amount of steps to start from
+        :param overflows: Whether shrinking by `start` steps does not suffice
+        :return: The amount of steps
+        """
+        distance = 1
+        if overflows:
+            low = start
+            high = min(start + distance, self.maximum)
+
+            self.apply(high)
+            while high < self.maximum and self.overflows():
+                low = high
+                distance *= 2
+                high = min(start + distance, self.maximum)
+                self.apply(high)
+        else:
+            low = high = start
+            while low > self.minimum:
+                low = max(start - distance, self.minimum)
+                self.apply(low)
+                if self.overflows():
+                    break
+                high = low
+                distance *= 2
+
+        # Shrinking by `low` steps overflows, shrinking by `high` steps fits (or is the most allowed)
+        while high - low > 1:
+            middle = (low + high) // 2
+            self.apply(middle)
+            if self.overflows():
+                low = middle
+            else:
+                high = middle
+
+        self.apply(high)
+        return high
+
+
+def _get_composed_steps(frames: []) -> int:
+    """
+    Returns by how many steps the text of a group of frames was shrunk while composing, as recorded in their labels.
+    :param frames: Frames of the group
+    :return: The amount of steps, 0 if the text was not shrunk
+    """
+    return min(int(frame.ExtractLabel(FITTING_LABEL) or 0) for frame in frames)
+
+
+class RenderingBackend(ABC):
+    """
+    Abstract class for everything that requires rendering cards, i.e. measuring text and exporting PDFs.
+    """
+
+    @abstractmethod
+    def get_text_lines(self, data: [([dict], dict)]) -> int:
+        """
+        Returns the amount of lines of the given text when printed.
+        :param data: Dictionary containing information about what to print
+        :return: The amount of lines
+        """
+        pass
+
+    @abstractmethod
+    def generate_pdf(self, card: Card, fingerprint: str = None) -> bool:
+        """
+        Creates a PDF from the card
+        :param card: The card to create a PDF for
+        :param fingerprint: Fingerprint of the inputs the card was composed from, fits of earlier exports are only
+        reused for the same fingerprint
+        :return: Whether the PDF was created
+        """
+        pass
+
+
+class _InDesignHandler(RenderingBackend):
     """
     Singleton that stores the access to the InDesign API.
     """
 
     _instance = None
+    _study_document_path = Paths.FILE_STUDY
 
-    def __init__(self) -> None:
+    def __init__(self, app, recorder=None) -> None:
+        """
+        :param app: The InDesign application, either accessed through COM or a `FakeInDesign`
+        :param recorder: Recorder of the operations performed on a fake application
+        """
         super().__init__()
-        self.app = client.Dispatch(CONFIG_INDESIGN_ID)
+        self.app = app
+        self.recorder = recorder
         self.study_document = None
+        # Amount of cards fitted, fitted by reapplying the last fit, fitted by searching and overflow checks needed
+        self.fitting_statistics = {"cards": 0, "warm": 0, "searched": 0, "checks": 0}
 
     def __del__(self):
         if self.study_document is not None:
             self.study_document.Close(Saving=1852776480)
 
+    @staticmethod
+    def _get_fitting_groups(document) -> dict:
+        """
+        Collects the frames of a document that may be shrunk to fit their text, grouped as described by
+        `RESIZE_INFORMATION`.
+        :param document: The opened document
+        :return: Mapping from a key identifying the group in the document to the fitting mode and the frames of the
+        group
+        """
+        groups = dict()
+
+        for page in document.Pages:
+            # Frames are only associated with frames of the same top-level group
+            for index, group in enumerate(page.PageItems):
+                for candidate in group.AllPageItems:
+                    for mode, names_list in RESIZE_INFORMATION.items():
+                        associated_names = next((x for x in names_list if candidate.Name in x), None)
+                        if associated_names is not None:
+                            key = mode + ":" + str(page.Name) + ":" + str(index) + ":" + "|".join(associated_names)
+                            groups.setdefault(key, (mode, []))[1].append(candidate)
+                            break
+
+        return groups
+
     def _get_study_document(self):
         if self.study_document is None:
-            self.study_document = self.app.Open(Paths.TEMPLATES + "/Study.idml")
+            self.study_document = self.app.Open(self._study_document_path)
         return self.study_document
 
     def get_text_lines(self, data: [([dict], dict)]) -> int:
@@ -101,79 +272,85 @@ class _InDesignHandler:
 
         return text_frame.Lines.Count
 
-    def generate_pdf(self, card: Card) -> None:
+    @profiled
+    def generate_pdf(self, card: Card, fingerprint: str = None) -> bool:
         """
         Creates a PDF from the card
         :param card: The card to create a PDF for
+        :param fingerprint: Fingerprint of the inputs the card was composed from, fits of earlier exports are only
+        reused for the same fingerprint
+        :return: Whether the PDF was created
         """
-        clean_name = get_clean_name(card.name)
-        input_path = Paths.DOCUMENTS + "/" + card.set.upper() + "/" + card.collector_number + " - " + clean_name + ".idml"
-        output_path_folder = Paths.PDF + "/" + card.set.upper()
-        output_path_file = output_path_folder + "/" + card.collector_number + " - " + clean_name + ".pdf"
+        input_path = get_document_path(card)
+        output_path_file = get_pdf_path(card)
 
-        os.makedirs(output_path_folder, exist_ok=True)
+        os.makedirs(os.path.dirname(output_path_file), exist_ok=True)
 
         document = self.app.Open(input_path)
 
-        profile = self.app.PreflightProfiles.Item(1)
-        process = self.app.PreflightProcesses.Add(document, profile)
-        process.WaitForProcess()
-        results = process.processResults
+        # The composed document is never modified, so the stored fits are relative to the text as composed
+        fitting_cache = FittingCache.get_standard_cache()
+        fits = fitting_cache.get(card.id, fingerprint) if fingerprint is not None else dict()
+        groups = self._get_fitting_groups(document)
+
+        # Apply the fits of the last export up front, in most cases this resolves all overflows at once. Text shrunk
+        # while composing is grown back as far as it fits, as the compose-time measurement only approximates InDesign
+        fittings = dict()
+        reapplied = len(fits) > 0
+        checks_composed = 0
+        for key, (mode, frames) in groups.items():
+            if fits.get(key, 0) != 0:
+                fittings[key] = _Fitting(mode, frames)
+                fittings[key].apply(fits[key])
+            elif key not in fits and mode == "resize" and _get_composed_steps(frames) > 0:
+                fitting = _Fitting(mode, frames)
+                fits[key] = fitting.search(overflows=fitting.overflows())
+                fittings[key] = fitting
+                checks_composed += fitting.checks
+
+        with span("preflight", card=card.name):
+            profile = self.app.PreflightProfiles.Item(1)
+            process = self.app.PreflightProcesses.Add(document, profile)
+            process.WaitForProcess()
+            results = process.processResults
+
+        statistics = self.fitting_statistics
+        statistics["cards"] += 1
+        statistics["checks"] += checks_composed
+        if reapplied and "None" in results:
+            statistics["warm"] += 1
+        # Fits are stored below if overflows remain
+        if checks_composed > 0 and "None" in results and fingerprint is not None:
+            fitting_cache.put(card.id, fingerprint, fits)
 
         # Check if we have to fix errors
         if "None" not in results:
-            pages = document.Pages
-
-            resize_names = functools.reduce(operator.iconcat, RESIZE_INFORMATION["resize"], [])
-            condense_names = functools.reduce(operator.iconcat, RESIZE_INFORMATION["condense"], [])
-
-            for page in pages:
-                groups = page.PageItems
-                for group in groups:
-                    resize_candidates = []
-                    condense_candidates = []
-                    candidates = group.AllPageItems
-
-                    # Collect all text frames
-                    for candidate in candidates:
-                        if candidate.Name in resize_names:
-                            resize_candidates.append(candidate)
-                        elif candidate.Name in condense_names:
-                            condense_candidates.append(candidate)
-
-                    for resize_candidate in resize_candidates:
-                        if resize_candidate.Overflows:
-                            associated_names = next(
-                                x for x in RESIZE_INFORMATION["resize"] if resize_candidate.Name in x)
-                            associated_frames = [x for x in resize_candidates if x.Name in associated_names]
-
-                            while any(x.Overflows for x in associated_frames):
-                                for associated_frame in associated_frames:
-                                    for text in associated_frame.ParentStory.Texts:
-                                        text.PointSize = text.PointSize - 0.25
-
-                    for condense_candidate in condense_candidates:
-                        if condense_candidate.Overflows:
-                            associated_names = next(
-                                x for x in RESIZE_INFORMATION["condense"] if condense_candidate.Name in x)
-                            associated_frames = [x for x in condense_candidates if x.Name in associated_names]
-
-                            while any(x.Overflows for x in associated_frames):
-                                for associated_frame in associated_frames:
-                                    for text in associated_frame.ParentStory.Texts:
-                                        text.SetNthDesignAxis(1, text.DesignAxes[1] - 5)
-
-            process.WaitForProcess()
-            results = process.processResults
+            checks = 0
+            with span("fixups", card=card.name):
+                for key, (mode, frames) in groups.items():
+                    checks += 1
+                    if any(x.Overflows for x in frames):
+                        fitting = fittings[key] if key in fittings else _Fitting(mode, frames)
+                        fits[key] = fitting.search(start=fits.get(key, 0))
+                        checks += fitting.checks
+            statistics["searched"] += 1
+            statistics["checks"] += checks
+            show_info("Fitted text with " + str(checks) + " overflow checks", prefix=card.name, end_line=True)
+            if fingerprint is not None:
+                fitting_cache.put(card.id, fingerprint, fits)
+
+            with span("preflight", card=card.name):
+                process.WaitForProcess()
+                results = process.processResults
 
             if "None" not in results:
                 show_info("Error while running preflight", prefix=card.name, mode=Info_Mode.ERROR)
                 document.Close(1852776480)
-                return
+                return False
 
-        pdf_preset = self.app.PDFExportPresets.Item(7)
-        idPDFType = 1952403524
-        idIDMLType = 1768189292
-        document.Export(idPDFType, output_path_file, False, pdf_preset)
-        document.Export(idIDMLType, input_path, False, ForceSave=True)
+        with span("export", card=card.name):
+            pdf_preset = self.app.PDFExportPresets.Item(7)
+            idPDFType = 1952403524
+            document.Export(idPDFType, output_path_file, False, pdf_preset)
         document.Close(1852776480)
+        return True
@@ -0,0 +1,552 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+
+from src.main.configuration.config import CONFIG_TEXT_MEASURER, CONFIG_TEXT_CACHE, CONFIG_COMPOSE_AUTOFIT, \
+    CONFIG_RENDERING_BACKEND
+from src.main.configuration.variables import Paths, Fonts, FITTING_INFORMATION
+from src.main.handler.document_handler import Template
+from src.main.handler.xml_handler import get_text_width
+from src.main.utils.info import show_info, Info_Mode
+
+# Name of the text frame of the study document in which text is measured
+STUDY_FRAME_NAME = "Textbox"
+# Font files considered by the local measurer
+FONT_TYPES = ["ttf", "otf"]
+
+# Characters after which a line may be broken, spaces are not counted towards the width at the end of a line
+_BREAK_AFTER_SPACE = " "
+_BREAK_AFTER = "-‐–—"
+_LINE_BREAKS = "\n\r"
+# Leading InDesign applies automatically, relative to the point size
+AUTO_LEADING = 1.2
+
+
+class TextMeasurer(ABC):
+    """
+    Abstract class that determines how many lines a text takes up, determined by the specific subclass.
+    """
+
+    _instance = None
+
+    @abstractmethod
+    def get_text_lines(self, data: [([dict], dict)]) -> int:
+        """
+        Returns the amount of lines of the given text when printed.
+        :param data: Paragraphs to measure, in the format of `set_text_field`
+        :return: The amount of lines
+        """
+        pass
+
+    @abstractmethod
+    def get_identity(self) -> str:
+        """
+        Returns a string identifying the measurer and everything its results depend on besides the text itself, e.g.
+        the frame and the template the text is measured in.
+        :return: The identity
+        """
+        pass
+
+    @classmethod
+    def get_standard_measurer(cls) -> TextMeasurer:
+        """
+        Returns the default measurer.
+        :return: The default measurer
+        """
+        if TextMeasurer._instance is None:
+            if CONFIG_TEXT_MEASURER == "indesign":
+                measurer = InDesignTextMeasurer()
+            elif CONFIG_TEXT_MEASURER == "local":
+                measurer = LocalTextMeasurer()
+            else:
+                raise NotImplementedError
+            TextMeasurer._instance = CachingTextMeasurer(measurer) if CONFIG_TEXT_CACHE else measurer
+        return TextMeasurer._instance
+
+
+class InDesignTextMeasurer(TextMeasurer):
+    """
+    Measures text by setting it in the study document in InDesign.
+    """
+
+    def get_text_lines(self, data: [([dict], dict)]) -> int:
+        # Imported on use, so the local measurer works without InDesign
+        from src.main.handler.indesign_handler import InDesignHandler
+        return InDesignHandler().get_text_lines(data)
+
+    def get_identity(self) -> str:
+        # Line counts of the fake backend must not be mistaken for those of InDesign
+        return CONFIG_RENDERING_BACKEND + ":" + Template.load(Paths.FILE_STUDY).hash + ":" + STUDY_FRAME_NAME
+
+
+class LocalTextMeasurer(TextMeasurer):
+    """
+    Measures text without InDesign, using the glyph advances and kerning of the font files. Lines are broken greedily
+    at spaces and dashes, within the width of the text frame of the study document.
+    """
+
+    _fitting_instance = None
+
+    def __init__(self, path_fonts: str = Paths.FONTS, width: float = None) -> None:
+        super().__init__()
+        self._fonts = _FontCollection(path_fonts)
+        self.width = width if width is not None else get_study_frame_width()
+
+    @classmethod
+    def get_fitting_measurer(cls) -> LocalTextMeasurer | None:
+        """
+        Returns the measurer used to fit text into its frame while composing.
+        :return: The measurer, `None` if fitting is disabled, or fontTools or the oracle fonts are not available
+        """
+        if not CONFIG_COMPOSE_AUTOFIT:
+            return None
+        if cls._fitting_instance is None:
+            try:
+                measurer = LocalTextMeasurer()
+                for font in [Fonts.ORACLE_REGULAR, Fonts.ORACLE_KEYWORD, Fonts.ORACLE_MANA, Fonts.ORACLE_FLAVOR]:
+                    measurer._fonts.get(font["font"], font["style"])
+                cls._fitting_instance = measurer
+            except (ImportError, KeyError) as e:
+                show_info("Cannot fit text while composing (" + str(e).strip("'") + "), text is only fitted during "
+                          "export", mode=Info_Mode.WARN, end_line=True)
+                # Remember that fitting is not possible, so the warning is only shown once
+                cls._fitting_instance = False
+        return cls._fitting_instance if cls._fitting_instance is not False else None
+
+    def get_identity(self) -> str:
+        return "local:" + str(self.width) + ":" + self._fonts.signature
+
+    def get_text_lines(self, data: [([dict], dict)]) -> int:
+        return self._get_lines(data, self.width)
+
+    def get_text_height(self, data: [([dict], dict)], width: float = None) -> float:
+        """
+        Returns the height the given text takes up when printed. Like in InDesign, each line is as high as the largest
+        leading of its characters, which is either given explicitly or automatic leading. This approximates the layout
+        of InDesign, e.g. the first baseline offset and justification are not considered, so text fitted with it may
+        still be adjusted during export.
+        :param data: Paragraphs to measure, in the format of `set_text_field`
+        :param width: Width available to the text, defaults to the width of the study frame
+        :return: The height
+        """
+        height = sum(self._get_line_leadings(data, width if width is not None else self.width))
+
+        for content, paragraph_dict in data:
+            text = "".join(character_dict.get("content", "") for character_dict in content)
+            if len(text) == 0 or paragraph_dict is None:
+                continue
+            # A trailing line break opens the next paragraph, which brings its own spacing
+            if "spacing" in paragraph_dict:
+                height += float(paragraph_dict["spacing"]) * text.rstrip("\n\r").count("\n")
+            if "space_before" in paragraph_dict:
+                height += float(paragraph_dict["space_before"])
+
+        return height
+
+    def _get_lines(self, data: [([dict], dict)], frame_width: float) -> int:
+        return len(self._get_line_leadings(data, frame_width))
+
+    def _get_line_leadings(self, data: [([dict], dict)], frame_width: float) -> [float]:
+        """
+        Breaks the given text into lines.
+        :param data: Paragraphs to break, in the format of `set_text_field`
+        :param frame_width: Width of a line
+        :return: The leading of each line, i.e. the largest leading of its characters
+        """
+        # Paragraphs are set one after another, new lines only start at line breaks
+        characters = []
+        for paragraph in data:
+            for character_dict in paragraph[0]:
+                if "content" not in character_dict:
+                    continue
+                font = self._fonts.get(character_dict.get("font", Fonts.ORACLE_REGULAR["font"]),
+                                       character_dict.get("style", Fonts.ORACLE_REGULAR["style"]))
+                size = float(character_dict.get("size", Fonts.ORACLE_REGULAR["size"]))
+                leading = float(character_dict["leading"]) if "leading" in character_dict else size * AUTO_LEADING
+                characters.extend((character, font, size, leading) for character in character_dict["content"])
+
+        leadings = []
+        words = []
+        word_width = space_width = word_leading = 0.0
+        previous = None
+
+        for character, font, size, leading in characters:
+            if character in _LINE_BREAKS:
+                # The line break itself determines the leading of an empty line
+                words.append((word_width, space_width, max(word_leading, leading)))
+                leadings.extend(self._break_words(words, frame_width))
+                words = []
+                word_width = space_width = word_leading = 0.0
+                previous = None
+                continue
+
+            glyph = font.get_glyph(character)
+            width = font.get_advance(glyph)
+            if previous is not None and previous[0] is font and previous[1] == size:
+                width += font.get_kerning(previous[2], glyph)
+            width *= size / font.units_per_em
+            previous = font, size, glyph
+
+            if character in _BREAK_AFTER_SPACE:
+                space_width += width
+                word_leading = max(word_leading, leading)
+                continue
+
+            # A word ends with the spaces following it
+            if space_width > 0:
+                words.append((word_width, space_width, word_leading))
+                word_width = space_width = word_leading = 0.0
+            word_width += width
+            word_leading = max(word_leading, leading)
+
+            if character in _BREAK_AFTER:
+                words.append((word_width, 0.0, word_leading))
+                word_width = word_leading = 0.0
+
+        # Text ending with a line break does not open another line
+        if word_width > 0 or space_width > 0 or len(words) > 0:
+            words.append((word_width, space_width, word_leading))
+            leadings.extend(self._break_words(words, frame_width))
+
+        return leadings
+
+    @staticmethod
+    def _break_words(words: [(float, float, float)], width: float) -> [float]:
+        """
+        Distributes words onto lines, putting as many words as possible on each line.
+        :param words: Width of each word and of the spaces following it, and the largest leading of its characters
+        :param width: Width of a line
+        :return: The leading of each line
+        """
+        leadings = [0.0]
+        line_width = 0.0
+
+        for word_width, space_width, leading in words:
+            if line_width > 0 and line_width + word_width > width:
+                leadings.append(0.0)
+                line_width = 0.0
+            # Words wider than the frame are broken wherever necessary
+            while word_width > width:
+                leadings[-1] = max(leadings[-1], leading)
+                leadings.append(0.0)
+                word_width -= width
+            leadings[-1] = max(leadings[-1], leading)
+            line_width += word_width + space_width
+
+        return leadings
+
+
+class CachingTextMeasurer(TextMeasurer):
+    """
+    Measurer that remembers the results of another measurer on disk. Entries are addressed by a hash of the text and its
+    formatting, together with the identity of the wrapped measurer.
+    """
+
+    def __init__(self, measurer: TextMeasurer, path: str = Paths.FILE_TEXT_CACHE) -> None:
+        super().__init__()
+        self.measurer = measurer
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._identity = None
+        self._connection = None
+        self._pid = None
+
+    def get_text_lines(self, data: [([dict], dict)]) -> int:
+        key = self.get_key(data)
+        row = self._get_connection().execute("SELECT lines FROM lines WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.hits += 1
+            return row[0]
+
+        self.misses += 1
+        lines = self.measurer.get_text_lines(data)
+        self._get_connection().execute("INSERT OR REPLACE INTO lines (key, lines) VALUES (?, ?)", (key, lines))
+        self._get_connection().commit()
+        return lines
+
+    def get_identity(self) -> str:
+        if self._identity is None:
+            self._identity = self.measurer.get_identity()
+        return self._identity
+
+    def get_key(self, data: [([dict], dict)]) -> str:
+        """
+        Returns the key of the given text.
+        :param data: Paragraphs to measure, in the format of `set_text_field`
+        :return: The key
+        """
+        canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256((self.get_identity() + "\n" + canonical).encode("utf-8")).hexdigest()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # Connections cannot be shared with worker processes
+        if self._connection is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS lines (key TEXT PRIMARY KEY, lines INTEGER NOT NULL)")
+            self._connection.commit()
+            self._pid = os.getpid()
+        return self._connection
+
+
+class _FontCollection:
+    """
+    Font files of a folder, by family and style. Styles of variable fonts are taken from their named instances.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        # Imported on use, as only the local measurer requires fontTools
+        from fontTools.ttLib import TTFont
+
+        self._files = dict()
+        self._fonts = dict()
+        signature = hashlib.sha256()
+
+        for root, _, filenames in os.walk(path):
+            for filename in sorted(filenames):
+                if filename.rpartition(".")[2].lower() not in FONT_TYPES:
+                    continue
+
+                path_file = os.path.join(root, filename)
+                stat = os.stat(path_file)
+                signature.update((path_file + ":" + str(stat.st_size) + ":" + str(stat.st_mtime_ns) + "\n").encode())
+
+                font = TTFont(path_file, lazy=True)
+                family = _get_name(font, 16, 1)
+                self._files[(family, _get_name(font, 17, 2))] = (font, None)
+
+                if "fvar" in font:
+                    for instance in font["fvar"].instances:
+                        style = font["name"].getDebugName(instance.subfamilyNameID)
+                        if style is not None:
+                            self._files[(family, style.lower())] = (font, instance.coordinates)
+
+        # Changes whenever a font file is added, removed or modified
+        self.signature = signature.hexdigest()
+
+    def get(self, family: str, style: str) -> _Font:
+        """
+        Returns the font of the given family and style.
+        :param family: Name of the font family, e.g. `Plantin MT Pro`
+        :param style: Name of the style, e.g. `Italic`
+        :return: The font
+        """
+        key = (family.lower(), style.lower())
+        if key not in self._fonts:
+            if key not in self._files:
+                raise KeyError("Font " + family + " " + style + " not found")
+            font, location = self._files[key]
+            self._fonts[key] = _Font(font, location)
+        return self._fonts[key]
+
+
+class _Font:
+    """
+    Glyph metrics of a single font, or of one instance of a variable font.
+    """
+
+    def __init__(self, font, location: dict = None) -> None:
+        super().__init__()
+        self.units_per_em = font["head"].unitsPerEm
+        self._cmap = font.getBestCmap()
+        self._advances = dict()
+        self._kerning = dict()
+
+        if location is not None:
+            glyph_set = font.getGlyphSet(location=location)
+            self._get_width = lambda glyph: glyph_set[glyph].width
+        else:
+            metrics = font["hmtx"]
+            self._get_width = lambda glyph: metrics[glyph][0]
+
+        # Kerning of the legacy table, and pair adjustment subtables of each lookup of the kern feature
+        self._pairs = dict()
+        self._lookups = []
+
+        if "GPOS" in font and font["GPOS"].table.FeatureList is not None:
+            table = font["GPOS"].table
+            indices = sorted({index for record in table.FeatureList.FeatureRecord if record.FeatureTag == "kern"
+                              for index in record.Feature.LookupListIndex})
+            for index in indices:
+                lookup = table.LookupList.Lookup[index]
+                subtables = [subtable.ExtSubTable if lookup.LookupType == 9 else subtable
+                             for subtable in lookup.SubTable]
+                self._lookups.append([_PairAdjustment(subtable) for subtable in subtables
+                                      if subtable.LookupType == 2])
+        elif "kern" in font:
+            for table in font["kern"].kernTables:
+                self._pairs.update(getattr(table, "kernTable", dict()))
+
+    def get_glyph(self, character: str) -> str:
+        return self._cmap.get(ord(character), ".notdef")
+
+    def get_advance(self, glyph: str) -> float:
+        if glyph not in self._advances:
+            self._advances[glyph] = self._get_width(glyph)
+        return self._advances[glyph]
+
+    def get_kerning(self, left: str, right: str) -> float:
+        """
+        Returns the kerning between two glyphs, in font units.
+        :param left: The first glyph
+        :param right: The glyph following it
+        :return: The adjustment of the advance of the first glyph
+        """
+        if (left, right) not in self._kerning:
+            value = self._pairs.get((left, right), 0)
+            for subtables in self._lookups:
+                # Only the first subtable of a lookup that applies to the pair is used
+                for subtable in subtables:
+                    adjustment = subtable.get(left, right)
+                    if adjustment is not None:
+                        value += adjustment
+                        break
+            self._kerning[(left, right)] = value
+        return self._kerning[(left, right)]
+
+
+class _PairAdjustment:
+    """
+    Pair adjustment positioning subtable of the GPOS table, in either format.
+    """
+
+    def __init__(self, subtable) -> None:
+        super().__init__()
+        self._format = subtable.Format
+        self._coverage = {glyph: index for index, glyph in enumerate(subtable.Coverage.glyphs)}
+
+        if self._format == 1:
+            self._pairs = [{record.SecondGlyph: _get_x_advance(record.Value1) for record in pair_set.PairValueRecord}
+                           for pair_set in subtable.PairSet]
+        else:
+            self._classes_first = subtable.ClassDef1.classDefs if subtable.ClassDef1 is not None else dict()
+            self._classes_second = subtable.ClassDef2.classDefs if subtable.ClassDef2 is not None else dict()
+            self._records = subtable.Class1Record
+
+    def get(self, left: str, right: str) -> float | None:
+        """
+        Returns the adjustment of the given pair.
+        :param left: The first glyph
+        :param right: The glyph following it
+        :return: The adjustment, `None` if the subtable does not apply to the pair
+        """
+        index = self._coverage.get(left)
+        if index is None:
+            return None
+        if self._format == 1:
+            return self._pairs[index].get(right)
+
+        record = self._records[self._classes_first.get(left, 0)].Class2Record[self._classes_second.get(right, 0)]
+        return _get_x_advance(record.Value1)
+
+
+def _get_x_advance(value) -> float:
+    return getattr(value, "XAdvance", 0) or 0 if value is not None else 0
+
+
+def _get_name(font, name_id: int, fallback_id: int) -> str:
+    name = font["name"].getDebugName(name_id)
+    if name is None:
+        name = font["name"].getDebugName(fallback_id)
+    return (name or "").lower()
+
+
+def get_study_frame_width() -> float:
+    """
+    Returns the width available for text in the text frame of the study document.
+    :return: The width of the text area
+    """
+    template = Template.load(Paths.FILE_STUDY)
+    document = template.create_document()
+
+    for name in template.parts:
+        if name.startswith("Spreads/Spread_"):
+            frame = document.get_part(name).find(".//TextFrame[@Name='" + STUDY_FRAME_NAME + "']")
+            if frame is not None:
+                return get_text_width(document, frame.attrib["Self"], name[len("Spreads/Spread_"):-len(".xml")])
+
+    raise KeyError("Text frame " + STUDY_FRAME_NAME + " not found in study document")
+
+
+def calibrate_text_measurer(measurer: TextMeasurer, reference: TextMeasurer, samples: [(str, [([dict], dict)])]) \
+        -> float:
+    """
+    Compares the line counts of a measurer against those of a reference measurer, reporting every deviation.
+    :param measurer: Measurer to calibrate
+    :param reference: Measurer to compare with, usually InDesign
+    :param samples: Name and data of each text to measure
+    :return: Fraction of texts for which both measurers agree
+    """
+    agreements = 0
+    deviation = 0
+
+    for name, data in samples:
+        lines = measurer.get_text_lines(data)
+        lines_reference = reference.get_text_lines(data)
+
+        if lines == lines_reference:
+            agreements += 1
+        else:
+            deviation += abs(lines - lines_reference)
+            show_info("Measured " + str(lines) + " lines, reference " + str(lines_reference) + " lines", prefix=name,
+                      mode=Info_Mode.WARN, end_line=True)
+
+    rate = agreements / len(samples) if len(samples) > 0 else 1.0
+    show_info("Measurers agree on " + str(agreements) + " of " + str(len(samples)) + " texts (" +
+              str(round(rate * 100, 1)) + "%), " + str(deviation) + " lines deviation in total",
+              mode=Info_Mode.SUCCESS if agreements == len(samples) else Info_Mode.WARN, end_line=True)
+    return rate
+
+
+def shrink_text(data: [([dict], dict)], steps: int) -> [([dict], dict)]:
+    """
+    Reduces the point size of all characters of a text, in steps of `FITTING_INFORMATION`.
+    :param data: Paragraphs to shrink, in the format of `set_text_field`
+    :param steps: Amount of steps to shrink by
+    :return: The shrunk paragraphs
+    """
+    if steps == 0:
+        return data
+
+    reduction = steps * FITTING_INFORMATION["resize"]["step"]
+    return [([dict(character_dict,
+                   size=str(float(character_dict.get("size", Fonts.ORACLE_REGULAR["size"])) - reduction))
+              for character_dict in content], paragraph_dict) for content, paragraph_dict in data]
+
+
+def get_fitting_steps(measurer: LocalTextMeasurer, texts: [([([dict], dict)], float)], height: float) -> int:
+    """
+    Determines by how many steps the point size of texts has to be reduced, so that they fit into the given height
+    when stacked on top of each other.
+    :param measurer: Measurer to measure the texts with
+    :param texts: Paragraphs of each text, with the width available to it
+    :param height: Height available to all texts
+    :return: The smallest amount of steps for which the texts fit, or the largest allowed amount if they never fit
+    """
+    def fits(steps: int) -> bool:
+        return sum(measurer.get_text_height(shrink_text(data, steps), width) for data, width in texts) <= height
+
+    if fits(0):
+        return 0
+
+    sizes = [float(character_dict.get("size", Fonts.ORACLE_REGULAR["size"]))
+             for data, _ in texts for content, _ in data for character_dict in content]
+    low = 0
+    high = max(0, int((min(sizes, default=0.0) - FITTING_INFORMATION["resize"]["minimum"]) //
+                      FITTING_INFORMATION["resize"]["step"]))
+
+    # Shrinking by `low` steps does not suffice, shrinking by `high` steps fits (or is the most allowed)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if fits(middle):
+            high = middle
+        else:
+            low = middle
+
+    return high
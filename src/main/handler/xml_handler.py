@@ -1,20 +1,21 @@
 from xml.etree import ElementTree
 
-from PIL import Image  # Pillow
-
-from src.main.configuration.variables import Paths, Regex, IMAGE_TYPES
+from src.main.configuration.variables import Regex, IMAGE_TYPES
+from src.main.data.graphic_cache import GraphicCache
+from src.main.handler.document_handler import Document
 from src.main.utils.misc import split_string_along_regex
 
 
-def set_text_field(frame_id: str, data: [([dict], dict)]) -> None:
+def set_text_field(document: Document, frame_id: str, data: [([dict], dict)]) -> None:
     """
     Sets the entire content of a text field, overriding any and all previous values.
+    :param document: Document to modify
     :param frame_id: Frame of the field to set
     :param data: Data to write, in the following format: A list of paragraphs, with a dictionary specifying the
     paragraph options. Each paragraph has a list of dictionaries containing information about the text to set,
     and its properties.
     """
-    tree = ElementTree.parse(Paths.WORKING_MEMORY_CARD + "/Stories/Story_" + frame_id + ".xml")
+    tree = document.get_story(frame_id, modify=True)
     story_element = tree.find(".//Story[1]")
     original_paragraph_element = story_element.find(".ParagraphStyleRange[1]")
     story_element.remove(original_paragraph_element)
@@ -116,17 +117,16 @@ def set_text_field(frame_id: str, data: [([dict], dict)]) -> None:
                         content_element = ElementTree.Element("Br")
                         character_element.append(content_element)
 
-    tree.write(Paths.WORKING_MEMORY_CARD + "/Stories/Story_" + frame_id + ".xml")
-
 
-def set_gradient(gradient_id: str, colors: [str], distance: float = 0) -> None:
+def set_gradient(document: Document, gradient_id: str, colors: [str], distance: float = 0) -> None:
     """
     Applies a gradient of the given color names to the element, equally spaced.
+    :param document: Document to modify
     :param gradient_id: ID of the gradient
     :param colors: Internal color names to apply
     :param distance: Fade distance between two colors
     """
-    tree = ElementTree.parse(Paths.WORKING_MEMORY_CARD + "/Resources/Graphic.xml")
+    tree = document.get_graphic(modify=True)
     gradient = tree.find(".//Gradient[@Self='Gradient/" + gradient_id + "']")
 
     # Remove previous stops
@@ -157,21 +157,20 @@ def set_gradient(gradient_id: str, colors: [str], distance: float = 0) -> None:
         gradient_stop.set("Location", str(position_adjusted))
         gradient.append(gradient_stop)
 
-    tree.write(Paths.WORKING_MEMORY_CARD + "/Resources/Graphic.xml")
 
-
-def set_graphic(frame_id: str, spread_id: str, path: str, filename: str, type_file: str = "svg",
+def set_graphic(document: Document, frame_id: str, spread_id: str, path: str, filename: str, type_file: str = "svg",
                 mode_scale: str = "fit") -> None:
     """
     Fills the given frame with the provided graphic
+    :param document: Document to modify
     :param frame_id: Image frame of the graphic
     :param spread_id: Spread where the image frame occurs
     :param path: Path to the file
     :param filename: Name of the file
-    :param type_file: Extension of the file
+    :param type_file: Extension of the file, in any case
     :param mode_scale: Whether to fit (align with larger side) or stretch (align with smaller side) the image
     """
-    tree = ElementTree.parse(Paths.WORKING_MEMORY_CARD + "/Spreads/Spread_" + spread_id + ".xml")
+    tree = document.get_spread(spread_id, modify=True)
     frame = tree.find(".//Rectangle[@Self='" + frame_id + "']")
     coordinates = _get_coordinates(frame)
 
@@ -180,15 +179,13 @@ def set_graphic(frame_id: str, spread_id: str, path: str, filename: str, type_fi
     size_box_y = abs(coordinates[2][1] - coordinates[1][1])
 
     # Bounding box defined in the file
-    if type_file == "svg":
+    if type_file.lower() == "svg":
         graphic = ElementTree.Element("SVG")
-        bounding_box = _get_bounding_box(path, filename)
-    elif type_file in IMAGE_TYPES:
+    elif type_file.lower() in IMAGE_TYPES:
         graphic = ElementTree.Element("Image")
-        with Image.open(path + "/" + filename + "." + type_file) as img:
-            bounding_box = img.size
     else:
         raise NotImplementedError
+    bounding_box = GraphicCache.get_standard_cache().get_dimensions(path + "/" + filename + "." + type_file)
 
     # Factor to scale the graphic by to fit in the container
     factor_x = size_box_x / bounding_box[0]
@@ -244,19 +241,19 @@ def set_graphic(frame_id: str, spread_id: str, path: str, filename: str, type_fi
     link.set("LinkResourceURI", "file:" + path + "/" + filename + "." + type_file)
 
     frame.append(graphic)
-    tree.write(Paths.WORKING_MEMORY_CARD + "/Spreads/Spread_" + spread_id + ".xml")
 
 
-def set_pdf(frame_id: str, spread_id: str, path: str, filename: str, page: int = 1) -> None:
+def set_pdf(document: Document, frame_id: str, spread_id: str, path: str, filename: str, page: int = 1) -> None:
     """
     Adds a link to a PDF file to the given frame.
+    :param document: Document to modify
     :param frame_id: The frame where the PDF should be embedded
     :param spread_id: The spread where the frame occurs
     :param path: Path to the PDF
     :param filename: Filename of the PDF
     :param page: Which page of the PDF to use
     """
-    tree = ElementTree.parse(Paths.WORKING_MEMORY_PRINT + "/Spreads/Spread_" + spread_id + ".xml")
+    tree = document.get_spread(spread_id, modify=True)
     rectangle = tree.find(".//Rectangle[@Self='" + frame_id + "']")
 
     pdf = ElementTree.Element("PDF")
@@ -270,31 +267,30 @@ def set_pdf(frame_id: str, spread_id: str, path: str, filename: str, page: int =
     pdf.append(pdf_attribute)
     pdf.append(link)
 
-    tree.write(Paths.WORKING_MEMORY_PRINT + "/Spreads/Spread_" + spread_id + ".xml")
-
 
-def set_visibility(object_id: str, spread_id: str, visible) -> None:
+def set_visibility(document: Document, object_id: str, spread_id: str, visible) -> None:
     """
     Change the visibility of the given object
+    :param document: Document to modify
     :param object_id: ID of the object
     :param spread_id: Spread where the object occurs
     :param visible: Whether the object should be visible or not
     """
-    tree = ElementTree.parse(Paths.WORKING_MEMORY_CARD + "/Spreads/Spread_" + spread_id + ".xml")
+    tree = document.get_spread(spread_id, modify=True)
     xml_object = tree.find(".//*[@Self='" + object_id + "']")
     xml_object.set("Visible", "true" if visible else "false")
-    tree.write(Paths.WORKING_MEMORY_CARD + "/Spreads/Spread_" + spread_id + ".xml")
 
 
-def set_coordinates(object_id: str, spread_id: str,
+def set_coordinates(document: Document, object_id: str, spread_id: str,
                     coordinates: [(float, float), (float, float), (float, float), (float, float)]) -> None:
     """
     Adjusts the coordinates of the given object.
+    :param document: Document to modify
     :param object_id: Object to change the coordinates for
     :param spread_id: Spread where to object occurs
     :param coordinates: The new coordinates of the object
     """
-    tree = ElementTree.parse(Paths.WORKING_MEMORY_CARD + "/Spreads/Spread_" + spread_id + ".xml")
+    tree = document.get_spread(spread_id, modify=True)
     xml_object = tree.find(".//*[@Self='" + object_id + "']")
 
     top_left = xml_object.find(".//PathPointType[1]")
@@ -313,17 +309,16 @@ def set_coordinates(object_id: str, spread_id: str,
         point.set("LeftDirection", coordinate)
         point.set("RightDirection", coordinate)
 
-    tree.write(Paths.WORKING_MEMORY_CARD + "/Spreads/Spread_" + spread_id + ".xml")
 
-
-def set_transparency(object_id: str, spread_id: str, opacity: float, mode: str = "Fill") -> None:
+def set_transparency(document: Document, object_id: str, spread_id: str, opacity: float, mode: str = "Fill") -> None:
     """
     Adjusts the transparency of the given object.
+    :param document: Document to modify
     :param object_id: Object to change the transparency for
     :param spread_id: Spread where the object occurs
     :param opacity: The transparency to set
     """
-    tree = ElementTree.parse(Paths.WORKING_MEMORY_CARD + "/Spreads/Spread_" + spread_id + ".xml")
+    tree = document.get_spread(spread_id, modify=True)
     xml_object = tree.find(".//*[@Self='" + object_id + "']")
 
     transparency = ElementTree.Element(mode + "TransparencySetting")
@@ -332,18 +327,17 @@ def set_transparency(object_id: str, spread_id: str, opacity: float, mode: str =
     transparency.append(blending)
     xml_object.append(transparency)
 
-    tree.write(Paths.WORKING_MEMORY_CARD + "/Spreads/Spread_" + spread_id + ".xml")
-
 
-def move(object_id: str, spread_id: str,
+def move(document: Document, object_id: str, spread_id: str,
          move_by: (int, int)) -> None:
     """
     Moves an object by modifying its "ItemTransform" record.
+    :param document: Document to modify
     :param object_id: Object to move
     :param spread_id: Spread where the object occurs
     :param move_by: Adjustments in x and y direction
     """
-    tree = ElementTree.parse(Paths.WORKING_MEMORY_CARD + "/Spreads/Spread_" + spread_id + ".xml")
+    tree = document.get_spread(spread_id, modify=True)
     xml_object = tree.find(".//*[@Self='" + object_id + "']")
 
     coordinates = xml_object.attrib["ItemTransform"].split(" ")
@@ -351,21 +345,107 @@ def move(object_id: str, spread_id: str,
                    coordinates[0] + " " + coordinates[1] + " " + coordinates[2] + " " + coordinates[3] + " " +
                    str(float(coordinates[4]) + move_by[0]) + " " + str(float(coordinates[5]) + move_by[1]))
 
-    tree.write(Paths.WORKING_MEMORY_CARD + "/Spreads/Spread_" + spread_id + ".xml")
-
 
-def get_coordinates(object_id: str, spread_id: str) -> ((int, int), (int, int), (int, int), (int, int)):
+def set_label(document: Document, story_id: str, spread_id: str, key: str, value: str) -> None:
+    """
+    Stores a script label on the text frame displaying a story, which can be read in InDesign with `ExtractLabel`.
+    :param document: Document to modify
+    :param story_id: Story displayed by the text frame
+    :param spread_id: Spread where the text frame occurs
+    :param key: Key of the label
+    :param value: Value of the label
+    """
+    tree = document.get_spread(spread_id, modify=True)
+    xml_object = tree.find(".//TextFrame[@ParentStory='" + story_id + "']")
+
+    # Properties have to precede all other children of the text frame
+    properties = xml_object.find("Properties")
+    if properties is None:
+        properties = ElementTree.Element("Properties")
+        xml_object.insert(0, properties)
+    label = properties.find("Label")
+    if label is None:
+        label = ElementTree.SubElement(properties, "Label")
+
+    pair = label.find("KeyValuePair[@Key='" + key + "']")
+    if pair is None:
+        pair = ElementTree.SubElement(label, "KeyValuePair", {"Key": key})
+    pair.set("Value", value)
+
+
+def get_coordinates(document: Document, object_id: str,
+                    spread_id: str) -> ((int, int), (int, int), (int, int), (int, int)):
     """
     Obtains the coordinates of an object.
+    :param document: Document to read from
     :param object_id: Object to obtain the coordinates for
     :param spread_id: Spread where the object occurs
     :return: Coordinates of the corner points of the object, in the order top left, top right, bottom left, bottom right
     """
-    tree = ElementTree.parse(Paths.WORKING_MEMORY_CARD + "/Spreads/Spread_" + spread_id + ".xml")
+    tree = document.get_spread(spread_id)
     xml_object = tree.find(".//*[@Self='" + object_id + "']")
     return _get_coordinates(xml_object)
 
 
+def get_text_width(document: Document, object_id: str, spread_id: str) -> float:
+    """
+    Obtains the width available for text in a text frame, i.e. the width of the frame without its insets.
+    :param document: Document to read from
+    :param object_id: Text frame to obtain the width for
+    :param spread_id: Spread where the text frame occurs
+    :return: The width of the text area
+    """
+    tree = document.get_spread(spread_id)
+    xml_object = tree.find(".//*[@Self='" + object_id + "']")
+    coordinates = _get_coordinates(xml_object)
+    insets = _get_insets(xml_object)
+    return abs(coordinates[1][0] - coordinates[0][0]) - insets[1] - insets[3]
+
+
+def get_text_area(document: Document, story_id: str, spread_id: str) -> (float, float):
+    """
+    Obtains the area available for text in the text frame displaying a story, i.e. the size of the frame without its
+    insets.
+    :param document: Document to read from
+    :param story_id: Story displayed by the text frame
+    :param spread_id: Spread where the text frame occurs
+    :return: The width and height of the text area
+    """
+    tree = document.get_spread(spread_id)
+    xml_object = tree.find(".//TextFrame[@ParentStory='" + story_id + "']")
+    coordinates = _get_coordinates(xml_object)
+    insets = _get_insets(xml_object)
+    return abs(coordinates[1][0] - coordinates[0][0]) - insets[1] - insets[3], \
+        abs(coordinates[2][1] - coordinates[0][1]) - insets[0] - insets[2]
+
+
+def get_text_insets(document: Document, story_id: str, spread_id: str) -> (float, float, float, float):
+    """
+    Obtains the insets of the text frame displaying a story.
+    :param document: Document to read from
+    :param story_id: Story displayed by the text frame
+    :param spread_id: Spread where the text frame occurs
+    :return: The top, left, bottom and right insets
+    """
+    tree = document.get_spread(spread_id)
+    return _get_insets(tree.find(".//TextFrame[@ParentStory='" + story_id + "']"))
+
+
+def _get_insets(element) -> (float, float, float, float):
+    # Insets are given in the order top, left, bottom, right
+    preferences = element.find("TextFramePreference")
+    if preferences is not None:
+        insets = [float(item.text) for item in preferences.findall("./Properties/InsetSpacing/ListItem")]
+        if len(insets) == 0 and "InsetSpacing" in preferences.attrib:
+            insets = [float(value) for value in preferences.attrib["InsetSpacing"].split(" ")]
+        if len(insets) == 1:
+            return insets[0], insets[0], insets[0], insets[0]
+        elif len(insets) == 4:
+            return insets[0], insets[1], insets[2], insets[3]
+
+    return 0.0, 0.0, 0.0, 0.0
+
+
 def _get_coordinates(element):
     point_top_left = element.find(".//PathPointType[1]")
     point_bottom_left = element.find(".//PathPointType[2]")
@@ -385,9 +465,3 @@ def _get_coordinates(element):
     coordinates_bottom_right = float(values[0]), float(values[1])
 
     return coordinates_top_left, coordinates_top_right, coordinates_bottom_left, coordinates_bottom_right
-
-
-def _get_bounding_box(path, filename):
-    tree = ElementTree.parse(path + "/" + filename + ".svg")
-    values = tree.getroot().attrib["viewBox"].split(" ")
-    return float(values[2]), float(values[3])
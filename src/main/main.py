@@ -1,18 +1,85 @@
+import datetime
 import getopt
+import glob
+import os
 import sys
 
 from configuration.variables import SUPPORTED_MODES
-from src.main.pipeline import parse_card_list, process_card, process_print
+from src.main.configuration.variables import Paths
+from src.main.pipeline import parse_card_list, create_build_plan, prefetch_artworks, process_cards, process_print, \
+    calibrate_text_measurement, get_printable_entries
 from src.main.utils.id_generator import generate_ids
 from src.main.utils.info import show_info, Info_Mode
+from src.main.utils.profiler import Profiler
+from src.main.utils.progress import ProgressReporter
+
+
+def get_deck_paths(decks: [str]) -> [(str, str)]:
+    """
+    Resolves the given decks to the paths of their decklists.
+    :param decks: Names of decklists, or glob patterns matching several of them. `-` reads a decklist from the standard
+    input
+    :return: Name and path of each decklist, without duplicates
+    """
+    deck_paths = dict()
+    for deck in decks:
+        if deck == "-":
+            deck_paths["stdin"] = "-"
+            continue
+
+        paths = sorted(glob.glob(glob.escape("data/decks/") + deck + ".txt"))
+        if len(paths) == 0:
+            show_info("No decklist found for " + deck, mode=Info_Mode.WARN, end_line=True)
+        for path in paths:
+            deck_paths[os.path.splitext(os.path.basename(path))[0]] = path
+
+    return list(deck_paths.items())
+
+
+def process_decks(deck_paths: [(str, str)], jobs: int = 1, refresh: bool = False, force: bool = False) -> None:
+    """
+    Composes and prints the given decks in a single run. Every unique card is composed and exported once, even if
+    several decks contain it, and the print sheets of each deck are written to a folder of their own.
+    :param deck_paths: Name and path of each decklist
+    :param jobs: How many cards to compose in parallel
+    :param refresh: Whether to fetch all cards again instead of using cached data
+    :param force: Whether to compose and export all cards, regardless of the build manifest
+    """
+    deck_plans = {name: [] for name, _ in deck_paths}
+
+    def get_deck_entries():
+        for name, path in deck_paths:
+            show_info("Reading deck " + name, end_line=True)
+            yield from create_build_plan(parse_card_list(path, refresh=refresh), build_plan=deck_plans[name])
+
+    # The stages are chained lazily, so composing starts while the rest of the decklists is still being fetched. The
+    # build plan of each deck is reported, the one merging the decks only removes the cards they share
+    failed_entries = process_cards(prefetch_artworks(create_build_plan(get_deck_entries(), show_summary=False)),
+                                   jobs=jobs, force=force)
+
+    # Cards that could not be fetched or processed are left out, the rest of each deck is still printed
+    deck_plans = {name: get_printable_entries(build_plan, failed_entries) for name, build_plan in deck_plans.items()}
+
+    if len(deck_paths) == 1:
+        process_print(deck_plans[deck_paths[0][0]], force=force)
+        return
+
+    handled_cards = set()
+    for name, _ in deck_paths:
+        show_info("Printing deck " + name, end_line=True)
+        process_print(deck_plans[name], force=force, path_print=Paths.PRINT + "/" + name, handled_cards=handled_cards)
 
 
 def main(argv):
     mode = ""
-    deck = ""
+    decks = []
+    jobs = 1
+    refresh = False
+    force = False
+    profiler = Profiler.get_standard_profiler()
 
     try:
-        opts, args = getopt.getopt(argv, "m:d:", ["mode=", "deck="])
+        opts, args = getopt.getopt(argv, "m:d:j:rfp", ["mode=", "deck=", "jobs=", "refresh", "force", "profile"])
     except getopt.GetoptError:
         show_info("Invalid command line options", mode=Info_Mode.ERROR, end_line=True)
         sys.exit(2)
@@ -24,19 +91,35 @@ def main(argv):
                 show_info("Mode not supported", mode=Info_Mode.ERROR, end_line=True)
                 return
         elif opt in ("-d", "--deck"):
-            deck = arg
+            decks.extend(deck for deck in arg.split(",") if len(deck) > 0)
+        elif opt in ("-j", "--jobs"):
+            if not arg.isdigit() or int(arg) < 1:
+                show_info("Amount of jobs must be a positive number", mode=Info_Mode.ERROR, end_line=True)
+                return
+            jobs = int(arg)
+        elif opt in ("-r", "--refresh"):
+            refresh = True
+        elif opt in ("-f", "--force"):
+            force = True
+        elif opt in ("-p", "--profile"):
+            profiler.enabled = True
         else:
             show_info("Unknown command line option", mode=Info_Mode.ERROR, end_line=True)
             return
 
     if mode == "standard":
-        if deck == "":
+        deck_paths = get_deck_paths(decks)
+        if len(deck_paths) == 0:
             show_info("Must provide decklist", mode=Info_Mode.ERROR, end_line=True)
             return
-        card_entries = parse_card_list("data/decks/" + deck + ".txt")
-        for card_entry in card_entries:
-            process_card(card_entry["card"], options=card_entry.get("options"))
-        process_print(card_entries)
+        process_decks(deck_paths, jobs=jobs, refresh=refresh, force=force)
+    elif mode == "calibrate":
+        deck_paths = get_deck_paths(decks)
+        if len(deck_paths) == 0:
+            show_info("Must provide decklist", mode=Info_Mode.ERROR, end_line=True)
+            return
+        calibrate_text_measurement([card_entry for _, path in deck_paths
+                                    for card_entry in parse_card_list(path, refresh=refresh)])
     elif mode == "generate_id":
         show_info("Generating ID list...")
         generate_ids()
@@ -45,6 +128,15 @@ def main(argv):
         pass
     else:
         show_info("Unknown mode", mode=Info_Mode.ERROR, end_line=True)
+        return
+
+    if profiler.enabled:
+        path_trace = Paths.PROFILES + "/" + datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + ".json"
+        profiler.write_trace(path_trace)
+        profiler.show_summary()
+        show_info("Trace written to " + path_trace, mode=Info_Mode.SUCCESS, end_line=True)
+
+    ProgressReporter.get_standard_reporter().close()
 
 
 if __name__ == '__main__':
@@ -1,88 +1,431 @@
+import math
 import os
 import re
 import shutil
-import zipfile
+import sys
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, as_completed, wait, FIRST_COMPLETED
+from typing import Generator, Iterable
 
 from src.main.configuration.variables import Regex, SUPPORTED_LAYOUTS, Paths, Id_Sets, DOUBLE_SIDED_LAYOUTS, Ids, Fonts
+from src.main.data.artwork import prefetch_artwork
+from src.main.data.build_manifest import BuildManifest, get_fingerprint, get_document_path, get_pdf_path
 from src.main.data.card import Card
 from src.main.data.fetcher import Fetcher
 from src.main.handler.card_data_handler import set_card_name, set_type_line, set_mana_cost, set_value, set_artist, \
     set_collector_information, set_oracle_text, set_color_indicator, set_type_icon, set_artwork, set_planeswalker_text, \
-    set_modal
+    set_modal, build_oracle_data
 from src.main.handler.card_layout_handler import layout_single_faced, layout_double_faced, layout_split, layout_basic, \
     layout_adventure, layout_transparent_body_art, layout_planeswalker
-from src.main.handler.indesign_handler import InDesignHandler
+from src.main.handler.document_handler import Document, Template
+from src.main.handler.indesign_handler import InDesignHandler, set_study_document
+from src.main.handler.text_measurer import TextMeasurer, LocalTextMeasurer, InDesignTextMeasurer, \
+    CachingTextMeasurer, calibrate_text_measurer
 from src.main.handler.xml_handler import set_pdf
 from src.main.utils.info import show_info, Info_Mode
-from src.main.utils.misc import divide_into_chunks
+from src.main.utils.imposition import plan_imposition, get_sheet_size
 from src.main.utils.mtg import get_clean_name, get_card_types
+from src.main.utils.profiler import Profiler, span
+from src.main.utils.progress import ProgressReporter, report_progress
 
+# Amount of decklist entries handed from the artwork stage to composing at once. The fetching stage uses the batch size
+# of the fetcher instead, so the concurrent fetcher gets enough cards to send several requests at once
+STREAM_BATCH_SIZE = 75
 
-def parse_card_list(list_path: str) -> [dict]:
+
+def read_card_list(list_path: str) -> Generator[dict, None, None]:
     """
-    Parses a list of card names and flags, and returns a list of dictionary containing necessary information.
-    :param list_path: Path to the decklist
-    :return: The parsed data
+    Reads a decklist line by line, yielding the information of each entry as soon as it is read. Empty lines and
+    comments (starting with `#` or `//`) are skipped, invalid lines are reported and skipped.
+    :param list_path: Path to the decklist, `-` to read from the standard input
+    :return: A generator for the entries, each a dictionary containing the name, amount and options of the card
     """
-    show_info("Processing card list...")
-    card_list = []
+    with (open(sys.stdin.fileno(), closefd=False) if list_path == "-" else open(list_path)) as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if len(line) == 0 or line.startswith("#") or line.startswith("//"):
+                continue
 
-    with open(list_path) as f:
-        lines = f.readlines()
-        for line in lines:
-            dictionary = dict()
-            options = dict()
-            match = re.match(Regex.CARD_ENTRY, line)
+            with span("parse_card_list"):
+                dictionary = _parse_card_entry(line)
+            if dictionary is None:
+                show_info("Could not parse line " + str(number) + ": " + line, mode=Info_Mode.WARN, end_line=True)
+                continue
 
-            dictionary["options"] = options
-            dictionary["amount"] = match.group("amount")
-            dictionary["name"] = match.group("name")
+            yield dictionary
 
-            option_string = match.group("flags")
 
-            if option_string is not None:
-                specified_options = option_string[2:-1].split(", ")
+def _parse_card_entry(line: str) -> dict | None:
+    """
+    Parses a single line of a decklist.
+    :param line: The line, without surrounding whitespace
+    :return: Dictionary containing the name, amount and options of the card, `None` if the line is invalid
+    """
+    dictionary = dict()
+    options = dict()
+    match = re.match(Regex.CARD_ENTRY, line)
+    if match is None:
+        return None
+
+    dictionary["options"] = options
+    dictionary["amount"] = match.group("amount")
+    dictionary["name"] = match.group("name")
+
+    option_string = match.group("flags")
+
+    if option_string is not None:
+        specified_options = option_string[2:-1].split(", ")
+
+        for option in specified_options:
+            option_match = re.match(Regex.CARD_OPTIONS, option)
+            if option_match is None:
+                return None
+            if option_match.group("type") in ["set", "id", "cn"]:
+                dictionary[option_match.group("type")] = option_match.group("id")
+            else:
+                options[option_match.group("type")] = option_match.group("id")
 
-                for option in specified_options:
-                    option_match = re.match(Regex.CARD_OPTIONS, option)
-                    if option_match.group("type") in ["set", "id", "cn"]:
-                        dictionary[option_match.group("type")] = option_match.group("id")
-                    else:
-                        options[option_match.group("type")] = option_match.group("id")
+    return dictionary
+
+
+def parse_card_list(list_path: str, refresh: bool = False) -> Generator[dict, None, None]:
+    """
+    Parses a list of card names and flags, and yields dictionaries containing necessary information. The cards are
+    fetched in batches while the list is still being read, and entries are yielded as soon as their batch is fetched.
+    :param list_path: Path to the decklist, `-` to read from the standard input
+    :param refresh: Whether to fetch all cards again instead of using cached data
+    :return: A generator for the parsed data
+    """
+    show_info("Processing card list...")
+
+    fetcher = Fetcher.get_standard_fetcher()
+    fetcher.refresh = refresh
 
-            fetcher = Fetcher.get_standard_fetcher()
-            fetched_card = fetcher.fetch_card(dictionary)
-            dictionary["card"] = fetched_card
+    # Fetching runs on a separate thread, at most two batches are in flight so memory stays flat for long lists
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for batch in _batch(read_card_list(list_path), fetcher.batch_size):
+            pending.append((batch, executor.submit(_fetch_batch, fetcher, batch)))
+            while len(pending) > 0 and (pending[0][1].done() or len(pending) > 2):
+                yield from _assign_cards(*pending.popleft())
 
-            card_list.append(dictionary)
+        while len(pending) > 0:
+            yield from _assign_cards(*pending.popleft())
+
+    if fetcher.cache is not None:
+        show_info("Card cache: " + str(fetcher.cache.hits) + " hits, " + str(fetcher.cache.misses) + " misses",
+                  end_line=True)
 
     show_info("Successfully processed card list", mode=Info_Mode.SUCCESS, end_line=True)
-    return card_list
 
 
-def process_card(card: Card, options: dict = None) -> None:
+def _fetch_batch(fetcher: Fetcher, batch: [dict]) -> [Card]:
+    with span("fetch", cards=len(batch)):
+        return fetcher.fetch_cards(batch)
+
+
+def _batch(iterable: Iterable, size: int) -> Generator[list, None, None]:
+    batch = []
+    for element in iterable:
+        batch.append(element)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
+def _assign_cards(batch: [dict], future: Future) -> [dict]:
+    for dictionary, fetched_card in zip(batch, future.result()):
+        dictionary["card"] = fetched_card
+    return batch
+
+
+def create_build_plan(card_entries: Iterable[dict], build_plan: [dict] = None,
+                      show_summary: bool = True) -> Generator[dict, None, None]:
+    """
+    Groups the entries of a decklist that resolve to the same card with the same options, so each card is composed and
+    exported only once. Each unique card is yielded as soon as it is first encountered, the amounts of later entries
+    are added to the dictionary already yielded.
+    :param card_entries: Dictionaries containing information about the cards to process
+    :param build_plan: List to which all unique entries are appended as they are yielded
+    :param show_summary: Whether to report the amount of unique cards, copies and pages once all entries are grouped
+    :return: A generator for the unique entries, one per card and options
+    """
+    unique_entries = dict()
+    amount_entries = 0
+
+    for card_entry in card_entries:
+        amount_entries += 1
+        key = _get_plan_key(card_entry)
+
+        if key in unique_entries:
+            unique_entries[key]["amount"] += int(card_entry["amount"])
+        else:
+            options = card_entry.get("options") if card_entry.get("options") is not None else dict()
+            unique_entry = {"name": card_entry["name"], "card": card_entry["card"], "options": options,
+                            "amount": int(card_entry["amount"])}
+            unique_entries[key] = unique_entry
+            if build_plan is not None:
+                build_plan.append(unique_entry)
+            yield unique_entry
+
+    if not show_summary:
+        return
+
+    amount_copies = sum(entry["amount"] for entry in unique_entries.values())
+    show_info("Build plan: " + str(len(unique_entries)) + " unique cards from " + str(amount_entries) + " entries, " +
+              str(amount_copies) + " copies on " + str(math.ceil(amount_copies / get_sheet_size())) + " pages",
+              end_line=True)
+
+
+def get_printable_entries(build_plan: [dict], failed_entries: [dict]) -> [dict]:
+    """
+    Removes the entries that cannot be printed from a build plan, i.e. those whose card could not be fetched or
+    processed, so the remaining cards are still printed.
+    :param build_plan: Unique entries of a decklist, as created by `create_build_plan`
+    :param failed_entries: Entries of the cards that could not be processed, as returned by `process_cards`
+    :return: The entries to print
+    """
+    failed_keys = {_get_plan_key(card_entry) for card_entry in failed_entries}
+    return [card_entry for card_entry in build_plan
+            if card_entry["card"] is not None and _get_plan_key(card_entry) not in failed_keys]
+
+
+def _get_plan_key(card_entry: dict) -> tuple:
+    card = card_entry["card"]
+    options = card_entry.get("options") if card_entry.get("options") is not None else dict()
+    # Entries whose card could not be fetched are kept apart, so each one is reported
+    return card.id if card is not None else id(card_entry), tuple(sorted(options.items()))
+
+
+def prefetch_artworks(card_entries: Iterable[dict]) -> Generator[dict, None, None]:
+    """
+    Downloads the missing artwork of all faces of the given cards, so composing the cards only accesses local files.
+    Artwork is downloaded in batches, the entries of a batch are yielded once its artwork is available.
+    :param card_entries: Dictionaries containing information about the cards to process
+    :return: A generator for the given entries
+    """
+    for batch in _batch(card_entries, STREAM_BATCH_SIZE):
+        faces = []
+        for card_entry in batch:
+            if card_entry["card"] is not None:
+                faces.extend(get_artwork_faces(card_entry["card"]))
+
+        prefetch_artwork(faces)
+        yield from batch
+
+
+def get_artwork_faces(card: Card) -> [Card]:
+    """
+    Returns the faces of a card that are displayed with artwork, following the layouts of `process_card`.
+    :param card: The card
+    :return: The faces with artwork
+    """
+    if card.layout in ["normal", "class", "saga", "token", "emblem"]:
+        return [card]
+    elif card.layout in DOUBLE_SIDED_LAYOUTS or card.layout in ["split", "flip"]:
+        return card.card_faces[:2]
+    elif card.layout in ["adventure"]:
+        return card.card_faces[:1]
+    return []
+
+
+def calibrate_text_measurement(card_entries: [dict]) -> None:
+    """
+    Compares the line counts of the local text measurer with those of InDesign, using the oracle texts of the given
+    cards.
+    :param card_entries: A list containing dictionaries containing information about the cards to use
+    """
+    samples = []
+    handled_cards = set()
+
+    for card_entry in card_entries:
+        card = card_entry["card"]
+        if card is None or card.id in handled_cards:
+            continue
+        handled_cards.add(card.id)
+
+        for face in card.card_faces if len(card.card_faces) > 0 else [card]:
+            if face.oracle_text is not None and len(face.oracle_text) > 0:
+                samples.append((face.name, build_oracle_data(face.oracle_text, flavor=face.flavor_text)))
+
+    calibrate_text_measurer(LocalTextMeasurer(), InDesignTextMeasurer(), samples)
+
+
+def process_cards(card_entries: Iterable[dict], jobs: int = 1, force: bool = False) -> [dict]:
+    """
+    Processes all given cards. If more than one job is requested, the cards are composed in a pool of worker processes.
+    Cards whose document was already composed from the same inputs are skipped, as recorded in the build manifest.
+    The entries are consumed as they arrive, so composing starts while later cards are still being fetched.
+    :param card_entries: Dictionaries containing information about the cards to process
+    :param jobs: How many cards to compose in parallel
+    :param force: Whether to compose all cards, regardless of the build manifest
+    :return: The entries of the cards that could not be processed
+    """
+    failed_entries = []
+    measurement_statistics = [0, 0]
+    manifest = BuildManifest.get_standard_manifest()
+    profiler = Profiler.get_standard_profiler()
+    reporter = ProgressReporter.get_standard_reporter()
+    amount_entries = 0
+    amount_skipped = 0
+
+    def get_pending_entries() -> Generator[dict, None, None]:
+        nonlocal amount_entries, amount_skipped
+        for card_entry in card_entries:
+            amount_entries += 1
+            card = card_entry["card"]
+            if card is not None:
+                card_entry["fingerprint"] = get_fingerprint(card, card_entry.get("options"), get_artwork_faces(card))
+                if not force and manifest.is_current(get_document_path(card), card_entry["fingerprint"]):
+                    amount_skipped += 1
+                    continue
+            yield card_entry
+
+    def handle_result(card_entry: dict, success: bool, error: str = None) -> None:
+        if success:
+            manifest.update(get_document_path(card_entry["card"]), card_entry["fingerprint"])
+        else:
+            _report_failure(card_entry, error)
+            failed_entries.append(card_entry)
+
+    def handle_future(future: Future, card_entry: dict) -> None:
+        nonlocal measurement_statistics
+        try:
+            success, error, statistics, spans, progress = future.result()
+            measurement_statistics = [a + b for a, b in zip(measurement_statistics, statistics)]
+            profiler.merge(spans)
+            reporter.merge(progress)
+        except Exception:
+            success, error = False, traceback.format_exc()
+
+        handle_result(card_entry, success, error)
+
+    try:
+        if jobs <= 1:
+            for card_entry in get_pending_entries():
+                success, error, statistics, spans, progress = _process_card_job(card_entry["card"],
+                                                                                card_entry.get("options"))
+                measurement_statistics = [a + b for a, b in zip(measurement_statistics, statistics)]
+                profiler.merge(spans)
+                reporter.merge(progress)
+                handle_result(card_entry, success, error)
+        else:
+            try:
+                with ProcessPoolExecutor(max_workers=jobs, initializer=_initialize_job,
+                                         initargs=(profiler.enabled,)) as executor:
+                    futures = dict()
+                    for card_entry in get_pending_entries():
+                        futures[executor.submit(_process_card_job, card_entry["card"], card_entry.get("options"))] = \
+                            card_entry
+
+                        # Keep the amount of queued cards bounded, handling results while entries still arrive
+                        if len(futures) >= 2 * jobs:
+                            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                handle_future(future, futures.pop(future))
+
+                    for future in as_completed(futures):
+                        handle_future(future, futures[future])
+            finally:
+                shutil.rmtree(Paths.WORKING_MEMORY_JOBS, ignore_errors=True)
+    finally:
+        manifest.save()
+
+    if amount_skipped > 0:
+        show_info("Skipped " + str(amount_skipped) + " unchanged cards", end_line=True)
+
+    if sum(measurement_statistics) > 0:
+        show_info("Text measurement cache: " + str(measurement_statistics[0]) + " hits, " +
+                  str(measurement_statistics[1]) + " misses (" +
+                  str(round(measurement_statistics[0] / sum(measurement_statistics) * 100, 1)) + "% hit rate)",
+                  end_line=True)
+
+    if len(failed_entries) > 0:
+        show_info("Could not process " + str(len(failed_entries)) + " of " + str(amount_entries) + " cards",
+                  mode=Info_Mode.ERROR, end_line=True)
+    else:
+        show_info("Successfully processed " + str(amount_entries) + " cards", mode=Info_Mode.SUCCESS, end_line=True)
+
+    return failed_entries
+
+
+def _initialize_job(profile: bool = False) -> None:
+    """
+    Sets up the isolated working area of a worker process.
+    :param profile: Whether to record spans
+    """
+    Profiler.get_standard_profiler().enabled = profile
+    path_working_memory = Paths.WORKING_MEMORY_JOBS + "/" + str(os.getpid())
+    os.makedirs(path_working_memory, exist_ok=True)
+
+    shutil.copyfile(Paths.FILE_STUDY, path_working_memory + "/Study.idml")
+    set_study_document(path_working_memory + "/Study.idml")
+
+
+def _process_card_job(card: Card, options: dict = None) -> (bool, str, (int, int), [dict], dict):
+    """
+    Processes a single card, capturing any error so it can be reported by the parent process.
+    :param card: The card to process
+    :param options: Additional options
+    :return: Whether the card was processed successfully, the error that occurred otherwise, the hits and misses
+    of the text measurement cache while processing the card, the spans recorded while processing the card, and the
+    progress reported while processing the card
+    """
+    statistics = _get_measurement_statistics()
+    try:
+        with span("process_card", card=card.name):
+            if process_card(card, options=options):
+                result = True, None
+            else:
+                result = False, None
+    except Exception:
+        result = False, traceback.format_exc()
+
+    return result + (tuple(b - a for a, b in zip(statistics, _get_measurement_statistics())),
+                     Profiler.get_standard_profiler().collect(), ProgressReporter.get_standard_reporter().collect())
+
+
+def _get_measurement_statistics() -> (int, int):
+    # Do not create the measurer here, the card may not require measuring at all
+    measurer = TextMeasurer._instance
+    if isinstance(measurer, CachingTextMeasurer):
+        return measurer.hits, measurer.misses
+    return 0, 0
+
+
+def _report_failure(card_entry: dict, error: str = None) -> None:
+    card = card_entry["card"]
+    message = "Could not process card"
+    if error is not None:
+        message += ": " + error.strip().splitlines()[-1]
+    show_info(message, prefix=card.name if card is not None else card_entry["name"], mode=Info_Mode.ERROR,
+              end_line=True)
+
+
+def process_card(card: Card, options: dict = None) -> bool:
     """
     Handles processing of given card, like inserting information and adjusting layouts.
     :param card: The card to process
     :param options: Additional options
+    :return: Whether the card was processed
     """
     if card.layout not in SUPPORTED_LAYOUTS:
         show_info("Layout not supported", prefix=card.name, mode=Info_Mode.ERROR, end_line=True)
-        return
+        return False
 
     # Setup folders
-    path_folder = Paths.DOCUMENTS + "/" + card.set.upper()
-    path_file = path_folder + "/" + card.collector_number + " - " + get_clean_name(card.name)
-    path_file_extension = path_file + ".idml"
+    path_file = get_document_path(card)
 
-    # Extract XML file
-    os.makedirs(path_folder, exist_ok=True)
-    with zipfile.ZipFile(Paths.FILE_TEMPLATE, "r") as archive:
-        archive.extractall(Paths.WORKING_MEMORY_CARD)
+    # Create document from template
+    os.makedirs(os.path.dirname(path_file), exist_ok=True)
+    document = Template.load(Paths.FILE_TEMPLATE).create_document()
 
     # Layouts
     if card.layout not in DOUBLE_SIDED_LAYOUTS:
-        layout_single_faced(Id_Sets.ID_SET_BACK)
+        layout_single_faced(document, Id_Sets.ID_SET_BACK)
 
     # Options
     if options is None:
@@ -90,24 +433,24 @@ def process_card(card: Card, options: dict = None) -> None:
 
     if "tba" in options:
         if options["tba"] in ["front", "both"]:
-            layout_transparent_body_art(Id_Sets.ID_SET_FRONT)
+            layout_transparent_body_art(document, Id_Sets.ID_SET_FRONT)
         if options["tba"] in ["back", "both"]:
-            layout_transparent_body_art(Id_Sets.ID_SET_BACK)
+            layout_transparent_body_art(document, Id_Sets.ID_SET_BACK)
 
     # Processing
     if card.layout in ["normal", "class", "saga"]:
-        process_face(card, Id_Sets.ID_SET_FRONT)
+        process_face(document, card, Id_Sets.ID_SET_FRONT)
     elif card.layout in DOUBLE_SIDED_LAYOUTS:
-        layout_double_faced([Id_Sets.ID_SET_FRONT, Id_Sets.ID_SET_BACK])
-        set_modal(card, [Id_Sets.ID_SET_FRONT, Id_Sets.ID_SET_BACK])
-        process_face(card.card_faces[0], Id_Sets.ID_SET_FRONT)
-        process_face(card.card_faces[1], Id_Sets.ID_SET_BACK)
+        layout_double_faced(document, [Id_Sets.ID_SET_FRONT, Id_Sets.ID_SET_BACK])
+        set_modal(document, card, [Id_Sets.ID_SET_FRONT, Id_Sets.ID_SET_BACK])
+        process_face(document, card.card_faces[0], Id_Sets.ID_SET_FRONT)
+        process_face(document, card.card_faces[1], Id_Sets.ID_SET_BACK)
     elif card.layout in ["split", "flip"]:
-        layout_split(Id_Sets.ID_SET_FRONT)
-        process_face(card.card_faces[0], Id_Sets.ID_SET_SPLIT_TOP_FRONT)
-        process_face(card.card_faces[1], Id_Sets.ID_SET_SPLIT_BOT_FRONT)
+        layout_split(document, Id_Sets.ID_SET_FRONT)
+        process_face(document, card.card_faces[0], Id_Sets.ID_SET_SPLIT_TOP_FRONT)
+        process_face(document, card.card_faces[1], Id_Sets.ID_SET_SPLIT_BOT_FRONT)
     elif card.layout in ["adventure"]:
-        layout_adventure(Id_Sets.ID_SET_FRONT)
+        layout_adventure(document, Id_Sets.ID_SET_FRONT)
 
         id_adventure_right = Id_Sets.ID_SET_FRONT.copy()
         id_adventure_right[Ids.ORACLE_T] = Id_Sets.ID_SET_FRONT_ADVENTURE[Ids.ADVENTURE_ORACLE_RIGHT_T]
@@ -116,28 +459,25 @@ def process_card(card: Card, options: dict = None) -> None:
         id_adventure_left = Id_Sets.ID_SET_FRONT_ADVENTURE.copy()
         id_adventure_left[Ids.ORACLE_T] = id_adventure_left[Ids.ADVENTURE_ORACLE_LEFT_T]
 
-        process_face(card.card_faces[0], id_adventure_right)
-        process_face(card.card_faces[1], id_adventure_left, mode="adventure")
+        process_face(document, card.card_faces[0], id_adventure_right)
+        process_face(document, card.card_faces[1], id_adventure_left, mode="adventure")
     elif card.layout in ["token", "emblem"]:
         if card.oracle_text is None or len(card.oracle_text) == 0:
-            layout_basic(Id_Sets.ID_SET_FRONT)
-        process_face(card, Id_Sets.ID_SET_FRONT)
+            layout_basic(document, Id_Sets.ID_SET_FRONT)
+        process_face(document, card, Id_Sets.ID_SET_FRONT)
 
     # Packaging
-    shutil.make_archive(path_file, "zip", Paths.WORKING_MEMORY_CARD)
-    try:
-        os.remove(path_file_extension)
-    except OSError:
-        pass
-    os.rename(path_file + ".zip", path_file + ".idml")
-    shutil.rmtree(Paths.WORKING_MEMORY_CARD)
+    with span("package", card=card.name):
+        document.write(path_file)
 
     show_info("Successfully processed", prefix=card.name, mode=Info_Mode.SUCCESS, end_line=True)
+    return True
 
 
-def process_face(card: Card, id_set: dict, mode: str = None) -> None:
+def process_face(document: Document, card: Card, id_set: dict, mode: str = None) -> None:
     """
     Fills the given face with all the necessary information, e.g. title, oracle text, ...
+    :param document: Document to modify
     :param card: Card object containing the information
     :param id_set: Which id set to use
     :param mode: Specifies which special mode (e.g., adventure) to use
@@ -146,54 +486,60 @@ def process_face(card: Card, id_set: dict, mode: str = None) -> None:
 
     # Layouts
     if "Basic" in type_line:
-        layout_basic(id_set)
+        layout_basic(document, id_set)
     if "Planeswalker" in type_line:
-        layout_planeswalker(id_set)
+        layout_planeswalker(document, id_set)
 
     # Common Attributes
     if Ids.ARTWORK_O in id_set:
-        set_artwork(card, id_set)
+        set_artwork(document, card, id_set)
 
-    set_type_icon(card, id_set)
-    set_card_name(card, id_set, font_settings=Fonts.TITLE_ADVENTURE if mode == "adventure" else dict())
-    set_type_line(card, id_set, font_settings=Fonts.TYPE_LINE_ADVENTURE if mode == "adventure" else None)
-    set_mana_cost(card, id_set, font_settings=Fonts.MANA_COST_ADVENTURE if mode == "adventure" else None)
-    set_color_indicator(card, id_set)
+    set_type_icon(document, card, id_set)
+    set_card_name(document, card, id_set, font_settings=Fonts.TITLE_ADVENTURE if mode == "adventure" else dict())
+    set_type_line(document, card, id_set, font_settings=Fonts.TYPE_LINE_ADVENTURE if mode == "adventure" else None)
+    set_mana_cost(document, card, id_set, font_settings=Fonts.MANA_COST_ADVENTURE if mode == "adventure" else None)
+    set_color_indicator(document, card, id_set)
 
     if "Planeswalker" in type_line:
-        set_planeswalker_text(card, id_set)
+        set_planeswalker_text(document, card, id_set)
     else:
-        set_oracle_text(card, id_set, may_be_centered=card.layout not in ["adventure"])
+        set_oracle_text(document, card, id_set, may_be_centered=card.layout not in ["adventure"])
 
     if Ids.VALUE_T in id_set:
-        set_value(card, id_set)
+        set_value(document, card, id_set)
     if Ids.ARTIST_INFORMATION_T in id_set:
-        set_artist(card, id_set)
+        set_artist(document, card, id_set)
     if Ids.COLLECTOR_INFORMATION_T in id_set:
-        set_collector_information(card, id_set)
+        set_collector_information(document, card, id_set)
 
 
-def process_print(card_entries: [dict]) -> None:
+def process_print(card_entries: [dict], force: bool = False, path_print: str = Paths.PRINT,
+                  handled_cards: set = None) -> None:
     """
-    Handles the printing of the card given in the list.
+    Handles the printing of the card given in the list. PDFs that were already exported from the same inputs are
+    reused, as recorded in the build manifest.
     :param card_entries: A list containing dictionaries containing information about the cards to print
+    :param force: Whether to export all PDFs, regardless of the build manifest
+    :param path_print: Folder to write the print sheets to, its previous contents are deleted
+    :param handled_cards: IDs of the cards whose PDF was already handled, e.g. while printing another deck. Updated
+    with the cards of this print
     """
-    cards_to_print = []
-
-    # Determine which cards to print how often
+    fingerprints = dict()
     for card_entry in card_entries:
         card = card_entry["card"]
-        for i in range(0, int(card_entry["amount"])):
-            if card.layout in DOUBLE_SIDED_LAYOUTS:
-                cards_to_print.insert(0, card)
-            else:
-                cards_to_print.append(card)
+        if "fingerprint" not in card_entry:
+            card_entry["fingerprint"] = get_fingerprint(card, card_entry.get("options"), get_artwork_faces(card))
+        fingerprints[card.id] = card_entry["fingerprint"]
+
+    # Determine which cards to print on which sheet
+    sheets = plan_imposition(card_entries)
+    digits = max(2, len(str(len(sheets))))
 
-    os.makedirs(Paths.PRINT, exist_ok=True)
+    os.makedirs(path_print, exist_ok=True)
 
     # Delete old files
-    for filename in os.listdir(Paths.PRINT):
-        file_path = os.path.join(Paths.PRINT, filename)
+    for filename in os.listdir(path_print):
+        file_path = os.path.join(path_print, filename)
         try:
             if os.path.isfile(file_path) or os.path.islink(file_path):
                 os.unlink(file_path)
@@ -203,41 +549,59 @@ def process_print(card_entries: [dict]) -> None:
             show_info("Could not delete file, error: {}".format(e), mode=Info_Mode.ERROR)
             return
 
-    already_handled_cards = []
-    for i, page in enumerate(list(divide_into_chunks(cards_to_print, 8))):
-        target_file_path = Paths.PRINT + "/page_" + str(i + 1).zfill(2)
-        target_file_path_extension = target_file_path + ".idml"
+    template = Template.load(Paths.FILE_PRINT)
+    manifest = BuildManifest.get_standard_manifest()
+    amount_exported = amount_skipped = 0
 
-        # Extract print template
-        os.makedirs(Paths.PRINT, exist_ok=True)
-        with zipfile.ZipFile(Paths.FILE_PRINT, "r") as archive:
-            archive.extractall(Paths.WORKING_MEMORY_PRINT)
+    already_handled_cards = handled_cards if handled_cards is not None else set()
+    for i, sheet in enumerate(sheets):
+        with span("print_page", page=i + 1):
+            target_file_path = path_print + "/page_" + str(i + 1).zfill(digits) + ".idml"
 
-        indesign_handler = InDesignHandler()
+            document = template.create_document()
+            if not sheet["duplex"]:
+                layout_single_faced(document, Id_Sets.ID_SET_PRINT_BACK)
 
-        for j, card in enumerate(page):
-            show_info("Processing print...", prefix=card.name)
+            for j, card in enumerate(sheet["cards"]):
+                report_progress(card.name, "print")
 
-            clean_name = card.collector_number + " - " + get_clean_name(card.name)
+                clean_name = card.collector_number + " - " + get_clean_name(card.name)
 
-            # Convert to PDF
-            if card.id not in already_handled_cards:
-                indesign_handler.generate_pdf(card)
-                already_handled_cards.append(card.id)
+                # Convert to PDF
+                if card.id not in already_handled_cards:
+                    already_handled_cards.add(card.id)
+                    if not force and manifest.is_current(get_pdf_path(card), fingerprints[card.id]):
+                        amount_skipped += 1
+                    else:
+                        amount_exported += 1
+                        if InDesignHandler().generate_pdf(card, fingerprint=fingerprints[card.id]):
+                            manifest.update(get_pdf_path(card), fingerprints[card.id])
+                            manifest.save()
 
-            set_pdf(Id_Sets.ID_SET_PRINT_FRONT[Ids.PRINTING_FRAME_O][j], Id_Sets.ID_SET_PRINT_FRONT[Ids.SPREAD],
-                    Paths.PDF + "/" + card.set.upper(), clean_name)
+                set_pdf(document, Id_Sets.ID_SET_PRINT_FRONT[Ids.PRINTING_FRAME_O][j],
+                        Id_Sets.ID_SET_PRINT_FRONT[Ids.SPREAD], Paths.PDF + "/" + card.set.upper(), clean_name)
 
-            if card.layout in DOUBLE_SIDED_LAYOUTS:
-                set_pdf(Id_Sets.ID_SET_PRINT_BACK[Ids.PRINTING_FRAME_O][j], Id_Sets.ID_SET_PRINT_BACK[Ids.SPREAD],
-                        Paths.PDF + "/" + card.set.upper(), clean_name, page=2)
+                if card.layout in DOUBLE_SIDED_LAYOUTS:
+                    set_pdf(document, Id_Sets.ID_SET_PRINT_BACK[Ids.PRINTING_FRAME_O][j],
+                            Id_Sets.ID_SET_PRINT_BACK[Ids.SPREAD], Paths.PDF + "/" + card.set.upper(), clean_name,
+                            page=2)
 
-            show_info("Successfully processed", prefix=card.name, end_line=True)
+                show_info("Successfully processed", prefix=card.name, end_line=True)
 
-        shutil.make_archive(target_file_path, "zip", Paths.WORKING_MEMORY_PRINT)
-        try:
-            os.remove(target_file_path_extension)
-        except OSError:
-            pass
-        os.rename(target_file_path + ".zip", target_file_path + ".idml")
-        shutil.rmtree(Paths.WORKING_MEMORY_PRINT)
+            document.write(target_file_path)
+
+    if amount_skipped > 0:
+        show_info("Reused " + str(amount_skipped) + " unchanged PDFs", end_line=True)
+
+    if amount_exported > 0:
+        indesign_handler = InDesignHandler()
+        statistics = indesign_handler.fitting_statistics
+        show_info("Text fitting: " + str(statistics["cards"]) + " cards, " + str(statistics["warm"]) +
+                  " fitted by reapplying the last fit, " + str(statistics["searched"]) + " searched with " +
+                  str(statistics["checks"]) + " overflow checks", end_line=True)
+
+        if indesign_handler.recorder is not None and statistics["cards"] > 0:
+            recorder = indesign_handler.recorder
+            show_info("InDesign operations: " + str(recorder.total) + " (" +
+                      str(round(recorder.total / statistics["cards"], 1)) + " per card, " +
+                      str(round(recorder.total_duration * 1000, 1)) + "ms)", end_line=True)
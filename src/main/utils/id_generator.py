@@ -1,10 +1,7 @@
-import shutil
-import zipfile
-from xml.etree import ElementTree
-
 from src.main.configuration.config import CONFIG_PATH_ID_FILE, CONFIG_FRONT_ID, CONFIG_BACK_ID, CONFIG_PRINT_FRONT_ID, \
     CONFIG_PRINT_BACK_ID
 from src.main.configuration.variables import Paths, Id_Names, Ids
+from src.main.handler.document_handler import Template
 
 
 def generate_ids() -> None:
@@ -13,11 +10,6 @@ def generate_ids() -> None:
     """
     open(CONFIG_PATH_ID_FILE, 'w').close()
 
-    with zipfile.ZipFile(Paths.FILE_TEMPLATE, "r") as archive:
-        archive.extractall(Paths.WORKING_MEMORY_CARD)
-    with zipfile.ZipFile(Paths.FILE_PRINT, "r") as archive:
-        archive.extractall(Paths.WORKING_MEMORY_PRINT)
-
     _fetch_ids("FRONT", CONFIG_FRONT_ID, Id_Names.GROUP_NORMAL)
     _fetch_ids("SPLIT_TOP_FRONT", CONFIG_FRONT_ID, Id_Names.GROUP_SPLIT_TOP, mode="split")
     _fetch_ids("SPLIT_BOT_FRONT", CONFIG_FRONT_ID, Id_Names.GROUP_SPLIT_BOT, mode="split")
@@ -26,9 +18,6 @@ def generate_ids() -> None:
     _fetch_ids("PRINT_FRONT", CONFIG_PRINT_FRONT_ID, None, mode="printing")
     _fetch_ids("PRINT_BACK", CONFIG_PRINT_BACK_ID, None, mode="printing")
 
-    shutil.rmtree(Paths.WORKING_MEMORY_CARD)
-    shutil.rmtree(Paths.WORKING_MEMORY_PRINT)
-
 
 def _fetch_ids(name, spread, root_element, mode="standard") -> None:
     """
@@ -43,12 +32,12 @@ def _fetch_ids(name, spread, root_element, mode="standard") -> None:
     tree, base_tree = None, None
 
     if mode != "printing":
-        tree = ElementTree.parse(Paths.WORKING_MEMORY_CARD + "/Spreads/Spread_" + spread + ".xml")
+        tree = Template.load(Paths.FILE_TEMPLATE).create_document().get_spread(spread)
         base_tree = tree
         if root_element is not None:
             tree = tree.find(".//*[@Name='" + root_element + "']")
     else:
-        tree = ElementTree.parse(Paths.WORKING_MEMORY_PRINT + "/Spreads/Spread_" + spread + ".xml")
+        tree = Template.load(Paths.FILE_PRINT).create_document().get_spread(spread)
 
     # Ids base case
     names_base = [
@@ -0,0 +1,35 @@
+from src.main.configuration.variables import Id_Sets, Ids, DOUBLE_SIDED_LAYOUTS
+
+
+def get_sheet_size() -> int:
+    """
+    Returns how many cards fit on a sheet of the print template, i.e. the amount of printing frames on its front.
+    :return: The amount of cards per sheet
+    """
+    slots = len(Id_Sets.ID_SET_PRINT_FRONT[Ids.PRINTING_FRAME_O])
+    if len(Id_Sets.ID_SET_PRINT_BACK[Ids.PRINTING_FRAME_O]) < slots:
+        raise ValueError("Print template has fewer printing frames on the back than on the front")
+    return slots
+
+
+def plan_imposition(card_entries: [dict], slots: int = None) -> [dict]:
+    """
+    Distributes the cards to print onto sheets. Double-sided cards are packed onto the first sheets, so as few sheets as
+    possible have to be printed in duplex, single-sided cards fill the remaining slots.
+    :param card_entries: A list containing dictionaries containing the cards to print and their amounts
+    :param slots: How many cards fit on a sheet, defaults to the size of the print template
+    :return: The sheets, each a dictionary containing its cards, and whether its back has to be printed
+    """
+    if slots is None:
+        slots = get_sheet_size()
+
+    cards_double_sided = []
+    cards_single_sided = []
+    for card_entry in card_entries:
+        card = card_entry["card"]
+        cards = cards_double_sided if card.layout in DOUBLE_SIDED_LAYOUTS else cards_single_sided
+        cards.extend([card] * int(card_entry["amount"]))
+
+    cards = cards_double_sided + cards_single_sided
+    return [{"cards": cards[start:start + slots], "duplex": start < len(cards_double_sided)}
+            for start in range(0, len(cards), slots)]
@@ -1,6 +1,5 @@
-import sys
-
 from src.main.configuration.variables import Colors
+from src.main.utils.progress import ProgressReporter, Progress_Status, PREFIX
 
 
 class Info_Mode:
@@ -10,27 +9,20 @@ class Info_Mode:
     ERROR = Colors.RED
 
 
-def show_info(message: str, prefix: str = "ProxKy", mode: Info_Mode = Info_Mode.NORMAL, normalize_length=50,
+_STATUSES = {Info_Mode.NORMAL: Progress_Status.INFO, Info_Mode.SUCCESS: Progress_Status.SUCCESS,
+             Info_Mode.WARN: Progress_Status.WARN, Info_Mode.ERROR: Progress_Status.ERROR}
+
+
+def show_info(message: str, prefix: str = PREFIX, mode: Info_Mode = Info_Mode.NORMAL, normalize_length=50,
               end_line=False) -> None:
     """
-    Prints info message to terminal.
-    :param end_line: If the line should be ended with a newline character
+    Reports info message to the progress reporter, which prints it to terminal.
+    :param end_line: If the message should persist, otherwise it is replaced by the next message and may be dropped
     :param message: Message to print
-    :param prefix: Prefix to prepend to the message
+    :param prefix: Prefix to prepend to the message, usually the card the message concerns
     :param mode: How to format the message
     :param normalize_length: Message prefix will be fixed to this size
     """
-    print(f"\r{mode}{_truncate_prefix(prefix, normalize_length)}{Colors.END}{message}",
-          end="\n" if end_line else "")
-    sys.stdout.flush()
-
-
-def _truncate_prefix(prefix: str, length: int) -> str:
-    truncated_prefix = "["
-    truncated_prefix += prefix[:length - 2 - 3] + "..." if len(prefix) - 2 > length else prefix
-    truncated_prefix += "]"
-
-    for i in range(0, length - len(truncated_prefix)):
-        truncated_prefix += " "
-
-    return truncated_prefix
+    status = _STATUSES[mode] if end_line or mode != Info_Mode.NORMAL else Progress_Status.RUNNING
+    ProgressReporter.get_standard_reporter().report(card=prefix if prefix != PREFIX else None, status=status,
+                                                    message=message, width=normalize_length)
@@ -1,83 +1,89 @@
-import math
-import os
+import functools
 import re
-from collections import Generator
+from typing import Generator
+
+# Start of a named group within a regex, but not of an escaped parenthesis
+_NAMED_GROUP = re.compile(r"(?<!\\)\(\?P<[A-Za-z_]\w*>")
+# Characters with a special meaning in regex, regex without any of these match themselves literally
+_REGEX_SPECIAL = frozenset(".^$*+?{}[]\\|()")
 
 
 def mm_to_pt(mm: float) -> float:
     return (1 / (1 / 72 * 25.4)) * mm
 
 
-def check_exists(path) -> bool:
-    """
-    Checks if a file at the given path exists
-    :param path: The path of the file
-    :return: Whether the file exists or not
-    """
-    return os.path.exists(path)
-
-
 def split_string_along_regex(string, matchers: ([str], str), standard_identifier="normal"):
     """
     Splits a string according to some rules given by the matcher element. Matchers element consists of regex to match,
     and moniker to assign. If the initial string matches one of the regex elements, it will be assigned the fitting moniker.
+    If several regex match, the one matching first wins, ties are resolved by the order of the matchers.
     :param string: String to split up
     :param matchers: Regex matcher, defines how the string will be split up
     :param standard_identifier: Which identifier to assign for parts of the next where no regex matches
     :return: The split-up string
     """
-    # Build list of all available regex
-    all_regex = []
-    for pair in matchers:
-        for regex in pair[0]:
-            all_regex.append(regex)
-    all_regex = list(dict.fromkeys(all_regex))
+    pattern, monikers = _compile_matchers(tuple((tuple(pair[0]), pair[1]) for pair in matchers))
 
-    working_string = string
     result = []
+    position = 0
 
-    while len(working_string) > 0:
-        current_span = [math.inf, 0]
-        current_regex = ""
-
-        # Check which regex matches first, disregard regex that matches after already found ones
-        for regex in all_regex:
-            pattern = re.compile(regex)
-            matches = list(pattern.finditer(working_string))
-            if len(matches) > 0 and matches[0].span()[0] < current_span[0]:
-                current_span = matches[0].span()
-                current_regex = regex
-                if current_span[0] == 0:
-                    break
-
-        # If no regex matched we are dealing with a normal string
-        if current_span[0] == math.inf:
-            result.append((working_string, standard_identifier))
-            working_string = ""
-        else:
-            # Split into two parts
-            part_one = working_string[:current_span[0]]
-            part_two = working_string[current_span[0]:]
-
-            # Everything before match is normal, remove it first
-            rectifier = 0
-            if current_span[0] > 0:
-                result.append((part_one, standard_identifier))
-                rectifier = len(part_one)
-
-            part_one = part_two[:current_span[1] - rectifier]
-            part_two = part_two[current_span[1] - rectifier:]
-
-            # Search which regex matched and add to result
-            for pair in matchers:
-                if current_regex in pair[0]:
-                    result.append((part_one, pair[1]))
-                    working_string = part_two
-                    break
+    while position < len(string):
+        match = pattern.search(string, position)
+
+        # If no regex matched the rest is a normal string
+        if match is None:
+            result.append((string[position:], standard_identifier))
+            break
+
+        # Everything before match is normal
+        if match.start() > position:
+            result.append((string[position:match.start()], standard_identifier))
+
+        result.append((match.group(), monikers[match.lastgroup]))
+        position = match.end()
 
     return result
 
 
+@functools.lru_cache(maxsize=None)
+def _compile_matchers(matchers: ((str, ...), str)) -> (re.Pattern, dict):
+    """
+    Compiles all regex of the given matchers into a single alternation, so a string can be split in a single pass.
+    Consecutive regex sharing a moniker are combined into one named group, named groups contained in the regex
+    themselves are turned into non-capturing groups in order to avoid name clashes. Groups consisting only of literals
+    (e.g. ability words) are guarded by their possible first characters, so they are skipped quickly at most positions.
+    :param matchers: Regex matcher, as tuple of tuples
+    :return: The compiled pattern, and a mapping from the group names of the pattern to the monikers
+    """
+    # Remove duplicate regex, these are assigned to the first matcher they occur in
+    regex_monikers = dict()
+    for pair in matchers:
+        for regex in pair[0]:
+            regex_monikers.setdefault(regex, pair[1])
+
+    runs = []
+    for regex, moniker in regex_monikers.items():
+        if len(runs) > 0 and runs[-1][1] == moniker:
+            runs[-1][0].append(regex)
+        else:
+            runs.append(([regex], moniker))
+
+    alternatives = []
+    monikers = dict()
+    for index, (regex_list, moniker) in enumerate(runs):
+        group = "t" + str(index)
+        monikers[group] = moniker
+
+        body = "|".join(_NAMED_GROUP.sub("(?:", regex) for regex in regex_list)
+        if all(len(regex) > 0 and _REGEX_SPECIAL.isdisjoint(regex) for regex in regex_list):
+            first_characters = "".join(sorted(set(re.escape(regex[0]) for regex in regex_list)))
+            body = "(?=[" + first_characters + "])(?:" + body + ")"
+        alternatives.append("(?P<" + group + ">" + body + ")")
+
+    # Empty matchers result in a pattern that never matches
+    return re.compile("|".join(alternatives) if len(alternatives) > 0 else "(?!)"), monikers
+
+
 def split_string_reminder(reminder_array) -> [str]:
     """
     Splits the reminder text, in order to handle, e.g., mana text in the reminder
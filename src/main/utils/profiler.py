@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+from src.main.utils.info import show_info
+
+
+class Profiler:
+    """
+    Records spans, i.e. named and timed sections of a run, and exports them as Chrome trace events. While disabled,
+    entering a span only costs a check of a flag.
+    """
+
+    _instance = None
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.enabled = False
+        self._events = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_standard_profiler(cls) -> Profiler:
+        """
+        Returns the profiler of this process.
+        :return: The profiler
+        """
+        if cls._instance is None:
+            cls._instance = Profiler()
+        return cls._instance
+
+    def record(self, name: str, start: int, duration: int, args: dict = None) -> None:
+        """
+        Records a finished span.
+        :param name: Name of the stage
+        :param start: Wall clock time the span started at, in nanoseconds
+        :param duration: Duration of the span, in nanoseconds
+        :param args: Additional information shown with the span, e.g. the card
+        """
+        event = {"name": name, "ph": "X", "ts": start / 1000, "dur": duration / 1000, "pid": os.getpid(),
+                 "tid": threading.get_ident()}
+        if args is not None:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+
+    def collect(self) -> [dict]:
+        """
+        Removes and returns all recorded spans, e.g. to hand the spans of a worker process to the parent process.
+        :return: The spans, as Chrome trace events
+        """
+        with self._lock:
+            events, self._events = self._events, []
+        return events
+
+    def merge(self, events: [dict]) -> None:
+        """
+        Adds spans recorded by another profiler, e.g. the one of a worker process.
+        :param events: The spans, as Chrome trace events
+        """
+        with self._lock:
+            self._events.extend(events)
+
+    def write_trace(self, path: str) -> None:
+        """
+        Writes all spans as Chrome trace, which can be opened in `chrome://tracing` or Perfetto.
+        :param path: Path of the file to create
+        """
+        with self._lock:
+            events = list(self._events)
+
+        # Name the processes, so worker processes can be told apart from the main process
+        for pid in sorted({event["pid"] for event in events}):
+            events.append({"name": "process_name", "ph": "M", "pid": pid,
+                           "args": {"name": "ProxKy" if pid == os.getpid() else "Worker " + str(pid)}})
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    def get_summary(self) -> [(str, int, float, float, float)]:
+        """
+        Aggregates the spans per stage.
+        :return: Name, count, total, median and 95th percentile of the durations in milliseconds of each stage, ordered
+        by total duration
+        """
+        durations = dict()
+        with self._lock:
+            for event in self._events:
+                durations.setdefault(event["name"], []).append(event["dur"] / 1000)
+
+        summary = []
+        for name, values in durations.items():
+            values.sort()
+            summary.append((name, len(values), sum(values), _get_percentile(values, 0.5),
+                            _get_percentile(values, 0.95)))
+        return sorted(summary, key=lambda entry: entry[2], reverse=True)
+
+    def show_summary(self) -> None:
+        """
+        Prints the aggregated spans per stage as table.
+        """
+        show_info(f"{'Stage':<28}{'Count':>8}{'Total (ms)':>14}{'p50 (ms)':>12}{'p95 (ms)':>12}", end_line=True)
+        for name, count, total, p50, p95 in self.get_summary():
+            show_info(f"{name:<28}{count:>8}{total:>14.1f}{p50:>12.2f}{p95:>12.2f}", end_line=True)
+
+
+class _Span:
+
+    __slots__ = ("name", "args", "start_wall", "start")
+
+    def __init__(self, name: str, args: dict) -> None:
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> _Span:
+        self.start_wall = time.time_ns()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        Profiler.get_standard_profiler().record(self.name, self.start_wall, time.perf_counter_ns() - self.start,
+                                                self.args if len(self.args) > 0 else None)
+
+
+class _NoSpan:
+
+    __slots__ = ()
+
+    def __enter__(self) -> _NoSpan:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+# Returned for all spans while profiling is disabled
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **args):
+    """
+    Returns a context manager recording the enclosed section as span, if profiling is enabled.
+    :param name: Name of the stage
+    :param args: Additional information shown with the span, e.g. the card
+    :return: The context manager
+    """
+    if not Profiler.get_standard_profiler().enabled:
+        return _NO_SPAN
+    return _Span(name, args)
+
+
+def profiled(function):
+    """
+    Decorator recording each call of a function as span named after the function, if profiling is enabled.
+    :param function: The function
+    :return: The decorated function
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not Profiler.get_standard_profiler().enabled:
+            return function(*args, **kwargs)
+        with _Span(function.__name__, dict()):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def _get_percentile(values: [float], percentile: float) -> float:
+    # Nearest rank of the sorted values
+    return values[max(0, math.ceil(percentile * len(values)) - 1)]
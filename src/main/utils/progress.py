@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import atexit
+import json
+import sys
+import threading
+import time
+
+from src.main.configuration.config import CONFIG_PROGRESS_OUTPUT, CONFIG_PROGRESS_REDRAW_RATE, \
+    CONFIG_PROGRESS_JSON_INTERVAL
+from src.main.configuration.variables import Colors
+
+
+class Progress_Status:
+    # Transient state of a card, replaced by the next event
+    RUNNING = "running"
+    # Persistent messages
+    INFO = "info"
+    SUCCESS = "success"
+    WARN = "warning"
+    ERROR = "error"
+
+
+# Rank of the statuses when determining the outcome of a card, the worst status reported for a card is its outcome
+_STATUS_RANKS = {Progress_Status.INFO: 0, Progress_Status.SUCCESS: 1, Progress_Status.WARN: 2, Progress_Status.ERROR: 3}
+_STATUS_COLORS = {Progress_Status.RUNNING: Colors.END, Progress_Status.INFO: Colors.END,
+                  Progress_Status.SUCCESS: Colors.GREEN, Progress_Status.WARN: Colors.ORANGE,
+                  Progress_Status.ERROR: Colors.RED}
+# Prefix of events that do not concern a card
+PREFIX = "ProxKy"
+
+
+class ProgressReporter:
+    """
+    Collects the progress of a run as events, each concerning a card, a stage and a status, and renders them without
+    writing to the output for every event. On a terminal, transient events redraw the status line at most
+    `CONFIG_PROGRESS_REDRAW_RATE` times per second. Otherwise, the events are written as newline-delimited JSON every
+    `CONFIG_PROGRESS_JSON_INTERVAL` seconds. Closing the reporter writes a summary of the run.
+    """
+
+    _instance = None
+
+    def __init__(self, output: str = CONFIG_PROGRESS_OUTPUT, stream=None) -> None:
+        """
+        :param output: Either "terminal", "json" or "auto" (terminal if the output is one, JSON otherwise)
+        :param stream: Where to write to, defaults to the current standard output
+        """
+        super().__init__()
+        self._stream = stream
+        if output == "auto":
+            output = "terminal" if self.stream.isatty() else "json"
+        if output not in ("terminal", "json"):
+            raise NotImplementedError
+        self.output = output
+
+        self.start = time.time()
+        # Worst status of the persistent messages about each card, and amount of persistent messages per status
+        self.outcomes = dict()
+        self.messages = dict()
+        self.amount_events = 0
+        self._lock = threading.RLock()
+        self._last_write = 0.0
+        # Terminal: the status line not drawn yet. JSON: the buffered records, and the latest stage of each card
+        self._pending_line = None
+        self._records = []
+        self._stages = dict()
+        self._amount_stages = 0
+
+    @classmethod
+    def get_standard_reporter(cls) -> ProgressReporter:
+        """
+        Returns the reporter of this process, whose buffered events are written when the process exits.
+        :return: The reporter
+        """
+        if cls._instance is None:
+            cls._instance = ProgressReporter()
+            atexit.register(cls._instance.flush)
+        return cls._instance
+
+    @property
+    def stream(self):
+        return self._stream if self._stream is not None else sys.stdout
+
+    def report(self, stage: str = None, card: str = None, status: str = Progress_Status.RUNNING, message: str = None,
+               width: int = 50) -> None:
+        """
+        Reports an event.
+        :param stage: Stage the event concerns, e.g. "artwork"
+        :param card: Name of the card the event concerns, if any
+        :param status: Status of the card, events with status `RUNNING` are transient and replaced by the next event
+        :param message: Message to show, defaults to one describing the stage
+        :param width: Width of the prefix containing the card on a terminal
+        """
+        if message is None:
+            message = "Processing " + stage + "..."
+
+        with self._lock:
+            self.amount_events += 1
+            if status != Progress_Status.RUNNING:
+                self.messages[status] = self.messages.get(status, 0) + 1
+                if card is not None and _STATUS_RANKS[status] >= _STATUS_RANKS[self.outcomes.get(card, status)]:
+                    self.outcomes[card] = status
+
+            now = time.monotonic()
+            if self.output == "terminal":
+                line = "\r" + _STATUS_COLORS[status] + _truncate_prefix(card or PREFIX, width) + Colors.END + message
+                if status != Progress_Status.RUNNING:
+                    # Persistent messages are never dropped, they replace a status line not drawn yet
+                    self._pending_line = None
+                    self._write(line + "\n", now)
+                elif now - self._last_write >= 1 / CONFIG_PROGRESS_REDRAW_RATE:
+                    self._pending_line = None
+                    self._write(line, now)
+                else:
+                    self._pending_line = line
+            else:
+                if status != Progress_Status.RUNNING:
+                    self._records.append({"type": "message", "time": round(time.time(), 3), "card": card,
+                                          "stage": stage, "status": status, "message": message})
+                else:
+                    self._stages[card or PREFIX] = stage if stage is not None else message
+                    self._amount_stages += 1
+                if now - self._last_write >= CONFIG_PROGRESS_JSON_INTERVAL:
+                    self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes all buffered events. On a terminal, the latest status line is drawn.
+        """
+        with self._lock:
+            if self.output == "terminal":
+                if self._pending_line is not None:
+                    self._write(self._pending_line, time.monotonic())
+                    self._pending_line = None
+                return
+
+            if self._amount_stages > 0:
+                self._records.append({"type": "progress", "time": round(time.time(), 3),
+                                      "events": self._amount_stages, "cards": self._stages})
+                self._stages = dict()
+                self._amount_stages = 0
+            if len(self._records) > 0:
+                self._write("".join(json.dumps(record) + "\n" for record in self._records), time.monotonic())
+                self._records = []
+
+    def collect(self) -> dict:
+        """
+        Removes and returns the outcomes and message counts gathered so far, e.g. to hand those of a worker process to
+        the parent process. Buffered events are written first.
+        :return: The outcome of each card, and the amount of messages per status
+        """
+        with self._lock:
+            self.flush()
+            state = {"outcomes": self.outcomes, "messages": self.messages}
+            self.outcomes = dict()
+            self.messages = dict()
+        return state
+
+    def merge(self, state: dict) -> None:
+        """
+        Adds the outcomes and message counts gathered by another reporter, e.g. the one of a worker process.
+        :param state: The outcomes and message counts, as returned by `collect`
+        """
+        with self._lock:
+            for card, status in state["outcomes"].items():
+                if _STATUS_RANKS[status] >= _STATUS_RANKS[self.outcomes.get(card, status)]:
+                    self.outcomes[card] = status
+            for status, amount in state["messages"].items():
+                self.messages[status] = self.messages.get(status, 0) + amount
+
+    def get_summary(self) -> dict:
+        """
+        Aggregates the events reported so far.
+        :return: Elapsed time, amount of cards by outcome, and amount of warnings and errors
+        """
+        with self._lock:
+            outcomes = list(self.outcomes.values())
+            return {"elapsed": round(time.time() - self.start, 3),
+                    "cards": len(outcomes),
+                    "failed": outcomes.count(Progress_Status.ERROR),
+                    "warned": outcomes.count(Progress_Status.WARN),
+                    "warnings": self.messages.get(Progress_Status.WARN, 0),
+                    "errors": self.messages.get(Progress_Status.ERROR, 0)}
+
+    def close(self) -> None:
+        """
+        Writes all buffered events, followed by the summary of the run.
+        """
+        with self._lock:
+            self.flush()
+            summary = self.get_summary()
+            if self.output == "json":
+                self._write(json.dumps(dict({"type": "summary", "time": round(time.time(), 3)}, **summary)) + "\n",
+                            time.monotonic())
+                return
+
+            status = Progress_Status.SUCCESS
+            if summary["failed"] > 0:
+                status = Progress_Status.ERROR
+            elif summary["warned"] > 0:
+                status = Progress_Status.WARN
+            self._write("\r" + _STATUS_COLORS[status] + _truncate_prefix(PREFIX, 50) + Colors.END + "Finished in " +
+                        str(round(summary["elapsed"], 1)) + "s: " + str(summary["cards"]) + " cards, " +
+                        str(summary["failed"]) + " failed, " + str(summary["warned"]) + " with warnings (" +
+                        str(summary["warnings"]) + " warnings, " + str(summary["errors"]) + " errors)\n",
+                        time.monotonic())
+
+    def _write(self, text: str, now: float) -> None:
+        stream = self.stream
+        stream.write(text)
+        stream.flush()
+        self._last_write = now
+
+
+def report_progress(card: str, stage: str) -> None:
+    """
+    Reports that a card entered a stage.
+    :param card: Name of the card
+    :param stage: The stage, e.g. "artwork"
+    """
+    ProgressReporter.get_standard_reporter().report(stage=stage, card=card)
+
+
+def _truncate_prefix(prefix: str, length: int) -> str:
+    truncated_prefix = "["
+    truncated_prefix += prefix[:length - 2 - 3] + "..." if len(prefix) - 2 > length else prefix
+    truncated_prefix += "]"
+
+    for i in range(0, length - len(truncated_prefix)):
+        truncated_prefix += " "
+
+    return truncated_prefix
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from src.main.configuration.config import CONFIG_SCRYFALL_RATE_LIMIT
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter. Allows bursts of up to `capacity` requests, and `rate` requests per second
+    on average. Callers that find the bucket empty reserve a future token, so concurrent callers are served in order.
+    """
+
+    _scryfall_instance = None
+
+    def __init__(self, rate: float, capacity: float = None) -> None:
+        super().__init__()
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._time_updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_scryfall_bucket(cls) -> TokenBucket:
+        """
+        Returns the bucket shared by everything accessing the Scryfall API.
+        :return: The bucket
+        """
+        if cls._scryfall_instance is None:
+            cls._scryfall_instance = TokenBucket(CONFIG_SCRYFALL_RATE_LIMIT)
+        return cls._scryfall_instance
+
+    def acquire(self) -> None:
+        """
+        Takes a token from the bucket, blocking until it is available.
+        """
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _reserve(self) -> float:
+        """
+        Takes a token from the bucket, which may be available only in the future.
+        :return: Time in seconds until the token is available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._time_updated) * self.rate)
+            self._time_updated = now
+            self._tokens -= 1
+            return 0 if self._tokens >= 0 else -self._tokens / self.rate
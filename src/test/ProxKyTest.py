@@ -1,12 +1,31 @@
+import io
+import json
+import os
+import tempfile
 import unittest
+import zipfile
+from types import SimpleNamespace
+from unittest import mock
 
-from win32com import client
+import requests
 
-from src.main.configuration.config import CONFIG_INDESIGN_ID
-from src.main.configuration.variables import Paths, Fonts
-from src.main.data.fetcher import ScryfallFetcher
-from src.main.handler.indesign_handler import InDesignHandler
-from src.main.pipeline import parse_card_list, process_card, process_print
+from src.main.configuration import config
+from src.main.configuration.variables import Paths, Fonts, Regex, IMAGE_TYPES
+from src.main.data.artwork import ArtworkIndex
+from src.main.data.build_manifest import BuildManifest, get_fingerprint
+from src.main.data.bulk_index import BulkIndex
+from src.main.data.card import Card
+from src.main.data.card_cache import CardCache
+from src.main.data.fitting_cache import FittingCache
+from src.main.data.fetcher import ScryfallFetcher, ConcurrentScryfallFetcher
+from src.main.handler.document_handler import Template
+from src.main.handler.fake_indesign import FakeInDesign, OperationRecorder
+from src.main.handler.indesign_handler import InDesignHandler, _InDesignHandler, _Fitting
+from src.main.pipeline import parse_card_list, process_card, process_print, create_build_plan, get_printable_entries, \
+    get_artwork_faces
+from src.main.utils.imposition import plan_imposition
+from src.main.utils.misc import split_string_along_regex
+from src.main.utils.progress import ProgressReporter, Progress_Status
 
 VARIETY_CARDS = ["Black Lotus",
                  "Clearwater Pathway",
@@ -17,8 +36,34 @@ VARIETY_CARDS = ["Black Lotus",
                  "Wizard Class",
                  "Urza's Saga",
                  "Gisela, the Broken Blade"]
+# Scryfall card objects used by the offline tests
+FILE_CARDS = os.path.join(os.path.dirname(__file__), "resources", "scryfall_cards.json")
+# Temporary folder holding the default card cache during the tests
+CACHE_FOLDER = None
+# Tests accessing Scryfall or InDesign only run if enabled, e.g. PROXKY_TEST_NETWORK=1
+requires_network = unittest.skipUnless(os.environ.get("PROXKY_TEST_NETWORK") == "1", "requires access to Scryfall")
+requires_indesign = unittest.skipUnless(os.environ.get("PROXKY_TEST_INDESIGN") == "1", "requires InDesign")
 
 
+def load_fixture_cards() -> {str: dict}:
+    with open(FILE_CARDS, "r", encoding="utf-8") as file:
+        return {data["name"]: data for data in json.load(file)["data"]}
+
+
+def setUpModule():
+    # Fetchers use the default card cache, which would otherwise be created in the configured root folder
+    global CACHE_FOLDER
+    CACHE_FOLDER = tempfile.TemporaryDirectory()
+    CardCache._instance = CardCache(CACHE_FOLDER.name + "/cards.sqlite", config.CONFIG_CARD_CACHE_TTL)
+
+
+def tearDownModule():
+    CardCache._instance.close()
+    CardCache._instance = None
+    CACHE_FOLDER.cleanup()
+
+
+@requires_network
 class FetcherTest(unittest.TestCase):
 
     def test_fetch_variety_of_cards(self):
@@ -30,25 +75,313 @@ class FetcherTest(unittest.TestCase):
             card = fetcher.fetch_card(dictionary)
             self.assertTrue(card_name in card.name)
 
+    def test_fetch_variety_of_cards_in_bulk(self):
+        fetcher = ScryfallFetcher()
+
+        cards = fetcher.fetch_cards([{"name": card_name} for card_name in VARIETY_CARDS])
+        self.assertTrue(len(cards) == len(VARIETY_CARDS))
+        for card_name, card in zip(VARIETY_CARDS, cards):
+            self.assertTrue(card_name in card.name)
+
+    def test_fetch_variety_of_cards_concurrently(self):
+        fetcher = ConcurrentScryfallFetcher()
+
+        cards = fetcher.fetch_cards([{"name": card_name} for card_name in VARIETY_CARDS])
+        self.assertTrue(len(cards) == len(VARIETY_CARDS))
+        for card_name, card in zip(VARIETY_CARDS, cards):
+            self.assertTrue(card_name in card.name)
+
+
+class MiscTest(unittest.TestCase):
+
+    def test_split_string_along_regex(self):
+        template = Regex.TEMPLATE_REGULAR + [(["Landfall", "Raid"], "keyword")]
+        split = split_string_along_regex("Landfall — {T}: Add {G}. (Raid)", template)
+        self.assertEqual(split, [("Landfall", "keyword"), (" — ", "normal"), ("{T}", "mana"), (": Add ", "normal"),
+                                 ("{G}", "mana"), (".", "normal"), (" (Raid)", "reminder")])
+
+    def test_progress_reporter_writes_json(self):
+        stream = io.StringIO()
+        reporter = ProgressReporter(output="json", stream=stream)
+
+        reporter.report(stage="artwork", card="Black Lotus")
+        reporter.report(stage="oracle text", card="Black Lotus")
+        reporter.report(card="Black Lotus", status=Progress_Status.SUCCESS, message="Successfully processed")
+        reporter.report(card="Treasure Map", status=Progress_Status.ERROR, message="Could not process card")
+        reporter.close()
+
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([record["type"] for record in records].count("message"), 2)
+        self.assertEqual(records[-1]["type"], "summary")
+        self.assertEqual(records[-1]["cards"], 2)
+        self.assertEqual(records[-1]["failed"], 1)
+        self.assertEqual(records[-1]["errors"], 1)
+
+    def test_fitting_grows_text_shrunk_while_composing(self):
+        class Frame:
+            def __init__(self, label: str):
+                self.ParentStory = SimpleNamespace(Texts=[SimpleNamespace(PointSize=8.0)])
+                self.label = label
+
+            def ExtractLabel(self, key: str) -> str:
+                return self.label
+
+            @property
+            def Overflows(self) -> bool:
+                return self.ParentStory.Texts[0].PointSize > 9.0
+
+        # Composed at 8pt after shrinking by 8 steps, while up to 9pt fit
+        frame = Frame("8")
+        fitting = _Fitting("resize", [frame])
+        self.assertEqual(fitting.search(overflows=False), -4)
+        self.assertEqual(frame.ParentStory.Texts[0].PointSize, 9.0)
+
+        frame = Frame("")
+        self.assertEqual(_Fitting("resize", [frame]).search(overflows=False), 0)
+        self.assertEqual(frame.ParentStory.Texts[0].PointSize, 8.0)
+
+
+class CollectionTest(unittest.TestCase):
+
+    def test_collection_response_with_not_found_and_renamed_cards(self):
+        fixtures = load_fixture_cards()
+        # Scryfall answers with the accented name, and lists the unknown card separately
+        vault = {"object": "card", "name": "Lim-Dûl's Vault", "set": "all", "collector_number": "24"}
+        body = {"not_found": [{"name": "Nonexistent Card Foo"}],
+                "data": [fixtures["Llanowar Elves"], vault, fixtures["Lotus Cobra"]]}
+        response = mock.Mock(status_code=200, text=json.dumps(body))
+
+        fetcher = ScryfallFetcher()
+        fetcher.cache = None
+        with mock.patch.object(fetcher, "_get_session") as get_session, \
+                mock.patch.object(fetcher, "_wait_for_limit"):
+            get_session.return_value.post.return_value = response
+            results = fetcher.fetch_cards([{"name": "Llanowar Elves"}, {"name": "Lim-Dul's Vault"},
+                                           {"name": "Nonexistent Card Foo"}, {"name": "Lotus Cobra"},
+                                           {"name": "Llanowar Elves"}])
+
+        self.assertEqual(get_session.return_value.post.call_count, 1)
+        self.assertEqual([card.name if card is not None else None for card in results],
+                         ["Llanowar Elves", "Lim-Dûl's Vault", None, "Lotus Cobra", "Llanowar Elves"])
+
+    def test_concurrent_fetcher_batch_fills_concurrent_requests(self):
+        def post(url, **kwargs):
+            data = [{"object": "card", "name": identifier["name"]} for identifier in kwargs["json"]["identifiers"]]
+            return mock.Mock(status_code=200, text=json.dumps({"not_found": [], "data": data}))
+
+        fetcher = ConcurrentScryfallFetcher(concurrency=2)
+        fetcher.cache = None
+        with mock.patch.object(fetcher, "_get_session") as get_session:
+            get_session.return_value.post.side_effect = post
+            results = fetcher.fetch_cards([{"name": "Card " + str(i)} for i in range(fetcher.batch_size)])
+
+        self.assertEqual(get_session.return_value.post.call_count, 2)
+        self.assertEqual([card.name for card in results], ["Card " + str(i) for i in range(fetcher.batch_size)])
+
+
+class PlanningTest(unittest.TestCase):
+
+    def test_printable_entries_skip_unresolved_and_failed_cards(self):
+        fixtures = load_fixture_cards()
+        elves = Card.generate(fixtures["Llanowar Elves"])
+        cobra = Card.generate(fixtures["Lotus Cobra"])
+        deck = [{"name": "Llanowar Elves", "card": elves, "options": dict(), "amount": "2"},
+                {"name": "Nonexistent Card Foo", "card": None, "options": dict(), "amount": "1"},
+                {"name": "Lotus Cobra", "card": cobra, "options": dict(), "amount": "1"},
+                {"name": "Llanowar Elves", "card": elves, "options": dict(), "amount": "1"}]
+
+        build_plan = []
+        unique_entries = list(create_build_plan(create_build_plan(deck, build_plan=build_plan)))
+        failed_entries = [entry for entry in unique_entries if entry["card"] is None or entry["card"] is cobra]
+
+        printable_entries = get_printable_entries(build_plan, failed_entries)
+        self.assertEqual([(entry["name"], entry["amount"]) for entry in printable_entries], [("Llanowar Elves", 3)])
+        for entry in printable_entries:
+            self.assertEqual(get_artwork_faces(entry["card"]), [elves])
+        self.assertEqual(len(plan_imposition(printable_entries, slots=8)), 1)
+
+    def test_imposition_packs_double_sided_cards_first(self):
+        fixtures = load_fixture_cards()
+        elves = Card.generate(fixtures["Llanowar Elves"])
+        awakening = Card.generate(fixtures["Agadeem's Awakening // Agadeem, the Undercrypt"])
+        entries = [{"card": elves, "amount": "4"}, {"card": awakening, "amount": "4"}]
+
+        sheets = plan_imposition(entries, slots=3)
+        self.assertEqual([sheet["cards"] for sheet in sheets],
+                         [[awakening, awakening, awakening], [awakening, elves, elves], [elves, elves]])
+        self.assertEqual([sheet["duplex"] for sheet in sheets], [True, True, False])
+
+        self.assertEqual(plan_imposition([{"card": elves, "amount": "3"}], slots=3),
+                         [{"cards": [elves, elves, elves], "duplex": False}])
+        self.assertEqual(plan_imposition([], slots=3), [])
+
+
+class CacheTest(unittest.TestCase):
+
+    def test_card_cache_stores_cards_under_key_and_id(self):
+        elves = load_fixture_cards()["Llanowar Elves"]
+        self.assertEqual(CardCache.get_key({"name": "Llanowar Elves", "set": "DOM"}), "name:llanowar elves/dom")
+        self.assertEqual(CardCache.get_key({"name": "Llanowar Elves", "set": "DOM", "cn": "168"}), "cn:dom/168")
+        self.assertIsNone(CardCache.get_key({"name": "Llanowar Elves", "cn": "168"}))
+
+        with tempfile.TemporaryDirectory() as folder:
+            cache = CardCache(folder + "/cards.sqlite", ttl=3600)
+            self.assertIsNone(cache.get(CardCache.get_key({"name": "Llanowar Elves"})))
+
+            cache.put(CardCache.get_key({"name": "LLANOWAR ELVES"}), elves)
+            for dictionary in [{"name": "llanowar elves"}, {"id": elves["id"].upper()}]:
+                data, fresh = cache.get(CardCache.get_key(dictionary))
+                self.assertEqual(data["id"], elves["id"])
+                self.assertTrue(fresh)
+            cache.close()
+
+            # Entries outlive their TTL, but are no longer fresh
+            cache = CardCache(folder + "/cards.sqlite", ttl=0)
+            data, fresh = cache.get(CardCache.get_key({"name": "Llanowar Elves"}))
+            self.assertEqual(data["id"], elves["id"])
+            self.assertFalse(fresh)
+            cache.close()
+
+    def test_fetcher_uses_outdated_cache_without_network(self):
+        elves = load_fixture_cards()["Llanowar Elves"]
+        with tempfile.TemporaryDirectory() as folder:
+            fetcher = ScryfallFetcher()
+            fetcher.cache = CardCache(folder + "/cards.sqlite", ttl=0)
+            fetcher.cache.put(CardCache.get_key({"name": "Llanowar Elves"}), elves)
+
+            with mock.patch.object(fetcher, "_get_session") as get_session, \
+                    mock.patch.object(fetcher, "_wait_for_limit"):
+                get_session.return_value.get.side_effect = requests.ConnectionError
+                get_session.return_value.post.side_effect = requests.ConnectionError
+                card = fetcher.fetch_card({"name": "Llanowar Elves"})
+                cards = fetcher.fetch_cards([{"name": "Llanowar Elves"}, {"name": "Lotus Cobra"}])
+
+            self.assertEqual(card.name, "Llanowar Elves")
+            self.assertEqual([card.name if card is not None else None for card in cards], ["Llanowar Elves", None])
+            fetcher.cache.close()
+
+    def test_fitting_cache_is_keyed_on_fingerprint(self):
+        with tempfile.TemporaryDirectory() as folder:
+            cache = FittingCache(folder + "/fitting.sqlite")
+            cache.put("card", "fingerprint", {"resize:1:Oracle": 3})
+            self.assertEqual(cache.get("card", "fingerprint"), {"resize:1:Oracle": 3})
+            self.assertEqual(cache.get("card", "other fingerprint"), dict())
+
+            cache.put("card", "other fingerprint", {"resize:1:Oracle": 1})
+            self.assertEqual(cache.get("card", "fingerprint"), dict())
+            cache.close()
+
+    def test_artwork_index_keeps_file_names(self):
+        elves = Card.generate(load_fixture_cards()["Llanowar Elves"])
+        with tempfile.TemporaryDirectory() as folder:
+            os.makedirs(folder + "/Artwork/DOM")
+            for filename in ["168 - LLANOWAR ELVES.JPG", "169 - Llanowar Elves.png"]:
+                open(folder + "/Artwork/DOM/" + filename, "wb").close()
+
+            index = ArtworkIndex(roots=[(folder + "/Artwork", IMAGE_TYPES)])
+            path, filename = index.get(elves)
+            self.assertEqual(filename, "168 - LLANOWAR ELVES.JPG")
+            self.assertTrue(os.path.isfile(path + "/" + filename))
+
+            # Files of a type with higher precedence are preferred, once the folder is scanned again
+            open(folder + "/Artwork/DOM/168 - Llanowar Elves.png", "wb").close()
+            os.utime(folder + "/Artwork/DOM", ns=(0, 0))
+            index.refresh()
+            self.assertEqual(index.get(elves)[1], "168 - Llanowar Elves.png")
+
+    def test_bulk_index_prefers_language(self):
+        english = load_fixture_cards()["Llanowar Elves"]
+        # Printings in other languages share set, collector number and the English name
+        german = dict(english, id="4d3bd2b1-52f4-4b4e-b1a0-6f4f2b1c2a01", lang="de", printed_name="Elfen von Llanowar")
+        with tempfile.TemporaryDirectory() as folder:
+            with open(folder + "/cards.json", "w", encoding="utf-8") as file:
+                json.dump([english, german], file)
+
+            for language, expected in [("en", english), ("de", german)]:
+                index = BulkIndex(folder + "/cards.json", folder + "/index_" + language + ".sqlite", language=language)
+                self.assertEqual(index.get_card({"name": "Llanowar Elves", "set": "DOM", "cn": "168"})["id"],
+                                 expected["id"])
+                self.assertEqual(index.get_card({"name": "llanowar elves"})["id"], expected["id"])
+                self.assertEqual(index.get_card({"name": "Llanowar Elves", "set": "dom"})["id"], expected["id"])
+                index.close()
+
+
+class ManifestTest(unittest.TestCase):
+
+    def test_fingerprint_changes_with_inputs(self):
+        elves = Card.generate(load_fixture_cards()["Llanowar Elves"])
+        with tempfile.TemporaryDirectory() as folder:
+            with zipfile.ZipFile(folder + "/template.idml", "w") as archive:
+                archive.writestr("mimetype", "application/vnd.adobe.indesign-idml-package")
+            os.makedirs(folder + "/Artwork/DOM")
+            open(folder + "/Artwork/DOM/168 - Llanowar Elves.png", "wb").close()
+            index = ArtworkIndex(roots=[(folder + "/Artwork", IMAGE_TYPES)])
+
+            with mock.patch.dict(Template._cache, {Paths.FILE_TEMPLATE: Template(folder + "/template.idml")}), \
+                    mock.patch.object(ArtworkIndex, "_instance", index):
+                fingerprint = get_fingerprint(elves, {"tba": "front"}, [elves])
+                self.assertEqual(get_fingerprint(elves, {"tba": "front"}, [elves]), fingerprint)
+                self.assertNotEqual(get_fingerprint(elves, dict(), [elves]), fingerprint)
+                self.assertNotEqual(get_fingerprint(elves, {"tba": "front"}, []), fingerprint)
+                with mock.patch.object(config, "CONFIG_PRINT_FLAVOR_TEXT", not config.CONFIG_PRINT_FLAVOR_TEXT):
+                    self.assertNotEqual(get_fingerprint(elves, {"tba": "front"}, [elves]), fingerprint)
+
+                # Replacing the artwork changes its modification time
+                os.utime(folder + "/Artwork/DOM/168 - Llanowar Elves.png", ns=(0, 0))
+                self.assertNotEqual(get_fingerprint(elves, {"tba": "front"}, [elves]), fingerprint)
+
+    def test_manifest_requires_fingerprint_and_output(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path_output = folder + "/Llanowar Elves.pdf"
+            manifest = BuildManifest(folder + "/manifest.json")
+            manifest.update(path_output, "fingerprint")
+            self.assertFalse(manifest.is_current(path_output, "fingerprint"))
+
+            open(path_output, "wb").close()
+            self.assertTrue(manifest.is_current(path_output, "fingerprint"))
+            self.assertFalse(manifest.is_current(path_output, "other fingerprint"))
+
+            manifest.save()
+            self.assertTrue(BuildManifest(folder + "/manifest.json").is_current(path_output, "fingerprint"))
+            with open(folder + "/manifest.json", "w", encoding="utf-8") as file:
+                file.write("{")
+            self.assertFalse(BuildManifest(folder + "/manifest.json").is_current(path_output, "fingerprint"))
+
+
+class RenderingTest(unittest.TestCase):
+
+    def test_fake_backend_records_operations(self):
+        recorder = OperationRecorder()
+        backend = _InDesignHandler(FakeInDesign(recorder), recorder=recorder)
+
+        lines = backend.get_text_lines([([{"content": "Flying"}, {"content": "\nHaste"}], {})])
+        self.assertEqual(lines, 2)
+        self.assertEqual(recorder.counts["InsertionPoint.Contents="], 2)
+        self.assertEqual(recorder.counts["Lines.Count"], 1)
+
 
+@requires_network
 class PipelineTest(unittest.TestCase):
 
     def test_parse_card_list(self):
-        card_list = parse_card_list("resources/test_decklist.txt")
+        card_list = list(parse_card_list("resources/test_decklist.txt"))
         self.assertTrue(len(card_list) == len(VARIETY_CARDS))
 
+    @requires_indesign
     def test_process_card(self):
         fetcher = ScryfallFetcher()
         card = fetcher.fetch_card({"name": "Academy Ruins"})
         process_card(card)
         self.assertTrue(card is not None)
 
+    @requires_indesign
     def test_process_card_with_transparent_body_art(self):
         fetcher = ScryfallFetcher()
         card = fetcher.fetch_card({"name": "Gisela, the Broken Blade"})
         process_card(card, {"tba": "back"})
         self.assertTrue(card is not None)
 
+    @requires_indesign
     def test_generate_pdf(self):
         fetcher = ScryfallFetcher()
         card = fetcher.fetch_card({"name": "Academy Ruins"})
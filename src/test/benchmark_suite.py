@@ -0,0 +1,256 @@
+import contextlib
+import datetime
+import getopt
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from src.main.configuration import config
+
+# Offline benchmarks of the composition hot paths. Run from the root of the repository with
+#   python -m src.test.benchmark_suite [-o results.json] [-b baseline.json] [-n repetitions] [-k name]
+# to write the results to a JSON file, optionally comparing them to the results of an earlier run.
+
+# Folder the fixtures are set up in, it is recreated on every run
+BENCHMARK_ROOT = os.path.join(tempfile.gettempdir(), "proxky-benchmark")
+
+# The benchmark runs offline and without InDesign or the licensed templates and fonts. Modules read the configuration
+# on import, so it has to be adjusted before anything else of ProxKy is imported.
+config.CONFIG_ROOT_FOLDER = BENCHMARK_ROOT
+config.CONFIG_RENDERING_BACKEND = "fake"
+config.CONFIG_TEXT_MEASURER = "indesign"
+config.CONFIG_TEXT_CACHE = False
+config.CONFIG_COMPOSE_AUTOFIT = False
+config.CONFIG_CARD_CACHE = True
+
+from PIL import Image  # noqa: E402
+
+from src.main.configuration.variables import Paths, Regex, Id_Sets, Ids  # noqa: E402
+from src.main.data.artwork import get_artwork_filename  # noqa: E402
+from src.main.data.card import Card  # noqa: E402
+from src.main.data.card_cache import CardCache  # noqa: E402
+from src.main.data.catalog import FILE_ABILITY_WORDS_SNAPSHOT, CATALOG_VERSION  # noqa: E402
+from src.main.handler.card_data_handler import build_oracle_data  # noqa: E402
+from src.main.handler.document_handler import Template  # noqa: E402
+from src.main.handler.indesign_handler import InDesignHandler  # noqa: E402
+from src.main.handler.xml_handler import set_text_field, set_graphic  # noqa: E402
+from src.main.pipeline import process_card, process_print, get_artwork_faces  # noqa: E402
+from src.main.utils.misc import split_string_along_regex  # noqa: E402
+from src.main.utils.progress import ProgressReporter  # noqa: E402
+from src.test.idml_fixtures import write_card_template, write_print_template, write_study_document  # noqa: E402
+
+# Version of the layout of the results file
+RESULTS_VERSION = 1
+# Scryfall card objects the benchmark composes, as returned by the collection endpoint
+FILE_CARDS = os.path.join(os.path.dirname(__file__), "resources", "scryfall_cards.json")
+# Card composed for each layout family
+LAYOUT_FAMILIES = {"normal": "Llanowar Elves",
+                   "split": "Fire // Ice",
+                   "adventure": "Bonecrusher Giant // Stomp",
+                   "planeswalker": "Jace, the Mind Sculptor",
+                   "modal_dfc": "Agadeem's Awakening // Agadeem, the Undercrypt",
+                   "meld": "Bruna, the Fading Light",
+                   "token": "Treasure"}
+# Card types an icon is provided for
+CARD_TYPES = ["artifact", "battle", "creature", "enchantment", "instant", "land", "planeswalker", "sorcery", "multiple"]
+# Copies of each card printed by the print benchmark
+PRINT_COPIES = 4
+# Default amount of timed repetitions of each benchmark, after one untimed warm-up run
+REPETITIONS = 20
+
+
+def set_up_root() -> {str: Card}:
+    """
+    Creates the root folder of the benchmark: Synthetic templates, type icons and artwork, the ability word catalog and
+    a card cache containing the fixture cards, so nothing is fetched from Scryfall.
+    :return: The fixture cards, by name
+    """
+    shutil.rmtree(BENCHMARK_ROOT, ignore_errors=True)
+    os.makedirs(Paths.TEMPLATES)
+    os.makedirs(Paths.CARD_TYPES)
+    os.makedirs(Paths.CACHE)
+
+    write_card_template(Paths.FILE_TEMPLATE)
+    write_print_template(Paths.FILE_PRINT)
+    write_study_document(Paths.FILE_STUDY)
+
+    for card_type in CARD_TYPES:
+        with open(Paths.CARD_TYPES + "/" + card_type + ".svg", "w", encoding="utf-8") as file:
+            file.write('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><circle cx="12" cy="12" r="10"/>'
+                       '</svg>')
+
+    with open(FILE_ABILITY_WORDS_SNAPSHOT, "r", encoding="utf-8") as file:
+        ability_words = json.load(file)["data"]
+    with open(Paths.FILE_ABILITY_WORDS, "w", encoding="utf-8") as file:
+        json.dump({"version": CATALOG_VERSION, "fetched": time.time(), "data": ability_words}, file)
+
+    with open(FILE_CARDS, "r", encoding="utf-8") as file:
+        fixtures = json.load(file)["data"]
+
+    cache = CardCache.get_standard_cache()
+    for data in fixtures:
+        cache.put(CardCache.get_key({"name": data["name"]}), data)
+
+    cards = {data["name"]: Card.generate(data) for data in fixtures}
+    for card in cards.values():
+        for face in get_artwork_faces(card):
+            path = Paths.ARTWORK + "/" + face.set.upper()
+            os.makedirs(path, exist_ok=True)
+            Image.new("RGB", (626, 457), (128, 128, 128)).save(path + "/" + get_artwork_filename(face) + ".jpg")
+
+    return cards
+
+
+def get_benchmarks(cards: {str: Card}) -> [(str, callable, callable)]:
+    """
+    Returns all benchmarks.
+    :param cards: The fixture cards, by name
+    :return: Name, function to time, and untimed setup of each benchmark. The setup returns the argument of the function
+    """
+    texts = [(face.oracle_text, face.flavor_text) for card in cards.values()
+             for face in ([card] if len(card.card_faces) == 0 else card.card_faces)
+             if face.oracle_text is not None and len(face.oracle_text) > 0]
+    template = Template.load(Paths.FILE_TEMPLATE)
+    artwork = cards[LAYOUT_FAMILIES["normal"]]
+    id_set = Id_Sets.ID_SET_FRONT
+
+    benchmarks = [
+        ("split_string_along_regex",
+         lambda _: [split_string_along_regex(text, Regex.TEMPLATE_ORACLE) for text, flavor in texts], None),
+        ("oracle_text_tokenization",
+         lambda _: [build_oracle_data(text, flavor=flavor) for text, flavor in texts], None),
+        ("set_text_field",
+         lambda documents: [set_text_field(document, id_set[Ids.ORACLE_T], build_oracle_data(text, flavor=flavor))
+                            for document, (text, flavor) in zip(documents, texts)],
+         lambda: [template.create_document() for _ in texts]),
+        ("set_graphic",
+         lambda document: set_graphic(document, id_set[Ids.ARTWORK_O], id_set[Ids.SPREAD],
+                                      Paths.ARTWORK + "/" + artwork.set.upper(), get_artwork_filename(artwork),
+                                      type_file="jpg", mode_scale="stretch"),
+         template.create_document),
+    ]
+
+    for family, name in LAYOUT_FAMILIES.items():
+        benchmarks.append(("process_card[" + family + "]", lambda _, card=cards[name]: process_card(card), None))
+
+    print_entries = [{"name": card.name, "card": card, "options": dict(), "amount": PRINT_COPIES}
+                     for name, card in cards.items() if name in LAYOUT_FAMILIES.values()]
+    path_print = Paths.PRINT + "/Benchmark"
+    # Every run exports the PDFs, as the build manifest would otherwise skip them after the warm-up run
+    benchmarks.append(("process_print", lambda _: process_print(print_entries, force=True, path_print=path_print),
+                       None))
+
+    return benchmarks
+
+
+def run_benchmark(benchmark: (str, callable, callable), repetitions: int) -> dict:
+    """
+    Runs a benchmark once to warm up, and then the given amount of times.
+    :param benchmark: Name, function and setup of the benchmark
+    :param repetitions: Amount of timed runs
+    :return: Statistics of the durations in seconds, and the amount of operations performed on the fake InDesign per
+    run
+    """
+    name, function, setup = benchmark
+    recorder = InDesignHandler().recorder
+    durations = []
+    operations = 0
+
+    # Progress output of ProxKy would dominate the timings of small benchmarks
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        function(setup() if setup is not None else None)
+
+        for _ in range(repetitions):
+            argument = setup() if setup is not None else None
+            operations_before = recorder.total
+            start = time.perf_counter()
+            function(argument)
+            durations.append(time.perf_counter() - start)
+            operations += recorder.total - operations_before
+
+        # Progress buffered while timing is written here, so it is discarded as well
+        ProgressReporter.get_standard_reporter().flush()
+
+    return {"repetitions": repetitions,
+            "mean": statistics.mean(durations),
+            "median": statistics.median(durations),
+            "min": min(durations),
+            "stdev": statistics.stdev(durations) if len(durations) > 1 else 0.0,
+            "indesign_operations": operations / repetitions}
+
+
+def get_environment() -> dict:
+    """
+    Returns information about the environment the benchmark runs in, stored alongside the results.
+    :return: The environment
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {"python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "commit": commit,
+            "date": datetime.datetime.now().isoformat(timespec="seconds")}
+
+
+def print_results(results: dict, baseline: dict = None) -> None:
+    """
+    Prints the results, compared against a baseline if given.
+    :param results: Results of the benchmarks
+    :param baseline: Results of an earlier run
+    """
+    for name, result in results.items():
+        line = f"{name:<32} {result['median'] * 1e3:10.3f} ms"
+        if result["indesign_operations"] > 0:
+            line += f" {result['indesign_operations']:8.0f} ops"
+        if baseline is not None and name in baseline:
+            line += f"   {baseline[name]['median'] / result['median']:6.2f}x speedup over baseline"
+        print(line)
+
+
+def main(argv) -> None:
+    path_output = "benchmark.json"
+    path_baseline = None
+    repetitions = REPETITIONS
+    selection = None
+
+    opts, _ = getopt.getopt(argv, "o:b:n:k:", ["output=", "baseline=", "repetitions=", "select="])
+    for opt, arg in opts:
+        if opt in ("-o", "--output"):
+            path_output = arg
+        elif opt in ("-b", "--baseline"):
+            path_baseline = arg
+        elif opt in ("-n", "--repetitions"):
+            repetitions = int(arg)
+        elif opt in ("-k", "--select"):
+            selection = arg
+
+    cards = set_up_root()
+    results = dict()
+    for benchmark in get_benchmarks(cards):
+        if selection is None or selection in benchmark[0]:
+            results[benchmark[0]] = run_benchmark(benchmark, repetitions)
+
+    baseline = None
+    if path_baseline is not None:
+        with open(path_baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+    print_results(results, baseline)
+
+    with open(path_output, "w", encoding="utf-8") as file:
+        json.dump({"version": RESULTS_VERSION, "environment": get_environment(), "results": results}, file, indent=1)
+    print("Results written to " + path_output)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,84 @@
+import math
+import re
+import timeit
+
+from src.main.configuration.variables import Regex
+from src.main.utils.misc import split_string_along_regex
+
+# Oracle texts covering mana symbols, reminder text, ability words and planeswalker abilities
+TEXTS = [("{T}: Add {C}.\n{2}, {T}: Draw a card. (You may activate this ability only once each turn.)",
+          Regex.TEMPLATE_ORACLE),
+         ("Landfall — Whenever a land enters the battlefield under your control, you gain 2 life.\nThreshold — As "
+          "long as seven or more cards are in your graveyard, creatures you control get +1/+1. ({W/U} can be paid "
+          "with either {W} or {U}.)", Regex.TEMPLATE_ORACLE),
+         ("+1: Up to one target creature gets +2/+0 until end of turn.\n−3: Exile target nonland permanent.\n"
+          "−8: You get an emblem with \"Creatures you control get +1/+1.\"", Regex.TEMPLATE_PLANESWALKER),
+         ("Sacrifice Treasure Map: Scry 1.\nFirst line\nSecond line\nThird line", Regex.TEMPLATE_BREAK)]
+# Amount of repetitions per text
+REPETITIONS = 200
+
+
+def split_string_along_regex_legacy(string, matchers: ([str], str), standard_identifier="normal"):
+    """
+    Implementation of `split_string_along_regex` prior to the single-pass tokenizer, kept for comparison.
+    """
+    all_regex = []
+    for pair in matchers:
+        for regex in pair[0]:
+            all_regex.append(regex)
+    all_regex = list(dict.fromkeys(all_regex))
+
+    working_string = string
+    result = []
+
+    while len(working_string) > 0:
+        current_span = [math.inf, 0]
+        current_regex = ""
+
+        for regex in all_regex:
+            pattern = re.compile(regex)
+            matches = list(pattern.finditer(working_string))
+            if len(matches) > 0 and matches[0].span()[0] < current_span[0]:
+                current_span = matches[0].span()
+                current_regex = regex
+                if current_span[0] == 0:
+                    break
+
+        if current_span[0] == math.inf:
+            result.append((working_string, standard_identifier))
+            working_string = ""
+        else:
+            part_one = working_string[:current_span[0]]
+            part_two = working_string[current_span[0]:]
+
+            rectifier = 0
+            if current_span[0] > 0:
+                result.append((part_one, standard_identifier))
+                rectifier = len(part_one)
+
+            part_one = part_two[:current_span[1] - rectifier]
+            part_two = part_two[current_span[1] - rectifier:]
+
+            for pair in matchers:
+                if current_regex in pair[0]:
+                    result.append((part_one, pair[1]))
+                    working_string = part_two
+                    break
+
+    return result
+
+
+def run_benchmark() -> None:
+    """
+    Compares both implementations on the sample texts, after checking that they produce the same output.
+    """
+    for text, template in TEXTS:
+        assert split_string_along_regex(text, template) == split_string_along_regex_legacy(text, template)
+
+    for name, function in [("legacy", split_string_along_regex_legacy), ("tokenizer", split_string_along_regex)]:
+        duration = timeit.timeit(lambda: [function(text, template) for text, template in TEXTS], number=REPETITIONS)
+        print(f"{name:<10} {duration / (REPETITIONS * len(TEXTS)) * 1e6:10.1f} µs per text")
+
+
+if __name__ == "__main__":
+    run_benchmark()
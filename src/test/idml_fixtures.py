@@ -0,0 +1,305 @@
+import zipfile
+from xml.etree import ElementTree
+
+from src.main.configuration.config import CONFIG_PRINT_FRONT_ID, CONFIG_PRINT_BACK_ID
+from src.main.configuration.variables import Id_Sets, Ids, Distances, Id_Names, COLOR_MAPPING
+from src.main.handler.document_handler import DESIGNMAP_HEADER, MIMETYPE
+from src.main.handler.text_measurer import STUDY_FRAME_NAME
+
+# Synthetic IDML packages containing every element ProxKy accesses through the ID sets, laid out like the real templates
+# but without any design. They make composing cards possible without the licensed templates.
+
+NAMESPACE_PACKAGING = "http://ns.adobe.com/AdobeInDesign/idml/1.0/packaging"
+DOM_VERSION = "16.4"
+MIMETYPE_IDML = b"application/vnd.adobe.indesign-idml-package"
+CONTAINER = b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>' \
+            b'<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>' \
+            b'<rootfile full-path="designmap.xml" media-type="text/xml"/></rootfiles></container>'
+
+# Bounds (left, top, right, bottom) of the elements of a face in points, relative to the center of the card
+CARD_BOUNDS = {
+    Ids.ARTWORK_O: (-85.0, -121.0, 85.0, -56.0),
+    Ids.BACKDROP_O: (-90.7, -56.0, 90.7, 126.0),
+    Ids.COLOR_INDICATOR_TOP_O: (-90.7, -56.0, 90.7, -31.0),
+    Ids.TYPE_ICON_O: (-84.0, -53.0, -72.0, -41.0),
+    Ids.TITLE_T: (-70.0, -54.0, 48.0, -42.0),
+    Ids.MANA_COST_T: (48.0, -54.0, 84.0, -42.0),
+    Ids.TYPE_LINE_T: (-70.0, -42.0, 84.0, -33.0),
+    Ids.NAME_T: (-84.0, -125.0, 84.0, -119.0),
+    Ids.MODAL_O: (-84.0, Distances.ORACLE_TOP, 84.0, Distances.ORACLE_TOP + Distances.MODAL_HEIGHT - 2.0),
+    Ids.ORACLE_O: (-84.0, Distances.ORACLE_TOP, 84.0, Distances.ORACLE_BOT),
+    Ids.ADVENTURE_ORACLE_LEFT_O: (-84.0, -12.0, -2.0, Distances.ORACLE_BOT),
+    Ids.ADVENTURE_ORACLE_RIGHT_O: (2.0, -12.0, 84.0, Distances.ORACLE_BOT),
+    Ids.PLANESWALKER_ORACLE_FINAL_O: (-84.0, Distances.ORACLE_BOT - 14.0, 84.0, Distances.ORACLE_BOT),
+    Ids.COLOR_INDICATOR_BOT_O: (-90.7, 98.0, 90.7, 126.0),
+    Ids.VALUE_O: (58.0, 100.0, 84.0, 112.0),
+    Ids.ARTIST_INFORMATION_O: (-84.0, 114.0, 0.0, 121.0),
+    Ids.COLLECTOR_INFORMATION_O: (0.0, 114.0, 84.0, 121.0),
+}
+# Bounds of elements without an entry in `CARD_BOUNDS`
+DEFAULT_BOUNDS = (-84.0, -10.0, 84.0, 10.0)
+# Insets of all text frames, in the order top, left, bottom, right
+TEXT_INSETS = (0.5, 1.0, 0.5, 1.0)
+# Size of a card on the print sheet, in points
+PRINT_CARD_SIZE = (180.0, 252.0)
+
+# Stories of the text frames displaying them, `None` if the frame is not part of an ID set
+_TEXT_FRAMES = [(Ids.TITLE_T, None), (Ids.TYPE_LINE_T, None), (Ids.MANA_COST_T, None), (Ids.NAME_T, None),
+                (Ids.ORACLE_T, Ids.ORACLE_O), (Ids.MODAL_T, Ids.MODAL_O), (Ids.VALUE_T, Ids.VALUE_O),
+                (Ids.ARTIST_INFORMATION_T, Ids.ARTIST_INFORMATION_O),
+                (Ids.COLLECTOR_INFORMATION_T, Ids.COLLECTOR_INFORMATION_O),
+                (Ids.PLANESWALKER_VALUE_T, Ids.PLANESWALKER_VALUE_O),
+                (Ids.PLANESWALKER_ORACLE_NUMBERED_T, Ids.PLANESWALKER_ORACLE_NUMBERED_O),
+                (Ids.PLANESWALKER_ORACLE_FINAL_T, Ids.PLANESWALKER_ORACLE_FINAL_O),
+                (Ids.ADVENTURE_ORACLE_LEFT_T, Ids.ADVENTURE_ORACLE_LEFT_O),
+                (Ids.ADVENTURE_ORACLE_RIGHT_T, Ids.ADVENTURE_ORACLE_RIGHT_O)]
+_RECTANGLES = [Ids.ARTWORK_O, Ids.BACKDROP_O, Ids.TYPE_ICON_O, Ids.COLOR_INDICATOR_TOP_O, Ids.COLOR_INDICATOR_BOT_O]
+# Groups of a face and the elements they contain
+_HEADER = [Ids.TYPE_ICON_O, Ids.TITLE_T, Ids.TYPE_LINE_T, Ids.MANA_COST_T, Ids.COLOR_INDICATOR_TOP_O]
+_FOOTER = [Ids.COLOR_INDICATOR_BOT_O, Ids.VALUE_T, Ids.ARTIST_INFORMATION_T, Ids.COLLECTOR_INFORMATION_T]
+_PLANESWALKER = [Ids.PLANESWALKER_VALUE_T, Ids.PLANESWALKER_ORACLE_NUMBERED_T, Ids.PLANESWALKER_ORACLE_FINAL_T]
+_ADVENTURE = [Ids.ADVENTURE_ORACLE_LEFT_T, Ids.ADVENTURE_ORACLE_RIGHT_T]
+
+
+def write_card_template(path: str) -> None:
+    """
+    Writes a synthetic card template, containing the elements of all ID sets of the front and the back.
+    :param path: Path of the IDML package to create
+    """
+    package = _Package()
+
+    front = package.add_spread(Id_Sets.ID_SET_FRONT[Ids.SPREAD])
+    _add_face(package, front, Id_Sets.ID_SET_FRONT)
+    group_split = package.add_group(front, Id_Sets.ID_SET_FRONT[Ids.GROUP_SPLIT_O], Id_Names.GROUP_SPLIT, visible=False)
+    _add_face(package, group_split, Id_Sets.ID_SET_SPLIT_TOP_FRONT, Id_Names.GROUP_SPLIT_TOP)
+    _add_face(package, group_split, Id_Sets.ID_SET_SPLIT_BOT_FRONT, Id_Names.GROUP_SPLIT_BOT)
+    group_adventure = package.elements[Id_Sets.ID_SET_FRONT[Ids.GROUP_ADVENTURE_O]]
+    _add_elements(package, group_adventure, Id_Sets.ID_SET_FRONT_ADVENTURE)
+    back = package.add_spread(Id_Sets.ID_SET_BACK[Ids.SPREAD])
+    _add_face(package, back, Id_Sets.ID_SET_BACK)
+
+    for id_set in [Id_Sets.ID_SET_FRONT, Id_Sets.ID_SET_SPLIT_TOP_FRONT, Id_Sets.ID_SET_SPLIT_BOT_FRONT,
+                   Id_Sets.ID_SET_FRONT_ADVENTURE, Id_Sets.ID_SET_BACK]:
+        for gradient_id in id_set[Ids.GRADIENTS_O]:
+            package.add_gradient(gradient_id)
+
+    package.write(path)
+
+
+def write_print_template(path: str) -> None:
+    """
+    Writes a synthetic print template, with the printing frames of front and back arranged in a grid.
+    :param path: Path of the IDML package to create
+    """
+    package = _Package()
+
+    for spread_id, id_set in [(CONFIG_PRINT_FRONT_ID, Id_Sets.ID_SET_PRINT_FRONT),
+                              (CONFIG_PRINT_BACK_ID, Id_Sets.ID_SET_PRINT_BACK)]:
+        spread = package.add_spread(spread_id)
+        for i, frame_id in enumerate(id_set[Ids.PRINTING_FRAME_O]):
+            left = (i % 4 - 2) * PRINT_CARD_SIZE[0]
+            top = (i // 4 - 1) * PRINT_CARD_SIZE[1]
+            package.add_rectangle(spread, frame_id, Id_Names.P_FRAME + " " + str(i + 1),
+                                  (left, top, left + PRINT_CARD_SIZE[0], top + PRINT_CARD_SIZE[1]))
+
+    package.write(path)
+
+
+def write_study_document(path: str) -> None:
+    """
+    Writes a synthetic study document, containing the text frame text is measured in.
+    :param path: Path of the IDML package to create
+    """
+    package = _Package()
+    spread = package.add_spread("ub0")
+    package.add_text_frame(spread, "ub2", STUDY_FRAME_NAME, "ub1", CARD_BOUNDS[Ids.ORACLE_O])
+    package.write(path)
+
+
+def _add_face(package, parent: ElementTree.Element, id_set: dict, name: str = Id_Names.GROUP_NORMAL) \
+        -> ElementTree.Element:
+    """
+    Adds the groups of a face and the elements of its ID set.
+    :param package: Package to add the face to
+    :param parent: Element to add the face to
+    :param id_set: ID set of the face
+    :param name: Name of the outermost group
+    :return: The outermost group
+    """
+    group_normal = package.add_group(parent, id_set[Ids.GROUP_NORMAL_O], name)
+    groups = [(Ids.GROUP_HEADER_O, Id_Names.GROUP_HEADER, _HEADER, True),
+              (Ids.GROUP_FOOTER_O, Id_Names.GROUP_FOOTER, _FOOTER, True),
+              (Ids.GROUP_PLANESWALKER_O, Id_Names.GROUP_PLANESWALKER, _PLANESWALKER, False),
+              (Ids.GROUP_ADVENTURE_O, Id_Names.GROUP_ADVENTURE, _ADVENTURE, False)]
+
+    placement = dict()
+    for key, group_name, members, visible in groups:
+        if key in id_set:
+            group = package.add_group(group_normal, id_set[key], group_name, visible=visible)
+            for member in members:
+                placement[member] = group
+
+    _add_elements(package, group_normal, id_set, placement)
+    return group_normal
+
+
+def _add_elements(package, parent: ElementTree.Element, id_set: dict, placement: dict = None) -> None:
+    """
+    Adds the text frames and rectangles of an ID set, elements already added for another ID set are skipped.
+    :param package: Package to add the elements to
+    :param parent: Element to add elements to that are not placed in a group
+    :param id_set: ID set containing the elements
+    :param placement: Groups to add specific elements to, by key of the story or rectangle
+    """
+    placement = placement if placement is not None else dict()
+
+    for key_story, key_frame in _TEXT_FRAMES:
+        if key_story not in id_set:
+            continue
+        stories = id_set[key_story] if isinstance(id_set[key_story], list) else [id_set[key_story]]
+        for i, story_id in enumerate(stories):
+            if key_frame is not None:
+                frame_id = id_set[key_frame][i] if isinstance(id_set[key_frame], list) else id_set[key_frame]
+            else:
+                frame_id = story_id + "f"
+            bounds = CARD_BOUNDS.get(key_frame, CARD_BOUNDS.get(key_story, DEFAULT_BOUNDS))
+            if key_story in [Ids.PLANESWALKER_VALUE_T, Ids.PLANESWALKER_ORACLE_NUMBERED_T]:
+                top = Distances.ORACLE_TOP + i * 18.0
+                bounds = (-84.0, top, -70.0, top + 16.0) if key_story == Ids.PLANESWALKER_VALUE_T else \
+                    (-68.0, top, 84.0, top + 16.0)
+            package.add_text_frame(placement.get(key_story, parent), frame_id, key_story, story_id, bounds,
+                                   visible=key_story not in [Ids.MODAL_T])
+
+    for key in _RECTANGLES:
+        if key in id_set:
+            package.add_rectangle(placement.get(key, parent), id_set[key], key, CARD_BOUNDS[key],
+                                  gradient_id=id_set[Ids.GRADIENTS_O][0] if key == Ids.COLOR_INDICATOR_TOP_O else
+                                  id_set[Ids.GRADIENTS_O][-1] if key == Ids.COLOR_INDICATOR_BOT_O else None)
+
+
+class _Package:
+    """
+    IDML package under construction, consisting of spreads, stories and the graphic resources.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.spreads = dict()
+        self.stories = dict()
+        self.elements = dict()
+        self.graphic = _create_root("Graphic")
+
+        for color in COLOR_MAPPING.values():
+            ElementTree.SubElement(self.graphic, "Color", {"Self": "Color/" + color, "Model": "Process",
+                                                           "Space": "CMYK", "ColorValue": "0 0 0 0", "Name": color})
+
+    def add_spread(self, spread_id: str) -> ElementTree.Element:
+        root = _create_root("Spread")
+        spread = ElementTree.SubElement(root, "Spread", {"Self": spread_id, "PageCount": "1",
+                                                         "ItemTransform": "1 0 0 1 0 0"})
+        ElementTree.SubElement(spread, "Page", {"Self": spread_id + "p", "Name": "1",
+                                                "ItemTransform": "1 0 0 1 0 0"})
+        self.spreads[spread_id] = root
+        return spread
+
+    def add_group(self, parent: ElementTree.Element, group_id: str, name: str, visible: bool = True) \
+            -> ElementTree.Element:
+        if group_id in self.elements:
+            return self.elements[group_id]
+        group = ElementTree.SubElement(parent, "Group", {"Self": group_id, "Name": name,
+                                                         "Visible": "true" if visible else "false",
+                                                         "ItemTransform": "1 0 0 1 0 0"})
+        self.elements[group_id] = group
+        return group
+
+    def add_rectangle(self, parent: ElementTree.Element, rectangle_id: str, name: str,
+                      bounds: (float, float, float, float), gradient_id: str = None) -> None:
+        if rectangle_id in self.elements:
+            return
+        attributes = {"Self": rectangle_id, "Name": name, "Visible": "true", "ItemTransform": "1 0 0 1 0 0"}
+        if gradient_id is not None:
+            attributes["FillColor"] = "Gradient/" + gradient_id
+        rectangle = ElementTree.SubElement(parent, "Rectangle", attributes)
+        _add_geometry(rectangle, bounds)
+        self.elements[rectangle_id] = rectangle
+
+    def add_text_frame(self, parent: ElementTree.Element, frame_id: str, name: str, story_id: str,
+                       bounds: (float, float, float, float), visible: bool = True) -> None:
+        if frame_id in self.elements:
+            return
+        frame = ElementTree.SubElement(parent, "TextFrame", {"Self": frame_id, "Name": name, "ParentStory": story_id,
+                                                             "Visible": "true" if visible else "false",
+                                                             "ItemTransform": "1 0 0 1 0 0"})
+        _add_geometry(frame, bounds)
+        preference = ElementTree.SubElement(frame, "TextFramePreference", {"VerticalJustification": "CenterAlign"})
+        inset_spacing = ElementTree.SubElement(ElementTree.SubElement(preference, "Properties"), "InsetSpacing",
+                                               {"type": "list"})
+        for inset in TEXT_INSETS:
+            ElementTree.SubElement(inset_spacing, "ListItem", {"type": "unit"}).text = str(inset)
+        self.elements[frame_id] = frame
+
+        if story_id not in self.stories:
+            self.stories[story_id] = _create_story(story_id, name)
+
+    def add_gradient(self, gradient_id: str) -> None:
+        if self.graphic.find("./Gradient[@Self='Gradient/" + gradient_id + "']") is not None:
+            return
+        gradient = ElementTree.SubElement(self.graphic, "Gradient", {"Self": "Gradient/" + gradient_id,
+                                                                     "Type": "Linear", "Name": gradient_id})
+        for location in ["0", "100"]:
+            ElementTree.SubElement(gradient, "GradientStop", {"StopColor": "Color/" + COLOR_MAPPING["C"],
+                                                              "Location": location})
+
+    def write(self, path: str) -> None:
+        designmap = ElementTree.Element("Document", {"xmlns:idPkg": NAMESPACE_PACKAGING, "DOMVersion": DOM_VERSION,
+                                                     "Self": "d"})
+        parts = {"Resources/Graphic.xml": self.graphic}
+        ElementTree.SubElement(designmap, "idPkg:Graphic", {"src": "Resources/Graphic.xml"})
+        for spread_id, root in self.spreads.items():
+            name = "Spreads/Spread_" + spread_id + ".xml"
+            ElementTree.SubElement(designmap, "idPkg:Spread", {"src": name})
+            parts[name] = root
+        for story_id, story in self.stories.items():
+            name = "Stories/Story_" + story_id + ".xml"
+            ElementTree.SubElement(designmap, "idPkg:Story", {"src": name})
+            parts[name] = story
+
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(MIMETYPE, MIMETYPE_IDML, compress_type=zipfile.ZIP_STORED)
+            archive.writestr("META-INF/container.xml", CONTAINER)
+            archive.writestr("designmap.xml", DESIGNMAP_HEADER + ElementTree.tostring(designmap, encoding="utf-8",
+                                                                                    xml_declaration=False))
+            for name, root in parts.items():
+                archive.writestr(name, ElementTree.tostring(root, encoding="utf-8", xml_declaration=True))
+
+
+def _create_root(kind: str) -> ElementTree.Element:
+    return ElementTree.Element("idPkg:" + kind, {"xmlns:idPkg": NAMESPACE_PACKAGING, "DOMVersion": DOM_VERSION})
+
+
+def _create_story(story_id: str, content: str) -> ElementTree.Element:
+    root = _create_root("Story")
+    story = ElementTree.SubElement(root, "Story", {"Self": story_id, "TrackChanges": "false",
+                                                   "StoryTitle": "$ID/", "AppliedTOCStyle": "n"})
+    ElementTree.SubElement(story, "StoryPreference", {"FrameType": "TextFrameType",
+                                                      "StoryOrientation": "Horizontal",
+                                                      "StoryDirection": "LeftToRightDirection"})
+    paragraph = ElementTree.SubElement(story, "ParagraphStyleRange",
+                                       {"AppliedParagraphStyle": "ParagraphStyle/$ID/NormalParagraphStyle"})
+    character = ElementTree.SubElement(paragraph, "CharacterStyleRange",
+                                       {"AppliedCharacterStyle": "CharacterStyle/$ID/[No character style]"})
+    ElementTree.SubElement(character, "Content").text = content
+    return root
+
+
+def _add_geometry(element: ElementTree.Element, bounds: (float, float, float, float)) -> None:
+    # Path points are listed counterclockwise, starting at the top left corner
+    left, top, right, bottom = bounds
+    properties = ElementTree.SubElement(element, "Properties")
+    path_type = ElementTree.SubElement(ElementTree.SubElement(properties, "PathGeometry"), "GeometryPathType",
+                                       {"PathOpen": "false"})
+    points = ElementTree.SubElement(path_type, "PathPointArray")
+    for x, y in [(left, top), (left, bottom), (right, bottom), (right, top)]:
+        anchor = str(x) + " " + str(y)
+        ElementTree.SubElement(points, "PathPointType", {"Anchor": anchor, "LeftDirection": anchor,
+                                                         "RightDirection": anchor})